@@ -0,0 +1,101 @@
+"""
+Throughput benchmark for the HD Category CSV importer
+
+Usage:
+    bench --site <site> execute pw_helpdesk.benchmarks.category_import.run --kwargs "{'rows': 100000}"
+"""
+
+import csv
+import os
+import tempfile
+import time
+
+import frappe
+
+from pw_helpdesk.pw_helpdesk.import_categories import DEFAULT_CHUNK_SIZE, import_categories_from_csv
+
+
+HEADER = [
+    "Category Name",
+    "Category Code",
+    "Sub-Category Name",
+    "Sub-Category Code",
+    "Parent Category Code",
+    "Description",
+    "Is Active",
+]
+
+
+def write_synthetic_csv(file_path, rows, sub_categories_per_category=9, prefix="BENCH"):
+    """Write a category CSV with one category row followed by its sub-category rows"""
+    with open(file_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+
+        written = 0
+        category_number = 0
+        while written < rows:
+            category_number += 1
+            category_code = f"{prefix}_{category_number:06d}"
+            writer.writerow([f"{prefix} Category {category_number}", category_code, "", "", "", "Benchmark category", "1"])
+            written += 1
+
+            for sub_number in range(1, sub_categories_per_category + 1):
+                if written >= rows:
+                    break
+                writer.writerow([
+                    "", "",
+                    f"{prefix} Sub Category {category_number}-{sub_number}",
+                    f"SUB_{category_code}_{sub_number:02d}",
+                    # Leave every other parent code empty to also exercise prefix resolution
+                    category_code if sub_number % 2 else "",
+                    "Benchmark sub-category",
+                    "1"
+                ])
+                written += 1
+
+
+def cleanup(prefix):
+    """Delete categories created by a benchmark run"""
+    frappe.db.delete("HD Category", {"category_code": ["like", f"{prefix}%"]})
+    frappe.db.delete("HD Category", {"category_code": ["like", f"SUB_{prefix}%"]})
+    frappe.db.commit()
+
+
+def run(rows=100000, chunk_size=DEFAULT_CHUNK_SIZE, keep=False):
+    """
+    Import a synthetic CSV of the given size and report rows per second
+
+    Args:
+        rows: Number of CSV rows to generate
+        chunk_size: Importer chunk size
+        keep: Keep the imported categories instead of deleting them afterwards
+    """
+    prefix = f"BENCH{frappe.generate_hash(length=6).upper()}"
+    rows = int(rows)
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "categories.csv")
+        write_synthetic_csv(file_path, rows, prefix=prefix)
+
+        start = time.perf_counter()
+        stats = import_categories_from_csv(file_path, chunk_size=chunk_size, verbose=False)
+        elapsed = time.perf_counter() - start
+
+    result = {
+        "rows": rows,
+        "chunk_size": chunk_size,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(rows / elapsed) if elapsed else None,
+        "created": stats["created_categories"] + stats["created_sub_categories"],
+        "skipped": stats["skipped"],
+        "errors": len(stats["errors"]),
+    }
+
+    print(f"Imported {result['created']} of {rows} rows in {result['seconds']}s "
+          f"({result['rows_per_second']} rows/s, chunk size {chunk_size})")
+
+    if not keep:
+        cleanup(prefix)
+
+    return result
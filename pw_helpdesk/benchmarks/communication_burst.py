@@ -0,0 +1,130 @@
+"""
+Ticket updates caused by a synthetic burst of communications on one ticket
+
+Runs the same burst with coalescing disabled and enabled and counts, in both
+runs, the UPDATE statements issued against HD Ticket. Coalescing stats are
+counted into a benchmark-only hash, and everything is rolled back at the end.
+
+Usage:
+    bench --site <site> execute pw_helpdesk.benchmarks.communication_burst.run --kwargs "{'burst': 50}"
+"""
+
+import re
+import time
+
+import frappe
+import redis
+
+from pw_helpdesk.customizations.communication_coalescing import (
+    DUE_KEY,
+    PENDING_KEY,
+    WINDOW_KEY,
+    flush_ticket_communications,
+    get_coalescing_stats,
+)
+from pw_helpdesk.customizations.overrides import apply_overrides
+from pw_helpdesk.instrumentation import count_queries
+from pw_helpdesk.utils import reset_counters
+
+
+BENCHMARK_STATS_KEY = "pw_helpdesk_communication_coalescing_benchmark"
+
+TICKET_UPDATE = re.compile(r"^\s*update\s+`tabHD Ticket`", re.IGNORECASE)
+
+
+def create_ticket(prefix):
+    return frappe.get_doc({
+        "doctype": "HD Ticket",
+        "subject": f"{prefix} communication burst",
+        "raised_by": frappe.session.user,
+        "description": "",
+    }).insert(ignore_permissions=True)
+
+
+def send_burst(ticket_name, burst):
+    """Add `burst` communications to a ticket, alternating customer and agent replies"""
+    for number in range(burst):
+        communication = frappe.get_doc({
+            "doctype": "Communication",
+            "name": frappe.generate_hash(length=10),
+            "communication_type": "Communication",
+            "communication_medium": "Email",
+            "sent_or_received": "Received" if number % 2 == 0 else "Sent",
+            "subject": f"Reply {number}",
+            "content": f"Burst reply {number}",
+            "reference_doctype": "HD Ticket",
+            "reference_name": ticket_name,
+        })
+        communication.db_insert()
+        frappe.get_doc("HD Ticket", ticket_name).on_communication_update(communication)
+
+
+def clear_window(ticket_name):
+    cache = frappe.cache()
+    cache.delete_value([key.format(ticket_name) for key in (WINDOW_KEY, PENDING_KEY)])
+    redis.Redis.zrem(cache, cache.make_key(DUE_KEY), ticket_name)
+
+
+def run_burst(ticket_name, burst, window):
+    """
+    Returns:
+        dict: Ticket updates, coalesced communications and elapsed seconds
+    """
+    frappe.conf.pw_helpdesk_communication_coalesce_seconds = window
+    clear_window(ticket_name)
+    reset_counters(BENCHMARK_STATS_KEY)
+
+    start = time.perf_counter()
+    with count_queries(record=True) as queries:
+        send_burst(ticket_name, burst)
+        # Close the window and run the flush the scheduler would run
+        frappe.cache().delete_value(WINDOW_KEY.format(ticket_name))
+        flush_ticket_communications(ticket_name)
+    elapsed = time.perf_counter() - start
+
+    clear_window(ticket_name)
+    return {
+        "ticket_updates": sum(1 for query in queries.queries if TICKET_UPDATE.match(query)),
+        "coalesced": get_coalescing_stats().get("coalesced", 0),
+        "seconds": round(elapsed, 3),
+    }
+
+
+def run(burst=50, window=10, prefix="BENCH"):
+    """
+    Compare ticket updates for a burst of communications without and with coalescing
+
+    Args:
+        burst: Communications sent to the ticket
+        window: Coalescing window in seconds for the coalesced run
+
+    Returns:
+        dict: Results per run and ticket updates avoided
+    """
+    # bench execute runs no request or job hooks
+    apply_overrides()
+
+    burst = int(burst)
+    configured_window = frappe.conf.get("pw_helpdesk_communication_coalesce_seconds")
+    frappe.flags.pw_helpdesk_coalescing_stats_key = BENCHMARK_STATS_KEY
+    ticket = create_ticket(prefix)
+
+    try:
+        uncoalesced = run_burst(ticket.name, burst, 0)
+        coalesced = run_burst(ticket.name, burst, int(window))
+    finally:
+        frappe.conf.pw_helpdesk_communication_coalesce_seconds = configured_window
+        frappe.flags.pw_helpdesk_coalescing_stats_key = None
+        reset_counters(BENCHMARK_STATS_KEY)
+        frappe.db.rollback()
+
+    result = {
+        "burst": burst,
+        "uncoalesced": uncoalesced,
+        "coalesced": coalesced,
+        "updates_avoided": uncoalesced["ticket_updates"] - coalesced["ticket_updates"],
+    }
+    print(f"{burst} communications: {uncoalesced['ticket_updates']} ticket updates in "
+          f"{uncoalesced['seconds']}s without coalescing, {coalesced['ticket_updates']} in "
+          f"{coalesced['seconds']}s with a {window}s window")
+    return result
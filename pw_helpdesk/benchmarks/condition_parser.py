@@ -0,0 +1,91 @@
+"""
+Microbenchmark for parsing and evaluating SLA / Assignment Rule conditions
+
+Compares a cold parse, a cached compile_condition lookup, evaluation of the
+compiled predicate and evaluation with frappe.safe_eval.
+
+Usage:
+    bench --site <site> execute pw_helpdesk.benchmarks.condition_parser.run --kwargs "{'conditions': 1000}"
+"""
+
+import random
+import time
+
+import frappe
+
+from pw_helpdesk.customizations.category_condition_utils import (
+    CategoryConditionGenerator,
+    compile_condition,
+)
+
+
+def make_conditions(count, categories_per_condition=5, seed=42):
+    """Generate SLA and Assignment Rule style conditions, simple and compound"""
+    rng = random.Random(seed)
+    conditions = []
+    for number in range(count):
+        categories = [f"CAT_{rng.randrange(10000):05d}" for _ in range(categories_per_condition)]
+        category_list = "', '".join(categories)
+        shape = number % 4
+        if shape == 0:
+            conditions.append(f"doc.custom_category == '{categories[0]}'")
+        elif shape == 1:
+            conditions.append(f"doc.custom_category in ['{category_list}']")
+        elif shape == 2:
+            conditions.append(f"custom_category in ['{category_list}'] and priority == 'High'")
+        else:
+            conditions.append(
+                f"(doc.custom_category in ['{category_list}'] or doc.custom_category == 'CAT_00000') "
+                f"and doc.status != 'Closed'"
+            )
+    return conditions
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return time.perf_counter() - start
+
+
+def run(conditions=1000, evaluations=10):
+    """
+    Time parsing and evaluation of generated conditions
+
+    Args:
+        conditions: Number of distinct conditions, above CONDITION_CACHE_SIZE the cached
+            pass measures LRU evictions instead of hits
+        evaluations: Evaluations per condition
+
+    Returns:
+        dict: Microseconds per operation
+    """
+    conditions = make_conditions(int(conditions))
+    evaluations = int(evaluations)
+    doc = frappe._dict(custom_category="CAT_00000", priority="High", status="Open")
+
+    compile_condition.cache_clear()
+    cold = timed(lambda: [CategoryConditionGenerator.extract_categories_from_condition(c) for c in conditions], 1)
+    warm = timed(lambda: [CategoryConditionGenerator.extract_categories_from_condition(c) for c in conditions], 1)
+
+    compiled = [compile_condition(c) for c in conditions]
+    predicate = timed(lambda: [condition.matches(doc) for condition in compiled], evaluations)
+    safe_eval = timed(
+        lambda: [frappe.safe_eval(c, None, {"doc": doc, **doc}) for c in conditions], evaluations
+    )
+
+    per_condition = 1e6 / len(conditions)
+    per_evaluation = per_condition / evaluations
+    result = {
+        "conditions": len(conditions),
+        "parse_cold_us": round(cold * per_condition, 2),
+        "parse_cached_us": round(warm * per_condition, 2),
+        "evaluate_compiled_us": round(predicate * per_evaluation, 2),
+        "evaluate_safe_eval_us": round(safe_eval * per_evaluation, 2),
+        "cache": compile_condition.cache_info()._asdict(),
+    }
+
+    print(f"Parse: {result['parse_cold_us']}us cold, {result['parse_cached_us']}us cached per condition")
+    print(f"Evaluate: {result['evaluate_compiled_us']}us compiled, "
+          f"{result['evaluate_safe_eval_us']}us safe_eval per evaluation")
+    return result
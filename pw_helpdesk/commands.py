@@ -0,0 +1,72 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("import-hd-categories")
+@click.argument("file_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", type=int, default=1000, help="Rows written and committed per chunk")
+@click.option("--dry-run", is_flag=True, default=False, help="Only show new, changed, unchanged and orphaned rows")
+@click.option("--no-resume", is_flag=True, default=False, help="Ignore the checkpoint of an interrupted import")
+@click.option("--upsert", is_flag=True, default=False, help="Update existing categories whose values changed")
+@pass_context
+def import_hd_categories(context, file_path, chunk_size, dry_run, no_resume, upsert):
+    """Import HD Categories and Sub Categories from a CSV file"""
+    from pw_helpdesk.pw_helpdesk.import_categories import import_categories_from_csv
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        import_categories_from_csv(
+            file_path, chunk_size=chunk_size, resume=not no_resume, dry_run=dry_run, upsert=upsert
+        )
+    finally:
+        frappe.destroy()
+
+
+@click.command("export-hd-categories")
+@click.argument("file_path", type=click.Path(dir_okay=False, writable=True))
+@click.option("--format", "export_format", type=click.Choice(["csv", "jsonl"]), default="csv")
+@pass_context
+def export_hd_categories(context, file_path, export_format):
+    """Export all HD Categories in the import-hd-categories column layout"""
+    from pw_helpdesk.pw_helpdesk.export_categories import export_categories
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        count = export_categories(file_path, export_format=export_format)
+        print(f"Exported {count} categories to {file_path}")
+    finally:
+        frappe.destroy()
+
+
+@click.command("bulk-close-hd-tickets")
+@click.option("--action", type=click.Choice(["resolve", "close"]), default="close")
+@click.option("--ticket", "tickets", multiple=True, help="HD Ticket name, can be given several times")
+@click.option("--filters", help="HD Ticket filters as JSON, used when no --ticket is given")
+@click.option("--notes", "resolution_notes", help="Resolution notes added as a comment")
+@pass_context
+def bulk_close_hd_tickets(context, action, tickets, filters, resolution_notes):
+    """Resolve or close many HD Tickets at once"""
+    from pw_helpdesk.customizations.bulk_ticket_closure import bulk_update_ticket_status, parse_json_arg
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        result = bulk_update_ticket_status(
+            tickets=list(tickets), filters=parse_json_arg(filters), action=action, resolution_notes=resolution_notes
+        )
+        frappe.db.commit()
+        print(f"{result['updated']} tickets updated, {result['failed']} failed")
+        for ticket, ticket_result in result["results"].items():
+            if not ticket_result["success"]:
+                print(f"{ticket}: {ticket_result['error']}")
+    finally:
+        frappe.destroy()
+
+
+commands = [import_hd_categories, export_hd_categories, bulk_close_hd_tickets]
@@ -0,0 +1,55 @@
+"""
+Bulk provisioning of HD Agents
+
+Existing agents are found with one IN query, full names of the missing users
+are read with one query and the new HD Agent rows are written with one
+multi-row insert, in the caller's transaction.
+"""
+
+import frappe
+from frappe.utils import now
+
+
+def ensure_hd_agents(users):
+    """
+    Create active HD Agents for users that are not agents yet
+
+    Users that do not exist are skipped.
+
+    Args:
+        users: Iterable of User names
+
+    Returns:
+        list: Users an HD Agent was created for
+    """
+    users = list(dict.fromkeys(user for user in users if user))
+    if not users:
+        return []
+
+    existing = set(frappe.get_all("HD Agent", filters={"name": ["in", users]}, pluck="name"))
+    missing = [user for user in users if user not in existing]
+    if not missing:
+        return []
+
+    full_names = dict(frappe.get_all(
+        "User",
+        filters={"name": ["in", missing]},
+        fields=["name", "full_name"],
+        as_list=True
+    ))
+    missing = [user for user in missing if user in full_names]
+    if not missing:
+        return []
+
+    timestamp = now()
+    owner = frappe.session.user
+    frappe.db.bulk_insert(
+        "HD Agent",
+        fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                "user", "agent_name", "is_active"],
+        values=[
+            (user, timestamp, timestamp, owner, owner, 0, 0, user, full_names[user] or user, 1)
+            for user in missing
+        ]
+    )
+    return missing
@@ -0,0 +1,138 @@
+"""
+Which HD Tickets does an SLA condition or Assignment Rule assign_condition match?
+
+Conditions are translated into one SQL query when possible. Conditions outside
+the translatable subset are evaluated in Python over tickets streamed from an
+unbuffered cursor, with the predicate compiled once for the whole scan.
+"""
+
+import heapq
+
+import frappe
+from frappe import _
+from frappe.query_builder import Order
+from frappe.query_builder.functions import Count
+from frappe.utils import cint
+
+from pw_helpdesk.customizations.category_condition_utils import (
+    compile_condition,
+    condition_to_criterion,
+    get_condition_fields,
+)
+from pw_helpdesk.instrumentation import instrumented
+
+
+CONDITION_FIELDS = {
+    "HD Service Level Agreement": "condition",
+    "Assignment Rule": "assign_condition",
+}
+
+DEFAULT_TICKET_LIMIT = 100
+
+
+def get_rule_condition(doctype, name):
+    """Get the condition of an SLA or HD Ticket Assignment Rule"""
+    if doctype not in CONDITION_FIELDS:
+        frappe.throw(_("Doctype must be one of {0}").format(", ".join(CONDITION_FIELDS)))
+
+    fields = ["name", CONDITION_FIELDS[doctype]]
+    if doctype == "Assignment Rule":
+        fields.append("document_type")
+
+    values = frappe.db.get_value(doctype, name, fields, as_dict=True)
+    if not values:
+        frappe.throw(_("{0} {1} not found").format(doctype, name), frappe.DoesNotExistError)
+
+    if doctype == "Assignment Rule" and values.document_type != "HD Ticket":
+        frappe.throw(_("Assignment Rule {0} is not for HD Ticket").format(name))
+
+    return values.get(CONDITION_FIELDS[doctype])
+
+
+def find_matching_tickets(condition, status=None, limit=DEFAULT_TICKET_LIMIT):
+    """
+    Count the HD Tickets a condition matches and list the most recently modified ones
+
+    Args:
+        condition: SLA or Assignment Rule condition
+        status: Only consider tickets with this status
+        limit: Maximum number of ticket names returned
+
+    Returns:
+        dict: method ("sql" or "python"), count and ticket names
+    """
+    Ticket = frappe.qb.DocType("HD Ticket")
+    limit = cint(limit)
+
+    base_filter = Ticket.status == status if status else None
+    criterion = condition_to_criterion(condition, "HD Ticket") if condition else None
+
+    if criterion is not None or not condition:
+        if base_filter is not None:
+            criterion = base_filter if criterion is None else criterion & base_filter
+
+        count_query = frappe.qb.from_(Ticket).select(Count("*"))
+        tickets_query = frappe.qb.from_(Ticket).select(Ticket.name).orderby(Ticket.modified, order=Order.desc)
+        if criterion is not None:
+            count_query = count_query.where(criterion)
+            tickets_query = tickets_query.where(criterion)
+
+        return {
+            "method": "sql",
+            "count": count_query.run()[0][0],
+            "tickets": tickets_query.limit(limit).run(pluck=True) if limit else [],
+        }
+
+    compiled = compile_condition(condition)
+    if compiled.is_compiled:
+        # Fields that are not HD Ticket columns are left out and read as None by the predicate
+        valid_columns = set(frappe.get_meta("HD Ticket").get_valid_columns())
+        fields = [field for field in get_condition_fields(compiled.ir) if field in valid_columns]
+        columns = [Ticket.name, Ticket.modified, *(Ticket[field] for field in fields)]
+    else:
+        # safe_eval may read any field
+        columns = ["*"]
+
+    query = frappe.qb.from_(Ticket).select(*columns)
+    if base_filter is not None:
+        query = query.where(base_filter)
+
+    count = 0
+    # Min-heap of the `limit` most recently modified matches
+    latest = []
+    with frappe.db.unbuffered_cursor():
+        for ticket in query.run(as_dict=True, as_iterator=True):
+            if not compiled.matches(ticket):
+                continue
+
+            count += 1
+            if len(latest) < limit:
+                heapq.heappush(latest, (ticket.modified, ticket.name))
+            elif limit:
+                heapq.heappushpop(latest, (ticket.modified, ticket.name))
+
+    return {
+        "method": "python",
+        "count": count,
+        "tickets": [name for _modified, name in sorted(latest, reverse=True)],
+    }
+
+
+@frappe.whitelist()
+@instrumented
+def get_tickets_matching_rule(doctype, name, status=None, limit=DEFAULT_TICKET_LIMIT):
+    """
+    Report which HD Tickets an SLA or Assignment Rule condition would match today
+
+    Args:
+        doctype: "HD Service Level Agreement" or "Assignment Rule"
+        name: Name of the SLA or Assignment Rule
+        status: Only consider tickets with this status
+        limit: Maximum number of ticket names returned
+    """
+    frappe.only_for(["System Manager", "Agent Manager"])
+
+    condition = get_rule_condition(doctype, name)
+    result = find_matching_tickets(condition, status=status, limit=limit)
+    result.update({"doctype": doctype, "name": name, "condition": condition})
+    return result
@@ -2,7 +2,10 @@ import frappe
 from frappe import _
 import json
 
+from pw_helpdesk.instrumentation import instrumented
+
 @frappe.whitelist()
+@instrumented
 def get_applicable_sla(category):
     """Get applicable SLA for a given category"""
     try:
@@ -39,6 +42,7 @@ def get_applicable_sla(category):
         return {"sla": None}
 
 @frappe.whitelist()
+@instrumented
 def check_sla_status(ticket_id, category=None):
     """Check SLA status for a ticket"""
     try:
@@ -80,6 +84,7 @@ def check_sla_status(ticket_id, category=None):
         return "Error checking SLA status"
 
 @frappe.whitelist()
+@instrumented
 def apply_sla_to_ticket(ticket_id, sla_name):
     """Manually apply SLA to a ticket"""
     try:
@@ -104,6 +109,7 @@ def apply_sla_to_ticket(ticket_id, sla_name):
         frappe.throw(_("Failed to apply SLA"))
 
 @frappe.whitelist()
+@instrumented
 def get_sla_categories(sla_name):
     """Get categories associated with an SLA"""
     try:
@@ -120,6 +126,7 @@ def get_sla_categories(sla_name):
         return []
 
 @frappe.whitelist()
+@instrumented
 def update_sla_categories(sla_name, categories):
     """Update categories for an SLA"""
     try:
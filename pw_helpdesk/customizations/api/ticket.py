@@ -1,76 +1,19 @@
 import frappe
 from frappe import _
 
+from pw_helpdesk.customizations import closure_state_machine
+from pw_helpdesk.customizations.role_holder_assignment import pick_role_holder
+from pw_helpdesk.instrumentation import instrumented
+
 
 @frappe.whitelist()
+@instrumented
 def request_closure(ticket_id, resolution_notes):
     """
     API endpoint to request ticket closure by agents.
     Only agents can request closure, but only ticket raiser and System Managers can actually close it.
     """
-    
-    # Check if the ticket exists
-    if not frappe.db.exists("HD Ticket", ticket_id):
-        frappe.throw(_("Ticket not found"))
-    
-    # Get the ticket
-    ticket = frappe.get_doc("HD Ticket", ticket_id)
-    
-    # Check if user has permission to request closure (is an agent)
-    if not frappe.has_permission("HD Ticket", "write", doc=ticket):
-        frappe.throw(_("You don't have permission to request closure for this ticket"))
-    
-    # Check if ticket is already closed or resolved
-    if ticket.status in ["Closed", "Resolved"]:
-        frappe.throw(_("Ticket is already {0}").format(ticket.status))
-    
-    # Create a comment indicating closure request
-    comment = frappe.get_doc({
-        "doctype": "HD Ticket Comment",
-        "ticket": ticket_id,
-        "commented_by": frappe.session.user,
-        "content": f"""
-        <div style="background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 10px 0;">
-            <strong>🔔 Closure Requested by Agent</strong><br/>
-            <strong>Resolution Notes:</strong><br/>
-            {resolution_notes}
-            <br/><br/>
-            <em>This ticket has been marked for closure by the resolving agent. 
-            The ticket can be closed by the person who raised it or by a System Manager.</em>
-        </div>
-        """,
-        "is_system": 1
-    }).insert()
-    
-    # Update custom fields to track closure request
-    if hasattr(ticket, 'custom_closure_requested'):
-        ticket.custom_closure_requested = 1
-        ticket.custom_closure_requested_by = frappe.session.user
-    
-    # Add a comment to ticket activity
-    ticket.add_comment("Info", f"Closure requested by {frappe.get_fullname(frappe.session.user)}: {resolution_notes}")
-    
-    ticket.save()
-    
-    # Send notification to ticket raiser
-    if ticket.raised_by and ticket.raised_by != frappe.session.user:
-        try:
-            frappe.sendmail(
-                recipients=[ticket.raised_by],
-                subject=f"Closure Requested for Ticket #{ticket.name}",
-                message=f"""
-                <p>Hello,</p>
-                <p>The agent working on your ticket <strong>#{ticket.name}</strong> has requested to close it.</p>
-                <p><strong>Subject:</strong> {ticket.subject}</p>
-                <p><strong>Resolution Notes:</strong></p>
-                <p>{resolution_notes}</p>
-                <p>If you are satisfied with the resolution, you can close the ticket. 
-                Otherwise, please reply with additional questions or concerns.</p>
-                <p>Best regards,<br/>Support Team</p>
-                """
-            )
-        except Exception as e:
-            frappe.log_error(f"Failed to send closure notification: {str(e)}")
+    ticket = closure_state_machine.request_closure(ticket_id, resolution_notes)
     
     return {
         "message": "Closure request submitted successfully",
@@ -80,6 +23,7 @@ def request_closure(ticket_id, resolution_notes):
 
 
 @frappe.whitelist()  
+@instrumented
 def auto_update_status_on_agent_reply(ticket_id):
     """
     Automatically update ticket status when agent replies for the first time
@@ -98,6 +42,7 @@ def auto_update_status_on_agent_reply(ticket_id):
 
 
 @frappe.whitelist()
+@instrumented
 def get_categories_by_parent(parent_category=None):
     """
     Get categories filtered by parent category for the form script
@@ -123,6 +68,7 @@ def get_categories_by_parent(parent_category=None):
 
 
 @frappe.whitelist()
+@instrumented
 def assign_ticket_based_on_category(ticket_id, category):
     """
     Auto-assign ticket based on category settings
@@ -134,9 +80,9 @@ def assign_ticket_based_on_category(ticket_id, category):
     ticket = frappe.get_doc("HD Ticket", ticket_id)
     
     # Check if category has assignment settings
-    if category_doc.assign_issue_to_user and category_doc.assignee:
+    if category_doc.assign_issue_to_user and category_doc.assignees:
         # Assign to specific users
-        assignees = [email.strip() for email in category_doc.assignee.split(",")]
+        assignees = [row.user for row in category_doc.assignees]
         
         # Use frappe assignment
         for assignee in assignees[:1]:  # Assign to first user for now
@@ -148,6 +94,17 @@ def assign_ticket_based_on_category(ticket_id, category):
                     "description": f"Auto-assigned based on category: {category}"
                 })
                 break
+
+    elif category_doc.assign_issue_to_permission_role_holder and category_doc.permission_role_holder:
+        # Assign to holders of the configured role in round-robin order
+        assignee = pick_role_holder(category_doc.permission_role_holder)
+        if assignee:
+            frappe.desk.form.assign_to.add({
+                "assign_to": [assignee],
+                "doctype": "HD Ticket",
+                "name": ticket_id,
+                "description": f"Auto-assigned to {category_doc.permission_role_holder} based on category: {category}"
+            })
                 
     # Set agent group if team mapping exists
     team_mapping = {
@@ -0,0 +1,148 @@
+"""
+Close tickets that stayed Resolved longer than the idle window
+
+Candidates are read with a keyset scan over the (status, modified) index and
+closed in batches with a direct UPDATE plus one HD Ticket Comment insert per
+batch, each batch in its own transaction. Ticket controllers and doc events
+are not run; tickets without Resolution Details, which closing requires, are
+left Resolved. A run stops after a time budget, the next run continues with
+the remaining backlog.
+
+Site config:
+    pw_helpdesk_auto_close_days: Days a ticket stays Resolved before it is closed,
+        default 7, 0 disables auto-close
+"""
+
+import time
+
+import frappe
+from frappe.query_builder.functions import Coalesce
+from frappe.utils import add_to_date, cint, now, now_datetime
+
+from pw_helpdesk.instrumentation import instrumented
+
+
+DEFAULT_AUTO_CLOSE_DAYS = 7
+AUTO_CLOSE_BATCH_SIZE = 500
+# Seconds a single run may spend before leaving the rest to the next run
+AUTO_CLOSE_TIME_BUDGET = 600
+
+
+def get_auto_close_days():
+    return cint(frappe.conf.get("pw_helpdesk_auto_close_days", DEFAULT_AUTO_CLOSE_DAYS))
+
+
+def get_auto_close_candidates(cutoff, after=None, limit=AUTO_CLOSE_BATCH_SIZE):
+    """
+    Next batch of Resolved tickets with Resolution Details not modified since cutoff, in (modified, name) order
+
+    Args:
+        cutoff: Only tickets modified before this datetime
+        after: (modified, name) of the last ticket of the previous batch
+        limit: Batch size
+
+    Returns:
+        list: (name, modified) tuples
+    """
+    conditions = ""
+    values = {"cutoff": cutoff, "limit": limit}
+    if after:
+        conditions = "AND (modified > %(after_modified)s OR (modified = %(after_modified)s AND name > %(after_name)s))"
+        values.update({"after_modified": after[0], "after_name": after[1]})
+
+    return frappe.db.sql(
+        f"""
+        SELECT name, modified
+        FROM `tabHD Ticket`
+        WHERE status = 'Resolved' AND modified < %(cutoff)s
+            AND resolution_details IS NOT NULL AND resolution_details != ''
+            {conditions}
+        ORDER BY modified, name
+        LIMIT %(limit)s
+        """,
+        values
+    )
+
+
+def close_tickets(names, cutoff, days):
+    """
+    Close a batch of Resolved tickets
+
+    Tickets changed after the candidate query, or without Resolution Details,
+    are left alone by the guarded UPDATE.
+
+    Returns:
+        int: Number of tickets closed
+    """
+    Ticket = frappe.qb.DocType("HD Ticket")
+    timestamp = now()
+
+    closed = frappe.qb.from_(Ticket).select(Ticket.name).where(
+        Ticket.name.isin(names) & (Ticket.status == "Resolved") & (Ticket.modified < cutoff)
+        & Ticket.resolution_details.isnotnull() & (Ticket.resolution_details != "")
+    ).for_update().run(pluck=True)
+    if not closed:
+        return 0
+
+    frappe.qb.update(Ticket).set(Ticket.status, "Closed").set(
+        Ticket.resolution_date, Coalesce(Ticket.resolution_date, timestamp)
+    ).set(Ticket.modified, timestamp).set(Ticket.modified_by, "Administrator").where(
+        Ticket.name.isin(closed)
+    ).run()
+
+    content = f"""
+        <div style="background-color: #e2e3e5; border: 1px solid #d6d8db; padding: 10px; border-radius: 5px; margin: 10px 0;">
+            <strong>🔒 Ticket Closed Automatically</strong><br/>
+            <em>This ticket was closed after {days} days in Resolved status without activity.</em>
+        </div>
+        """
+    frappe.db.bulk_insert(
+        "HD Ticket Comment",
+        fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                "ticket", "commented_by", "content", "is_system"],
+        values=[
+            (frappe.generate_hash(length=10), timestamp, timestamp, "Administrator", "Administrator", 0, 0,
+             name, "Administrator", content, 1)
+            for name in closed
+        ]
+    )
+
+    for name in closed:
+        frappe.clear_document_cache("HD Ticket", name)
+
+    return len(closed)
+
+
+@instrumented
+def auto_close_resolved_tickets(batch_size=AUTO_CLOSE_BATCH_SIZE, time_budget=AUTO_CLOSE_TIME_BUDGET):
+    """
+    Scheduled job: close tickets Resolved for longer than the idle window
+
+    Returns:
+        int: Number of tickets closed
+    """
+    days = get_auto_close_days()
+    if days <= 0:
+        return 0
+
+    cutoff = add_to_date(now_datetime(), days=-days)
+    deadline = time.monotonic() + time_budget
+    total = 0
+    after = None
+
+    while time.monotonic() < deadline:
+        candidates = get_auto_close_candidates(cutoff, after, batch_size)
+        if not candidates:
+            break
+
+        try:
+            total += close_tickets([name for name, _modified in candidates], cutoff, days)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"Error auto-closing resolved tickets: {str(e)}")
+            break
+
+        after = (candidates[-1][1], candidates[-1][0])
+
+    return total
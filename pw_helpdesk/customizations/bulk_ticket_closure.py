@@ -0,0 +1,228 @@
+"""
+Resolve or close many HD Tickets at once
+
+Tickets are loaded with one query and the closure permission rules of
+ticket_closure_workflow.mark_as_resolved are evaluated once for the batch.
+Status changes are written with chunked UPDATE statements, resolution
+comments with multi-row inserts and notifications are queued in the outbox
+collectively. The statuses of each chunk are re-read under a row lock before
+it is written, so tickets resolved or closed concurrently are reported as
+skipped, as are tickets to close without Resolution Details. Ticket
+controllers and doc events are not run for the changed tickets, so SLA
+fields are not recalculated.
+
+Usage:
+    bench --site <site> bulk-close-hd-tickets --action close --filters '{"status": "Resolved"}'
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.query_builder.functions import Coalesce
+from frappe.utils import cint, get_fullname, now
+
+from pw_helpdesk.customizations.notification_outbox import queue_notifications
+from pw_helpdesk.instrumentation import instrumented
+
+
+BULK_ACTIONS = {
+    # action -> (new status, statuses the action is not allowed from)
+    "resolve": ("Resolved", ("Resolved", "Closed")),
+    "close": ("Closed", ("Closed",)),
+}
+
+BULK_CHUNK_SIZE = 500
+MAX_BULK_TICKETS = 10000
+
+
+def parse_json_arg(value):
+    """Accept lists and dicts passed as JSON strings by the REST API"""
+    if isinstance(value, str):
+        return json.loads(value) if value.strip() else None
+    return value
+
+
+def get_resolution_comment(action, resolution_notes, user):
+    """HTML of the comment added to each ticket, same as mark_as_resolved"""
+    title = "✅ Ticket Marked as Resolved" if action == "resolve" else "🔒 Ticket Closed"
+    return f"""
+            <div style="background-color: #d4edda; border: 1px solid #c3e6cb; padding: 10px; border-radius: 5px; margin: 10px 0;">
+                <strong>{title}</strong><br/>
+                <strong>Resolution Notes:</strong><br/>
+                {resolution_notes}
+                <br/><br/>
+                <em>Resolved by: {get_fullname(user)}</em>
+            </div>
+            """
+
+
+def bulk_update_ticket_status(tickets=None, filters=None, action="resolve", resolution_notes=None,
+                              chunk_size=BULK_CHUNK_SIZE):
+    """
+    Resolve or close a list of tickets or all tickets matching filters
+
+    Args:
+        tickets: List of HD Ticket names
+        filters: HD Ticket filters, used when no ticket list is given
+        action: "resolve" or "close"
+        resolution_notes: Notes added as a comment and sent to assigned agents
+        chunk_size: Tickets written per UPDATE and comment insert
+
+    Returns:
+        dict: Per-ticket results and totals
+    """
+    if action not in BULK_ACTIONS:
+        frappe.throw(_("Action must be one of {0}").format(", ".join(BULK_ACTIONS)))
+
+    new_status, blocked_statuses = BULK_ACTIONS[action]
+    chunk_size = cint(chunk_size) or BULK_CHUNK_SIZE
+    user = frappe.session.user
+
+    # Role based part of the permission rule, evaluated once for the batch
+    is_manager = frappe.has_permission("HD Ticket", "delete")
+
+    if tickets:
+        query_filters = {"name": ["in", list(dict.fromkeys(tickets))]}
+    elif filters:
+        query_filters = filters
+        if not is_manager:
+            # Other users may only update tickets they raised
+            if isinstance(query_filters, dict):
+                query_filters = {**query_filters, "raised_by": user}
+            else:
+                query_filters = [*query_filters, ["raised_by", "=", user]]
+    else:
+        frappe.throw(_("Provide a list of tickets or filters"))
+
+    rows = frappe.get_all(
+        "HD Ticket",
+        filters=query_filters,
+        fields=["name", "status", "raised_by", "subject", "_assign"],
+        order_by=None,
+        limit=MAX_BULK_TICKETS + 1
+    )
+    if len(rows) > MAX_BULK_TICKETS:
+        frappe.throw(_("Cannot update more than {0} tickets at once").format(MAX_BULK_TICKETS))
+
+    results = {}
+    if tickets:
+        found = {row.name for row in rows}
+        for name in tickets:
+            if name not in found:
+                results[name] = {"success": False, "error": _("Ticket not found")}
+
+    allowed = []
+    for row in rows:
+        if user != row.raised_by and not is_manager:
+            results[row.name] = {"success": False, "error": _("Only the ticket raiser or System Manager can update this ticket")}
+        elif row.status in blocked_statuses:
+            results[row.name] = {"success": False, "error": _("Ticket is already {0}").format(row.status)}
+        else:
+            allowed.append(row)
+
+    Ticket = frappe.qb.DocType("HD Ticket")
+    timestamp = now()
+    comment = get_resolution_comment(action, resolution_notes, user) if resolution_notes else None
+
+    updated = []
+    for start in range(0, len(allowed), chunk_size):
+        chunk = allowed[start:start + chunk_size]
+
+        # Re-read the status under a row lock, tickets may have changed since they were loaded
+        current = {
+            name: (status, resolution_details)
+            for name, status, resolution_details in frappe.qb.from_(Ticket).select(
+                Ticket.name, Ticket.status, Ticket.resolution_details
+            ).where(Ticket.name.isin([row.name for row in chunk])).for_update().run()
+        }
+        writable = []
+        for row in chunk:
+            status, resolution_details = current.get(row.name, (None, None))
+            if status is None:
+                results[row.name] = {"success": False, "error": _("Ticket not found")}
+            elif status in blocked_statuses:
+                results[row.name] = {"success": False, "error": _("Ticket is already {0}").format(status)}
+            elif action == "close" and not resolution_details:
+                # Same rule as validate_ticket_closure, which is not run here
+                results[row.name] = {
+                    "success": False,
+                    "error": _("Resolution Details are required before closing a ticket"),
+                }
+            else:
+                writable.append(row)
+        chunk = writable
+        if not chunk:
+            continue
+        names = [row.name for row in chunk]
+
+        frappe.qb.update(Ticket).set(Ticket.status, new_status).set(
+            Ticket.resolution_date, Coalesce(Ticket.resolution_date, timestamp) if action == "close" else timestamp
+        ).set(Ticket.custom_closure_requested, 0).set(Ticket.modified, timestamp).set(Ticket.modified_by, user).where(
+            Ticket.name.isin(names)
+        ).run()
+
+        if comment:
+            frappe.db.bulk_insert(
+                "HD Ticket Comment",
+                fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                        "ticket", "commented_by", "content", "is_system"],
+                values=[
+                    (frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, 0,
+                     name, user, comment, 1)
+                    for name in names
+                ]
+            )
+
+        for row in chunk:
+            frappe.clear_document_cache("HD Ticket", row.name)
+            results[row.name] = {"success": True, "status": new_status}
+        updated.extend(chunk)
+
+    if action == "resolve":
+        notifications = []
+        for row in updated:
+            assigned_users = json.loads(row._assign) if row._assign else []
+            notifications.extend(
+                {
+                    "notification_type": "Ticket Resolved",
+                    "recipient": assignee,
+                    "ticket": row.name,
+                    "ticket_subject": row.subject,
+                    "actor": user,
+                    "notes": resolution_notes,
+                }
+                for assignee in assigned_users
+                if assignee != user
+            )
+        queue_notifications(notifications)
+
+    return {
+        "action": action,
+        "updated": len(updated),
+        "failed": len(results) - len(updated),
+        "results": results,
+    }
+
+
+@frappe.whitelist(methods=["POST"])
+@instrumented
+def bulk_resolve_tickets(tickets=None, filters=None, action="resolve", resolution_notes=None):
+    """
+    Resolve or close many tickets in one request
+
+    Tickets are written directly, without their controllers, so SLA fields
+    are not recalculated. Tickets to close need Resolution Details.
+
+    Args:
+        tickets: JSON list of HD Ticket names
+        filters: JSON HD Ticket filters, used when no ticket list is given
+        action: "resolve" or "close"
+        resolution_notes: Notes added as a comment and sent to assigned agents
+    """
+    return bulk_update_ticket_status(
+        tickets=parse_json_arg(tickets),
+        filters=parse_json_arg(filters),
+        action=action,
+        resolution_notes=resolution_notes
+    )
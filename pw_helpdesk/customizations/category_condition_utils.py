@@ -1,5 +1,387 @@
+import ast
+import operator
+from functools import lru_cache
+
 import frappe
 from frappe import _
+from frappe.model import default_fields, numeric_fieldtypes
+from frappe.query_builder import Criterion
+
+from pw_helpdesk.instrumentation import instrumented
+
+CATEGORY_FIELD = "custom_category"
+# Distinct condition texts kept compiled per worker
+CONDITION_CACHE_SIZE = 1024
+
+COMPARISON_OPERATORS = {
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.In: "in",
+    ast.NotIn: "not in",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+}
+
+# Operators flipped when the constant is on the left, e.g. 'A' == doc.custom_category
+REVERSED_OPERATORS = {"==": "==", "!=": "!=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+# Marker for nodes that are not literals, None is a valid literal
+_NOT_LITERAL = object()
+
+OPERATOR_FUNCTIONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda value, target: value in target,
+    "not in": lambda value, target: value not in target,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def parse_condition(condition):
+    """
+    Parse an SLA condition or Assignment Rule assign_condition into a small IR
+
+    Nodes are tuples:
+        ("and", [nodes]), ("or", [nodes]), ("not", node),
+        ("cmp", field, operator, value), ("truthy", field),
+        ("unknown",) for anything outside this subset
+
+    Fields may be written as doc.field, doc.get("field") or a bare field name,
+    values must be literals or lists/tuples/sets of literals.
+
+    Args:
+        condition: Python expression string
+
+    Returns:
+        tuple: Root IR node
+    """
+    try:
+        tree = ast.parse((condition or "").strip(), mode="eval")
+    except (SyntaxError, ValueError):
+        return ("unknown",)
+
+    return _to_ir(tree.body)
+
+
+def _to_ir(node):
+    if isinstance(node, ast.BoolOp):
+        kind = "and" if isinstance(node.op, ast.And) else "or"
+        return (kind, [_to_ir(value) for value in node.values])
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return ("not", _to_ir(node.operand))
+
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        op = COMPARISON_OPERATORS.get(type(node.ops[0]))
+        left, right = node.left, node.comparators[0]
+        if not op:
+            return ("unknown",)
+
+        field = _field_name(left)
+        if field:
+            value = _literal(right)
+            if value is not _NOT_LITERAL and (op not in ("in", "not in") or isinstance(value, tuple)):
+                return ("cmp", field, op, value)
+            return ("unknown",)
+
+        # 'A' == doc.custom_category; 'A' in doc.field is a substring test and is not supported
+        field = _field_name(right)
+        value = _literal(left)
+        if field and op in REVERSED_OPERATORS and value is not _NOT_LITERAL:
+            return ("cmp", field, REVERSED_OPERATORS[op], value)
+        return ("unknown",)
+
+    field = _field_name(node)
+    if field:
+        return ("truthy", field)
+
+    return ("unknown",)
+
+
+def _field_name(node):
+    """Field referenced by doc.field, doc.get("field") or a bare name"""
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "doc":
+        return node.attr
+
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "get"
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "doc"
+        and len(node.args) == 1
+        and not node.keywords
+        and isinstance(node.args[0], ast.Constant)
+        and isinstance(node.args[0].value, str)
+    ):
+        return node.args[0].value
+
+    if isinstance(node, ast.Name) and node.id not in ("doc", "True", "False", "None"):
+        return node.id
+
+    return None
+
+
+def _literal(node):
+    """Literal value of a node, list/tuple/set literals become tuples"""
+    try:
+        value = ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return _NOT_LITERAL
+
+    if isinstance(value, list | tuple | set | frozenset):
+        return tuple(value)
+    return value
+
+
+def get_condition_categories(ir):
+    """
+    Categories a ticket must be in for the condition to hold
+
+    Returns:
+        frozenset: Category names, or None if the condition does not restrict the category
+    """
+    kind = ir[0]
+
+    if kind == "cmp":
+        _, field, op, value = ir
+        if field != CATEGORY_FIELD:
+            return None
+        if op == "==":
+            return frozenset([value])
+        if op == "in":
+            return frozenset(value)
+        return None
+
+    if kind == "and":
+        restrictions = [categories for categories in map(get_condition_categories, ir[1]) if categories is not None]
+        if not restrictions:
+            return None
+        return frozenset.intersection(*restrictions)
+
+    if kind == "or":
+        branches = [get_condition_categories(child) for child in ir[1]]
+        if any(categories is None for categories in branches):
+            return None
+        return frozenset.union(*branches)
+
+    return None
+
+
+def is_category_only(ir):
+    """True if the condition is nothing but a category ==/in test, i.e. it can be regenerated from categories"""
+    return ir[0] == "cmp" and ir[1] == CATEGORY_FIELD and ir[2] in ("==", "in")
+
+
+def _has_unknown(ir):
+    kind = ir[0]
+    if kind == "unknown":
+        return True
+    if kind in ("and", "or"):
+        return any(_has_unknown(child) for child in ir[1])
+    if kind == "not":
+        return _has_unknown(ir[1])
+    return False
+
+
+def _compile(ir):
+    """Build a predicate function(values) from an IR without unknown nodes"""
+    kind = ir[0]
+
+    if kind == "cmp":
+        _, field, op, target = ir
+        compare = OPERATOR_FUNCTIONS[op]
+
+        def predicate(values):
+            try:
+                return bool(compare(values.get(field), target))
+            except TypeError:
+                # e.g. None < 3
+                return False
+
+        return predicate
+
+    if kind == "truthy":
+        field = ir[1]
+        return lambda values: bool(values.get(field))
+
+    if kind == "not":
+        inner = _compile(ir[1])
+        return lambda values: not inner(values)
+
+    children = [_compile(child) for child in ir[1]]
+    if kind == "and":
+        return lambda values: all(child(values) for child in children)
+    return lambda values: any(child(values) for child in children)
+
+
+class CompiledCondition:
+    """Parsed form of a condition: its IR, the categories it selects and a predicate"""
+
+    __slots__ = ("_predicate", "categories", "category_only", "condition", "ir")
+
+    def __init__(self, condition):
+        self.condition = condition
+        self.ir = parse_condition(condition)
+        self.categories = get_condition_categories(self.ir)
+        self.category_only = is_category_only(self.ir)
+        self._predicate = None if _has_unknown(self.ir) else _compile(self.ir)
+
+    @property
+    def is_compiled(self):
+        """False when the condition uses syntax outside the IR and is evaluated with safe_eval"""
+        return self._predicate is not None
+
+    def matches(self, doc):
+        """
+        Evaluate the condition against a document
+
+        Args:
+            doc: Document or dict of field values
+
+        Returns:
+            bool: Whether the condition holds
+        """
+        if not self.condition:
+            return True
+
+        values = frappe._dict(doc) if isinstance(doc, dict) else doc.as_dict()
+        if self._predicate:
+            return self._predicate(values)
+
+        return bool(frappe.safe_eval(self.condition, None, {"doc": values, **values}))
+
+
+@lru_cache(maxsize=CONDITION_CACHE_SIZE)
+def compile_condition(condition):
+    """
+    Parse and compile a condition once per worker
+
+    Args:
+        condition: Python expression string
+
+    Returns:
+        CompiledCondition: Cached compiled condition
+    """
+    return CompiledCondition(condition)
+
+
+def evaluate_condition(condition, doc):
+    """Evaluate an SLA or Assignment Rule condition against a document using the compiled cache"""
+    return compile_condition(condition).matches(doc)
+
+
+class UntranslatableCondition(Exception):
+    """Raised when a condition IR has no equivalent SQL predicate"""
+
+
+# Operators whose negation is another operator, used to push `not` down to comparisons
+NEGATED_OPERATORS = {"==": "!=", "!=": "==", "in": "not in", "not in": "in"}
+
+
+def condition_to_criterion(condition, doctype="HD Ticket"):
+    """
+    Translate a condition into a frappe.qb criterion over a doctype's table
+
+    Only conditions whose IR consists of supported comparisons on real fields
+    are translated, with NULL handled so that the SQL result matches evaluating
+    the condition per document. String comparisons follow the column collation,
+    i.e. they are case-insensitive on MariaDB.
+
+    Args:
+        condition: Python expression string
+        doctype: Doctype the condition is evaluated against
+
+    Returns:
+        Criterion: qb criterion, or None if the condition cannot be expressed in SQL
+    """
+    compiled = compile_condition(condition)
+    if not compiled.is_compiled:
+        return None
+
+    try:
+        return _criterion(compiled.ir, frappe.qb.DocType(doctype), frappe.get_meta(doctype))
+    except UntranslatableCondition:
+        return None
+
+
+def get_condition_fields(ir):
+    """Fields referenced by a condition IR"""
+    kind = ir[0]
+    if kind in ("cmp", "truthy"):
+        return {ir[1]}
+    if kind == "not":
+        return get_condition_fields(ir[1])
+    if kind in ("and", "or"):
+        return set().union(*(get_condition_fields(child) for child in ir[1]))
+    return set()
+
+
+def _column(table, meta, field):
+    docfield = meta.get_field(field)
+    if not docfield and field not in default_fields:
+        # doc.get() of an unknown field is None, which SQL cannot reproduce cheaply
+        raise UntranslatableCondition(field)
+    return table[field], docfield
+
+
+def _criterion(ir, table, meta, negate=False):
+    kind = ir[0]
+
+    if kind == "not":
+        return _criterion(ir[1], table, meta, not negate)
+
+    if kind in ("and", "or"):
+        # De Morgan, so negation is pushed down to comparisons and NULLs stay correct
+        children = [_criterion(child, table, meta, negate) for child in ir[1]]
+        use_all = (kind == "and") != negate
+        return Criterion.all(children) if use_all else Criterion.any(children)
+
+    if kind == "truthy":
+        column, docfield = _column(table, meta, ir[1])
+        if docfield and docfield.fieldtype in numeric_fieldtypes:
+            truthy = column.notnull() & (column != 0)
+            falsy = column.isnull() | (column == 0)
+        else:
+            truthy = column.notnull() & (column != "")
+            falsy = column.isnull() | (column == "")
+        return falsy if negate else truthy
+
+    if kind != "cmp":
+        raise UntranslatableCondition(kind)
+
+    _, field, op, value = ir
+    if negate:
+        if op not in NEGATED_OPERATORS:
+            # not (a < b) is also true for NULL in Python, keep these in the fallback
+            raise UntranslatableCondition(op)
+        op = NEGATED_OPERATORS[op]
+
+    column, _docfield = _column(table, meta, field)
+
+    if op in ("in", "not in"):
+        values = [item for item in value if item is not None]
+        if not values or len(values) != len(value):
+            raise UntranslatableCondition(op)
+        return column.isin(values) if op == "in" else column.notin(values) | column.isnull()
+
+    if value is None:
+        if op == "==":
+            return column.isnull()
+        if op == "!=":
+            return column.notnull()
+        raise UntranslatableCondition(op)
+
+    if op == "==":
+        return column == value
+    if op == "!=":
+        return (column != value) | column.isnull()
+    return {"<": column < value, "<=": column <= value, ">": column > value, ">=": column >= value}[op]
 
 
 class CategoryConditionGenerator:
@@ -94,13 +476,18 @@ class CategoryConditionGenerator:
             frappe.throw(_("Error generating assignment condition: {0}").format(str(e)))
     
     @staticmethod
-    def migrate_existing_conditions_to_categories(doctype):
+    def migrate_existing_conditions_to_categories(doctype, bulk=False):
         """
         Reverse migration: Extract categories from existing conditions and populate the multiselect
         
         Args:
             doctype: "HD Service Level Agreement" or "Assignment Rule"
+            bulk: Write the category rows directly instead of saving each document,
+                see bulk_migrate_conditions_to_categories
         """
+        if bulk:
+            return CategoryConditionGenerator.bulk_migrate_conditions_to_categories(doctype)
+
         try:
             condition_field = "condition" if doctype == "HD Service Level Agreement" else "assign_condition"
             
@@ -130,44 +517,106 @@ class CategoryConditionGenerator:
             frappe.log_error(f"Error migrating {doctype} conditions: {str(e)}")
             print(f"Error migrating {doctype}: {str(e)}")
     
+    @staticmethod
+    def bulk_migrate_conditions_to_categories(doctype):
+        """
+        Bulk version of migrate_existing_conditions_to_categories
+
+        Valid category names are loaded with one query and all child rows are
+        computed in memory. The category rows of migrated documents are then
+        replaced with one delete and one multi-row insert, without loading or
+        saving the documents, so no validate or save hooks run. The document
+        cache of the doctype is cleared once at the end.
+
+        Args:
+            doctype: "HD Service Level Agreement" or "Assignment Rule"
+
+        Returns:
+            dict: Document name -> list of categories written
+        """
+        condition_field = "condition" if doctype == "HD Service Level Agreement" else "assign_condition"
+        parentfield = "custom_applicable_categories"
+
+        try:
+            docs = frappe.get_all(
+                doctype,
+                filters={condition_field: ["is", "set"]},
+                fields=["name", condition_field],
+                order_by=None
+            )
+            valid_categories = set(frappe.get_all("HD Category", pluck="name", order_by=None))
+
+            categories_by_doc = {}
+            for doc_info in docs:
+                categories = CategoryConditionGenerator.extract_categories_from_condition(doc_info.get(condition_field))
+                if categories:
+                    categories_by_doc[doc_info.name] = [category for category in categories if category in valid_categories]
+
+            if not categories_by_doc:
+                print(f"No {doctype} conditions to migrate")
+                return {}
+
+            frappe.db.delete(
+                "HD Category Selection",
+                {"parenttype": doctype, "parentfield": parentfield, "parent": ["in", list(categories_by_doc)]}
+            )
+
+            timestamp = frappe.utils.now()
+            user = frappe.session.user
+            values = [
+                (frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, idx,
+                 parent, doctype, parentfield, category)
+                for parent, categories in categories_by_doc.items()
+                for idx, category in enumerate(categories, start=1)
+            ]
+            if values:
+                frappe.db.bulk_insert(
+                    "HD Category Selection",
+                    fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                            "parent", "parenttype", "parentfield", "category"],
+                    values=values
+                )
+
+            frappe.db.set_value(
+                doctype,
+                {"name": ["in", list(categories_by_doc)]},
+                {"modified": timestamp, "modified_by": user},
+                update_modified=False
+            )
+            frappe.clear_document_cache(doctype)
+
+            print(f"Migrated {len(categories_by_doc)} {doctype} records ({len(values)} category rows)")
+            return categories_by_doc
+
+        except Exception as e:
+            frappe.log_error(f"Error bulk migrating {doctype} conditions: {str(e)}")
+            print(f"Error migrating {doctype}: {str(e)}")
+            return {}
+
     @staticmethod
     def extract_categories_from_condition(condition):
         """
         Extract category names from Python condition expressions
-        
+
+        Handles ==/in tests on doc.custom_category or custom_category combined
+        with and/or/not. Conditions that do not restrict the category (e.g. an
+        `or` with a non-category branch) yield no categories.
+
         Args:
             condition: Python condition string
-            
+
         Returns:
             list: List of category names
         """
-        try:
-            categories = []
-            
-            if not condition:
-                return categories
-                
-            # Handle single category: doc.custom_category == 'AI_AM_1'
-            if "==" in condition and "custom_category" in condition:
-                import re
-                match = re.search(r"custom_category\s*==\s*['\"]([^'\"]+)['\"]", condition)
-                if match:
-                    categories.append(match.group(1))
-            
-            # Handle multiple categories: doc.custom_category in ['AI_AM_1', 'AI_AM_2']
-            elif " in " in condition and "custom_category" in condition:
-                import re
-                matches = re.findall(r"['\"]([^'\"]+)['\"]", condition)
-                categories.extend(matches)
-            
-            return list(set(categories))  # Remove duplicates
-            
-        except Exception as e:
-            frappe.log_error(f"Error extracting categories from condition: {str(e)}")
+        if not condition:
             return []
 
+        categories = compile_condition(condition).categories
+        return sorted(categories) if categories else []
+
 
 @frappe.whitelist()
+@instrumented
 def auto_generate_sla_condition(sla_name):
     """
     Whitelisted method to auto-generate SLA condition from categories
@@ -186,6 +635,7 @@ def auto_generate_sla_condition(sla_name):
 
 
 @frappe.whitelist()
+@instrumented
 def auto_generate_assignment_rule_condition(rule_name):
     """
     Whitelisted method to auto-generate Assignment Rule condition from categories
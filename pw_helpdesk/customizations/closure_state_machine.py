@@ -0,0 +1,211 @@
+"""
+Closure state machine for HD Tickets
+
+States:
+    open               Not resolved or closed, no closure requested
+    closure_requested  An agent asked the raiser to resolve the ticket
+    resolved           Status Resolved
+    closed             Status Closed
+
+Requesting closure makes one direct ticket write, guarded by the `modified`
+timestamp read before the transition, and adds one HD Ticket Comment.
+Resolving saves the ticket document, which runs its controller and doc
+events so that SLA fields are updated, and adds a comment when resolution
+notes are given; Document.save checks `modified` itself. Concurrent resolve
+and request-closure calls on the same ticket therefore cannot both succeed:
+the later one fails with a TimestampMismatchError.
+
+Closing is not a transition of this module: bulk close
+(pw_helpdesk.customizations.bulk_ticket_closure) and auto-close
+(pw_helpdesk.customizations.auto_close) close tickets with set-based updates
+guarded by the ticket status.
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import get_fullname, now
+
+from pw_helpdesk.customizations.notification_outbox import queue_ticket_notification
+
+
+OPEN = "open"
+CLOSURE_REQUESTED = "closure_requested"
+RESOLVED = "resolved"
+CLOSED = "closed"
+
+# action -> (states the action is allowed from, resulting state)
+TRANSITIONS = {
+    "request_closure": ((OPEN,), CLOSURE_REQUESTED),
+    "resolve": ((OPEN, CLOSURE_REQUESTED), RESOLVED),
+}
+
+TICKET_FIELDS = [
+    "name", "status", "raised_by", "subject", "_assign", "modified", "custom_closure_requested"
+]
+
+
+def get_closure_state(ticket):
+    """
+    Closure state of a ticket
+
+    Args:
+        ticket: HD Ticket document or dict with status and custom_closure_requested
+    """
+    if ticket.get("status") == "Closed":
+        return CLOSED
+    if ticket.get("status") == "Resolved":
+        return RESOLVED
+    if ticket.get("custom_closure_requested"):
+        return CLOSURE_REQUESTED
+    return OPEN
+
+
+def get_ticket(ticket_id):
+    ticket = frappe.db.get_value("HD Ticket", ticket_id, TICKET_FIELDS, as_dict=True)
+    if not ticket:
+        frappe.throw(_("Ticket not found"), frappe.DoesNotExistError)
+    return ticket
+
+
+def is_transition_allowed(ticket, action):
+    """Whether the action is allowed from the ticket's current state"""
+    allowed_from, _target = TRANSITIONS[action]
+    return get_closure_state(ticket) in allowed_from
+
+
+def validate_transition(ticket, action):
+    """Throw if the action is not allowed from the ticket's current state"""
+    if is_transition_allowed(ticket, action):
+        return
+
+    if ticket.status in ["Closed", "Resolved"]:
+        frappe.throw(_("Ticket is already {0}").format(ticket.status))
+    if ticket.custom_closure_requested:
+        frappe.throw(_("Closure has already been requested for this ticket"))
+    frappe.throw(_("Cannot {0} a ticket in state {1}").format(action.replace("_", " "), get_closure_state(ticket)))
+
+
+def apply_transition(ticket, values):
+    """
+    Write the new ticket values if the ticket was not modified since it was read
+
+    Args:
+        ticket: Ticket row read by get_ticket
+        values: Dict of field -> new value
+    """
+    # The row stays locked until the transaction ends, so nothing can change
+    # it between this check and the update
+    current_modified = frappe.db.get_value("HD Ticket", ticket.name, "modified", for_update=True)
+    if str(current_modified) != str(ticket.modified):
+        frappe.throw(
+            _("Ticket {0} was changed by someone else, please reload and try again").format(ticket.name),
+            frappe.TimestampMismatchError
+        )
+
+    Ticket = frappe.qb.DocType("HD Ticket")
+    timestamp = now()
+
+    query = frappe.qb.update(Ticket).set(Ticket.modified, timestamp).set(Ticket.modified_by, frappe.session.user)
+    for field, value in values.items():
+        query = query.set(Ticket[field], value)
+    query.where(Ticket.name == ticket.name).run()
+
+    frappe.clear_document_cache("HD Ticket", ticket.name)
+    ticket.update(values)
+    ticket.modified = timestamp
+
+
+def add_activity(ticket_id, content):
+    """Add the single activity row of a transition"""
+    frappe.get_doc({
+        "doctype": "HD Ticket Comment",
+        "ticket": ticket_id,
+        "commented_by": frappe.session.user,
+        "content": content,
+        "is_system": 1
+    }).insert(ignore_permissions=True)
+
+
+def request_closure(ticket_id, resolution_notes):
+    """
+    open -> closure_requested, by an agent other than the ticket raiser
+
+    Returns:
+        dict: Ticket row after the transition
+    """
+    if not resolution_notes:
+        frappe.throw(_("Resolution notes are required"))
+
+    ticket = get_ticket(ticket_id)
+    current_user = frappe.session.user
+
+    if not frappe.has_permission("HD Ticket", "write", doc=ticket_id):
+        frappe.throw(_("You don't have permission to request closure for this ticket"))
+
+    if current_user == ticket.raised_by:
+        frappe.throw(_("As the ticket raiser, please use 'Mark as Resolved' instead"))
+
+    validate_transition(ticket, "request_closure")
+    apply_transition(ticket, {"custom_closure_requested": 1, "custom_closure_requested_by": current_user})
+
+    add_activity(ticket_id, f"""
+        <div style="background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 10px 0;">
+            <strong>🔔 Closure Requested by Agent</strong><br/>
+            <strong>Agent:</strong> {get_fullname(current_user)}<br/>
+            <strong>Resolution Notes:</strong><br/>
+            {resolution_notes}
+            <br/><br/>
+            <em>This ticket has been marked for closure by the resolving agent.
+            The ticket can be resolved by the person who raised it.</em>
+        </div>
+        """)
+
+    if ticket.raised_by:
+        queue_ticket_notification("Closure Requested", ticket, [ticket.raised_by], resolution_notes)
+
+    return ticket
+
+
+def resolve(ticket_id, resolution_notes=None):
+    """
+    open | closure_requested -> resolved, by the ticket raiser or a System Manager
+
+    The ticket is saved through the document so that SLA fields are updated on
+    resolution. Document.save compares `modified` under a row lock, which keeps
+    the optimistic locking of the other transitions.
+
+    Returns:
+        Document: The resolved HD Ticket
+    """
+    current_user = frappe.session.user
+    ticket = get_ticket(ticket_id)
+
+    if current_user != ticket.raised_by and not frappe.has_permission("HD Ticket", "delete"):
+        frappe.throw(_("Only the ticket raiser or System Manager can mark tickets as resolved"))
+
+    validate_transition(ticket, "resolve")
+
+    doc = frappe.get_doc("HD Ticket", ticket_id)
+    doc.status = "Resolved"
+    doc.resolution_date = now()
+    doc.custom_closure_requested = 0
+    doc.save(ignore_permissions=True)
+
+    if resolution_notes:
+        add_activity(ticket_id, f"""
+            <div style="background-color: #d4edda; border: 1px solid #c3e6cb; padding: 10px; border-radius: 5px; margin: 10px 0;">
+                <strong>✅ Ticket Marked as Resolved</strong><br/>
+                <strong>Resolution Notes:</strong><br/>
+                {resolution_notes}
+                <br/><br/>
+                <em>Resolved by: {get_fullname(current_user)}</em>
+            </div>
+            """)
+
+    if doc.get("_assign"):
+        assigned_users = json.loads(doc._assign) if isinstance(doc._assign, str) else doc._assign
+        queue_ticket_notification("Ticket Resolved", doc, assigned_users, resolution_notes)
+
+    return doc
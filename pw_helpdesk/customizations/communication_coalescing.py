@@ -0,0 +1,239 @@
+"""
+Per-ticket coalescing of bursts of communications
+
+The first communication on a ticket updates it right away and opens a
+coalescing window. Communications arriving while the window is open are
+queued in Redis, and the ticket is marked due for a flush when the window
+closes. A scheduled job, run every minute, applies each due ticket's queued
+communications with one ticket update. A customer sending several emails in
+a row, or a mail loop, therefore costs two ticket updates instead of one per
+email.
+
+A communication that opens a new window takes over whatever the previous
+window left queued and applies it before itself, so older communications
+are never written on top of a newer one. A flush does not overwrite a
+status a user set after the queued communications arrived, and never moves
+a Resolved or Closed ticket to Replied.
+
+Site config:
+    pw_helpdesk_communication_coalesce_seconds: Window length, default 10, 0 disables coalescing
+"""
+
+import time
+
+import frappe
+import redis
+from frappe.utils import cint, get_datetime
+
+from pw_helpdesk.instrumentation import instrumented
+from pw_helpdesk.utils import get_counters, increment_counters
+
+
+DEFAULT_WINDOW_SECONDS = 10
+COALESCING_STATS_KEY = "pw_helpdesk_communication_coalescing_stats"
+
+WINDOW_KEY = "pw_helpdesk_communication_window:{0}"
+PENDING_KEY = "pw_helpdesk_communication_pending:{0}"
+# Sorted set of ticket -> time its queued communications are due to be applied
+DUE_KEY = "pw_helpdesk_communication_flush_due"
+
+# Queued communications are dropped if no flush picks them up within a day
+PENDING_EXPIRY_SECONDS = 24 * 60 * 60
+# Tickets flushed per scheduled run
+MAX_FLUSHES_PER_RUN = 500
+# Statuses communications set; any other status was set by a user
+COMMUNICATION_STATUSES = ("Open", "Replied")
+
+
+def get_window_seconds():
+    return cint(frappe.conf.get("pw_helpdesk_communication_coalesce_seconds", DEFAULT_WINDOW_SECONDS))
+
+
+def get_stats_key():
+    """Counter hash for coalescing stats, benchmarks count into their own"""
+    return frappe.flags.pw_helpdesk_coalescing_stats_key or COALESCING_STATS_KEY
+
+
+def coalesce_communication(ticket_name, communication):
+    """
+    Queue a communication for the ticket's flush if its window is open
+
+    Opens the window when it is closed. The communications queued during the
+    previous window are then handed back to the caller, to be applied before
+    this one, and that window's flush is cancelled.
+
+    Args:
+        ticket_name: Name of the HD Ticket
+        communication: Saved Communication
+
+    Returns:
+        list: Communications the caller must apply now, oldest first; empty if
+            the communication was queued
+    """
+    window = get_window_seconds()
+    if not window or not ticket_name or not communication.get("name"):
+        return [communication]
+
+    try:
+        cache = frappe.cache()
+        if redis.Redis.set(cache, cache.make_key(WINDOW_KEY.format(ticket_name)), 1, nx=True, ex=window):
+            # Leading edge: the caller updates the ticket
+            earlier = take_pending_communications(ticket_name)
+            increment_counters(get_stats_key(), {"communications": 1, "ticket_updates": 1})
+            return [*get_communications(earlier), communication]
+
+        pending_key = cache.make_key(PENDING_KEY.format(ticket_name))
+        pipeline = cache.pipeline()
+        pipeline.rpush(pending_key, communication.name)
+        pipeline.expire(pending_key, PENDING_EXPIRY_SECONDS)
+        # Due when the window closes; kept if already due from an earlier communication
+        pipeline.zadd(cache.make_key(DUE_KEY), {ticket_name: time.time() + window}, nx=True)
+        pipeline.execute()
+    except redis.exceptions.RedisError as e:
+        frappe.log_error(f"Error coalescing communication for ticket {ticket_name}: {str(e)}")
+        return [communication]
+
+    increment_counters(get_stats_key(), {"communications": 1, "coalesced": 1})
+    return []
+
+
+def take_pending_communications(ticket_name):
+    """
+    Read and clear the communications queued for a ticket and its due flush
+
+    Returns:
+        list: Communication names in arrival order
+    """
+    cache = frappe.cache()
+    pending_key = cache.make_key(PENDING_KEY.format(ticket_name))
+    pipeline = cache.pipeline()
+    pipeline.lrange(pending_key, 0, -1)
+    pipeline.delete(pending_key)
+    pipeline.zrem(cache.make_key(DUE_KEY), ticket_name)
+    names, _deleted, _removed = pipeline.execute()
+    return list(dict.fromkeys(name.decode() if isinstance(name, bytes) else name for name in names))
+
+
+def get_communications(names):
+    if not names:
+        return []
+
+    return frappe.get_all(
+        "Communication",
+        filters={"name": ["in", names]},
+        fields=["name", "sent_or_received", "content", "creation"],
+        order_by="creation asc"
+    )
+
+
+@instrumented
+def flush_ticket_communications(ticket_name):
+    """
+    Apply the communications queued during a ticket's coalescing window with one ticket update
+
+    Does nothing while a window is open on the ticket: the communication that
+    opened it takes over the queue.
+
+    Args:
+        ticket_name: Name of the HD Ticket
+
+    Returns:
+        list: Ticket fields written
+    """
+    from pw_helpdesk.customizations.ticket_events import (
+        COMMUNICATION_FIELDS,
+        apply_communication,
+        save_communication_changes,
+    )
+
+    cache = frappe.cache()
+    if cache.exists(WINDOW_KEY.format(ticket_name)):
+        return []
+
+    communications = get_communications(take_pending_communications(ticket_name))
+    if not communications or not frappe.db.exists("HD Ticket", ticket_name):
+        return []
+
+    ticket = frappe.get_doc("HD Ticket", ticket_name)
+    before = {field: ticket.get(field) for field in COMMUNICATION_FIELDS}
+    for communication in communications:
+        apply_communication(ticket, communication)
+    if ticket.status != before["status"] and is_status_kept(ticket, before["status"], communications):
+        ticket.status = before["status"]
+
+    changed = save_communication_changes(ticket, before)
+    increment_counters(get_stats_key(), {"flushes": 1, "ticket_updates": 1 if changed else 0})
+    return changed
+
+
+def is_status_kept(ticket, status, communications):
+    """
+    Whether the ticket's status must not be changed by the queued communications
+
+    Args:
+        ticket: HD Ticket document, as saved before the communications were applied
+        status: Ticket status before the communications were applied
+        communications: Queued communications, with their creation
+
+    Returns:
+        bool: True if the status was set by a user after the communications
+            arrived, or a Resolved or Closed ticket would move to Replied
+    """
+    if status in ("Resolved", "Closed") and ticket.status == "Replied":
+        return True
+
+    newest = max(get_datetime(communication.creation) for communication in communications)
+    return get_datetime(ticket.modified) > newest and status not in COMMUNICATION_STATUSES
+
+
+@instrumented
+def flush_due_communications():
+    """
+    Flush every ticket whose coalescing window has closed, scheduled every minute
+
+    Returns:
+        int: Due tickets processed
+    """
+    cache = frappe.cache()
+    due_key = cache.make_key(DUE_KEY)
+    try:
+        due = redis.Redis.zrangebyscore(cache, due_key, 0, time.time(), start=0, num=MAX_FLUSHES_PER_RUN)
+    except redis.exceptions.RedisError as e:
+        frappe.log_error(f"Error reading due communication flushes: {str(e)}")
+        return 0
+
+    flushed = 0
+    for ticket_name in due:
+        ticket_name = ticket_name.decode() if isinstance(ticket_name, bytes) else ticket_name
+        # Claimed by whoever removes it, so each window is flushed once
+        if not redis.Redis.zrem(cache, due_key, ticket_name):
+            continue
+
+        try:
+            flush_ticket_communications(ticket_name)
+            frappe.db.commit()
+            flushed += 1
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"Error flushing communications for ticket {ticket_name}: {str(e)}")
+
+    return flushed
+
+
+def get_coalescing_stats():
+    """
+    Returns:
+        dict: Communications seen, communications coalesced, ticket updates made
+            and ticket updates avoided
+    """
+    stats = get_counters(get_stats_key())
+    stats["updates_avoided"] = stats.get("communications", 0) - stats.get("ticket_updates", 0)
+    return stats
+
+
+@frappe.whitelist()
+@instrumented
+def get_communication_coalescing_stats():
+    """Report how many ticket updates communication coalescing avoided"""
+    frappe.only_for(["System Manager", "Agent Manager"])
+    return get_coalescing_stats()
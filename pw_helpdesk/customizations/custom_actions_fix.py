@@ -6,7 +6,10 @@ This ensures all custom actions have proper onClick functions to prevent runtime
 import frappe
 from frappe import _
 
+from pw_helpdesk.instrumentation import instrumented
 
+
+@instrumented
 def apply_custom_actions_fix():
     """
     Apply fixes to ensure custom actions work properly
@@ -92,6 +95,7 @@ function validateAction(action) {
 
 
 @frappe.whitelist()
+@instrumented
 def validate_custom_actions(actions):
     """
     Validate and fix custom actions to ensure they have proper onClick functions
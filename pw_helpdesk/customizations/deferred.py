@@ -0,0 +1,78 @@
+"""
+Side effects deferred until the current transaction commits
+
+Doc event hooks register work with defer() or defer_each() instead of writing
+and committing on their own. Everything registered during a request runs once
+after the request's transaction commits, followed by a single commit of the
+side effects, and is dropped if the transaction rolls back.
+
+Usage:
+    defer(("team_sync", team.name), sync_team_users_from_dynamic_assignment, team.name)
+    defer_each("hd_agents", ensure_hd_agents, users)
+"""
+
+import frappe
+
+
+def get_pending():
+    """Pending side effects of the current transaction, registering the flush on first use"""
+    pending = frappe.flags.pw_helpdesk_deferred
+    if pending is None:
+        pending = frappe.flags.pw_helpdesk_deferred = {}
+        frappe.db.after_commit.add(flush)
+        frappe.db.after_rollback.add(discard)
+    return pending
+
+
+def defer(key, callback, *args):
+    """
+    Run callback(*args) once after the current transaction commits
+
+    Args:
+        key: Identifies the side effect; a later call with the same key replaces
+            the arguments of the earlier one
+        callback: Function to run
+    """
+    get_pending()[key] = (callback, args, None)
+
+
+def defer_each(key, callback, items):
+    """
+    Collect items under a key and call callback(items) once after the current
+    transaction commits, with the items of every call in order and without duplicates
+
+    Args:
+        key: Identifies the batch
+        callback: Function taking a list
+        items: Iterable of hashable items added to the batch
+    """
+    pending = get_pending()
+    if key not in pending:
+        pending[key] = (callback, (), {})
+    pending[key][2].update(dict.fromkeys(items))
+
+
+def discard():
+    frappe.flags.pw_helpdesk_deferred = None
+
+
+def flush():
+    """Run the pending side effects and commit their writes together"""
+    pending = frappe.flags.pw_helpdesk_deferred
+    frappe.flags.pw_helpdesk_deferred = None
+    if not pending:
+        return
+
+    for key, (callback, args, batch) in pending.items():
+        if batch is not None:
+            args = (list(batch),)
+
+        # A failing side effect only undoes its own writes
+        frappe.db.savepoint("pw_helpdesk_deferred")
+        try:
+            callback(*args)
+        except Exception as e:
+            frappe.db.rollback(save_point="pw_helpdesk_deferred")
+            frappe.log_error(f"Deferred side effect {key} failed: {str(e)}", "Deferred Side Effect Error")
+
+    frappe.db.commit()
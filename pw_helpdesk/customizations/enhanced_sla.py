@@ -1,7 +1,8 @@
 import frappe
 from frappe.model.document import Document
-from helpdesk.helpdesk.doctype.hd_service_level_agreement.hd_service_level_agreement import HDServiceLevelAgreement
-from helpdesk.helpdesk.doctype.hd_ticket.hd_ticket import HDTicket
+
+from pw_helpdesk.customizations.overrides import HD_SLA, HD_TICKET, apply_overrides, get_original
+from pw_helpdesk.instrumentation import instrumented
 
 
 class EnhancedSLA:
@@ -66,26 +67,30 @@ class EnhancedSLA:
 
 
 # ENHANCED SLA APPLICATION - Override core method
-original_apply = HDServiceLevelAgreement.apply
-
+# Installed on HDServiceLevelAgreement by pw_helpdesk.customizations.overrides
+@instrumented
 def enhanced_sla_apply(self, doc: Document):
     """
     Enhanced SLA application that includes team and agent assignment
     """
     try:
         # Call original SLA application logic first
-        original_apply(self, doc)
+        get_original(HD_SLA, "apply")(self, doc)
         
         # Now handle our custom team assignment
         if hasattr(self, 'custom_auto_assign_team') and self.custom_auto_assign_team:
             doc.agent_group = self.custom_auto_assign_team
             
+        # Assignment is skipped for updates made from a communication
+        if doc.flags.ignore_assignment_rule:
+            return
+            
         # Handle agent assignment if we have an assignment rule
         if hasattr(self, 'custom_assignment_rule') and self.custom_assignment_rule:
-            EnhancedSLA._assign_agent_via_rule(doc, self.custom_assignment_rule)
+            self._assign_agent_via_rule(doc, self.custom_assignment_rule)
         elif doc.agent_group:
             # Fallback to team-based assignment
-            EnhancedSLA._assign_agent_via_team(doc, doc.agent_group)
+            self._assign_agent_via_team(doc, doc.agent_group)
             
     except Exception as e:
         frappe.log_error(f"Error in enhanced SLA application: {str(e)}")
@@ -130,7 +135,7 @@ def _assign_agent_via_team(doc, team_name):
         
         # First try team's assignment rule
         if team.assignment_rule:
-            EnhancedSLA._assign_agent_via_rule(doc, team.assignment_rule)
+            _assign_agent_via_rule(doc, team.assignment_rule)
             return
             
         # Fallback to direct team users
@@ -150,15 +155,9 @@ def _assign_agent_via_team(doc, team_name):
         frappe.log_error(f"Error in team-based assignment: {str(e)}")
 
 
-# Apply the enhanced SLA method
-HDServiceLevelAgreement.apply = enhanced_sla_apply
-HDServiceLevelAgreement._assign_agent_via_rule = _assign_agent_via_rule
-HDServiceLevelAgreement._assign_agent_via_team = _assign_agent_via_team
-
-
 # ENHANCED TICKET VALIDATION - Override set_sla to ensure our enhanced logic runs
-original_apply_sla = HDTicket.apply_sla
-
+# Installed on HDTicket by pw_helpdesk.customizations.overrides
+@instrumented
 def enhanced_apply_sla(self):
     """Enhanced apply_sla that triggers our enhanced SLA application"""
     try:
@@ -167,13 +166,15 @@ def enhanced_apply_sla(self):
     except Exception as e:
         frappe.log_error(f"Error applying enhanced SLA: {str(e)}")
         # Fallback to original logic
-        original_apply_sla(self)
-
-# Apply the enhanced apply_sla method
-HDTicket.apply_sla = enhanced_apply_sla
+        get_original(HD_TICKET, "apply_sla")(self)
 
 
 # MIGRATION UTILITY
 def run_migration():
     """Run the migration from multiselect to conditions"""
-    EnhancedSLA.migrate_multiselect_to_conditions() 
\ No newline at end of file
+    EnhancedSLA.migrate_multiselect_to_conditions() 
+
+
+# Install the replacements defined above, in case this module was imported
+# before pw_helpdesk.customizations.overrides finished loading
+apply_overrides(record_errors=False)
@@ -0,0 +1,246 @@
+"""
+Outbox for closure workflow emails
+
+API calls only insert HD Notification Outbox rows. A scheduled worker groups
+queued rows per recipient and notification type, waits for the digest window
+so several resolutions become one email, renders each template once per
+digest and retries failed sends with exponential backoff.
+
+Site config:
+    pw_helpdesk_notification_digest_minutes: Digest window, default 5
+    pw_helpdesk_notification_retention_days: Days sent and failed rows are kept, default 30
+"""
+
+from functools import cache
+
+import frappe
+from frappe.utils import add_to_date, cint, get_fullname, get_url, now, now_datetime
+
+from pw_helpdesk.instrumentation import instrumented
+
+
+OUTBOX_DOCTYPE = "HD Notification Outbox"
+
+DEFAULT_DIGEST_MINUTES = 5
+DEFAULT_RETENTION_DAYS = 30
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_MINUTES = 2
+# Digests sent per worker run, and notifications per digest email
+MAX_DIGESTS_PER_RUN = 500
+MAX_DIGEST_ITEMS = 50
+
+OUTBOX_FIELDS = ["notification_type", "recipient", "ticket", "ticket_subject", "actor", "notes"]
+
+TEMPLATES = {
+    "Ticket Resolved": {
+        "subject": (
+            "{% if items|length == 1 %}Ticket #{{ items[0].ticket }} Resolved"
+            "{% else %}{{ items|length }} Tickets Resolved{% endif %}"
+        ),
+        "message": """
+            <p>Hello,</p>
+            {% for item in items %}
+            <p>Ticket <strong>#{{ item.ticket }}</strong> has been marked as resolved by {{ item.actor_name }}.</p>
+            <p><strong>Subject:</strong> {{ item.ticket_subject or "" }}</p>
+            {% if item.notes %}<p><strong>Resolution Notes:</strong></p>
+            <p>{{ item.notes }}</p>{% endif %}
+            {% endfor %}
+            <p>Thank you for your assistance with {{ "this ticket" if items|length == 1 else "these tickets" }}.</p>
+            <p>Best regards,<br/>Support System</p>
+        """,
+    },
+    "Closure Requested": {
+        "subject": (
+            "{% if items|length == 1 %}Closure Requested for Ticket #{{ items[0].ticket }}"
+            "{% else %}Closure Requested for {{ items|length }} Tickets{% endif %}"
+        ),
+        "message": """
+            <p>Hello,</p>
+            {% for item in items %}
+            <p>The agent working on your ticket <strong>#{{ item.ticket }}</strong> has requested to close it.</p>
+            <p><strong>Subject:</strong> {{ item.ticket_subject or "" }}</p>
+            <p><strong>Agent:</strong> {{ item.actor_name }}</p>
+            <p><strong>Resolution Notes:</strong></p>
+            <p>{{ item.notes or "" }}</p>
+            <p><a href="{{ url }}/app/hd-ticket/{{ item.ticket }}"
+               style="background-color: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">
+               View Ticket
+            </a></p>
+            {% endfor %}
+            <p>If you are satisfied with the resolution, you can mark the ticket as resolved.
+            Otherwise, please reply with additional questions or concerns.</p>
+            <p>Best regards,<br/>Support Team</p>
+        """,
+    },
+}
+
+
+def queue_notifications(notifications):
+    """
+    Add notifications to the outbox with one multi-row insert
+
+    Args:
+        notifications: List of dicts with notification_type, recipient, ticket,
+            ticket_subject, actor and notes
+    """
+    notifications = [notification for notification in notifications if notification.get("recipient")]
+    if not notifications:
+        return
+
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        OUTBOX_DOCTYPE,
+        fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                "status", "attempts", *OUTBOX_FIELDS],
+        values=[
+            (frappe.generate_hash(length=12), timestamp, timestamp, user, user, 0, 0,
+             "Queued", 0, *(notification.get(field) for field in OUTBOX_FIELDS))
+            for notification in notifications
+        ]
+    )
+
+
+def queue_ticket_notification(notification_type, ticket, recipients, notes=None):
+    """
+    Queue one notification per recipient about a ticket, skipping the acting user
+
+    Args:
+        notification_type: "Ticket Resolved" or "Closure Requested"
+        ticket: HD Ticket document or dict with name and subject
+        recipients: Iterable of email addresses
+        notes: Resolution notes shown in the email
+    """
+    actor = frappe.session.user
+    queue_notifications([
+        {
+            "notification_type": notification_type,
+            "recipient": recipient,
+            "ticket": ticket.get("name"),
+            "ticket_subject": ticket.get("subject"),
+            "actor": actor,
+            "notes": notes,
+        }
+        for recipient in dict.fromkeys(recipients)
+        if recipient and recipient != actor
+    ])
+
+
+@cache
+def get_template(source):
+    """Compile a Jinja template once per worker"""
+    return frappe.get_jenv().from_string(source)
+
+
+def render_digest(notification_type, items):
+    """
+    Render the subject and message of a digest email
+
+    Returns:
+        tuple: (subject, message)
+    """
+    templates = TEMPLATES[notification_type]
+    context = {"items": items, "url": get_url()}
+    return get_template(templates["subject"]).render(context), get_template(templates["message"]).render(context)
+
+
+def get_digest_window():
+    return cint(frappe.conf.get("pw_helpdesk_notification_digest_minutes", DEFAULT_DIGEST_MINUTES))
+
+
+@instrumented
+def drain_notification_outbox():
+    """
+    Send due digests, scheduled every minute
+
+    A recipient's queued notifications of one type are sent together once the
+    oldest of them is older than the digest window.
+    """
+    current_time = now_datetime()
+    cutoff = add_to_date(current_time, minutes=-get_digest_window())
+
+    groups = frappe.db.sql(
+        """
+        SELECT recipient, notification_type
+        FROM `tabHD Notification Outbox`
+        WHERE status = 'Queued'
+            AND (next_attempt_after IS NULL OR next_attempt_after <= %(now)s)
+        GROUP BY recipient, notification_type
+        HAVING MIN(creation) <= %(cutoff)s
+        LIMIT %(limit)s
+        """,
+        {"now": current_time, "cutoff": cutoff, "limit": MAX_DIGESTS_PER_RUN},
+        as_dict=True
+    )
+
+    for group in groups:
+        send_digest(group.recipient, group.notification_type, current_time)
+        frappe.db.commit()
+
+
+def send_digest(recipient, notification_type, current_time=None):
+    """
+    Send one email for a recipient's queued notifications of one type
+
+    Rendering and queueing the email are retried here; delivery of the queued
+    email is retried by Frappe's Email Queue.
+
+    Returns:
+        bool: True if the email was queued for sending
+    """
+    current_time = current_time or now_datetime()
+    items = frappe.get_all(
+        OUTBOX_DOCTYPE,
+        filters={
+            "status": "Queued",
+            "recipient": recipient,
+            "notification_type": notification_type,
+        },
+        or_filters=[["next_attempt_after", "is", "not set"], ["next_attempt_after", "<=", current_time]],
+        fields=["name", "ticket", "ticket_subject", "actor", "notes", "attempts"],
+        order_by="creation asc",
+        limit=MAX_DIGEST_ITEMS
+    )
+    if not items:
+        return False
+
+    names = [item.name for item in items]
+    try:
+        for item in items:
+            item.actor_name = get_fullname(item.actor) if item.actor else ""
+
+        subject, message = render_digest(notification_type, items)
+        frappe.sendmail(recipients=[recipient], subject=subject, message=message)
+    except Exception as e:
+        attempts = max(item.attempts for item in items) + 1
+        frappe.db.set_value(
+            OUTBOX_DOCTYPE,
+            {"name": ["in", names]},
+            {
+                "attempts": attempts,
+                "status": "Failed" if attempts >= MAX_ATTEMPTS else "Queued",
+                "next_attempt_after": add_to_date(current_time, minutes=RETRY_BACKOFF_MINUTES ** attempts),
+                "error": str(e),
+            },
+            update_modified=False
+        )
+        frappe.log_error(f"Failed to send {notification_type} notifications to {recipient}: {str(e)}")
+        return False
+
+    frappe.db.set_value(
+        OUTBOX_DOCTYPE,
+        {"name": ["in", names]},
+        {"status": "Sent", "sent_on": current_time, "error": None},
+        update_modified=False
+    )
+    return True
+
+
+@instrumented
+def delete_old_notifications():
+    """Delete sent and failed outbox rows after the retention period, scheduled daily"""
+    days = cint(frappe.conf.get("pw_helpdesk_notification_retention_days", DEFAULT_RETENTION_DAYS))
+    frappe.db.delete(
+        OUTBOX_DOCTYPE,
+        {"status": ["in", ["Sent", "Failed"]], "creation": ["<", add_to_date(now_datetime(), days=-days)]}
+    )
@@ -0,0 +1,162 @@
+"""
+Registry of the methods pw_helpdesk overrides on Frappe and Helpdesk classes
+
+Overrides are listed in OVERRIDES instead of being assigned by each module.
+apply_overrides() installs each override once per process, whatever order
+modules are imported in, so no method is wrapped twice. It runs when this
+module or a module defining replacements is imported, which covers bench
+execute and console, and from the before_request, before_job,
+before_migrate and before_tests hooks. Replacements call the
+method they override through get_original(), which always returns the class's
+own implementation from before pw_helpdesk patched it.
+
+get_override_status() reports, per overridden method, which implementation is
+active and what importing the target class and the replacement cost.
+"""
+
+import time
+
+import frappe
+from frappe.utils import now
+
+from pw_helpdesk.instrumentation import instrumented
+
+
+HD_TICKET = "helpdesk.helpdesk.doctype.hd_ticket.hd_ticket.HDTicket"
+HD_SLA = "helpdesk.helpdesk.doctype.hd_service_level_agreement.hd_service_level_agreement.HDServiceLevelAgreement"
+ASSIGNMENT_RULE = "frappe.automation.doctype.assignment_rule.assignment_rule.AssignmentRule"
+
+# (class, attribute, replacement); one replacement per method
+OVERRIDES = [
+    (HD_TICKET, "on_communication_update", "pw_helpdesk.customizations.ticket_events.patched_on_communication_update"),
+    (ASSIGNMENT_RULE, "apply_assign", "pw_helpdesk.customizations.ticket_events.patched_apply_assign"),
+    (HD_SLA, "apply", "pw_helpdesk.customizations.enhanced_sla.enhanced_sla_apply"),
+    (HD_SLA, "_assign_agent_via_rule", "pw_helpdesk.customizations.enhanced_sla._assign_agent_via_rule"),
+    (HD_SLA, "_assign_agent_via_team", "pw_helpdesk.customizations.enhanced_sla._assign_agent_via_team"),
+    (HD_TICKET, "apply_sla", "pw_helpdesk.customizations.enhanced_sla.enhanced_apply_sla"),
+]
+
+# "class.attribute" -> implementation defined on the class before it was overridden
+ORIGINALS = {}
+# "class.attribute" -> details of the installed override
+INSTALLED = {}
+
+
+def get_key(target, attribute):
+    return f"{target}.{attribute}"
+
+
+def get_class(target):
+    module, _sep, name = target.rpartition(".")
+    return getattr(frappe.get_module(module), name)
+
+
+def get_original(target, attribute):
+    """
+    Implementation of a method before pw_helpdesk overrode it
+
+    Args:
+        target: Dotted path of the class
+        attribute: Method name
+
+    Returns:
+        The original function, None if the class had no such attribute
+    """
+    key = get_key(target, attribute)
+    if key not in ORIGINALS:
+        # Not overridden yet, so the class still has its own implementation
+        cls = get_class(target)
+        ORIGINALS[key] = cls.__dict__[attribute] if attribute in cls.__dict__ else getattr(cls, attribute, None)
+    return ORIGINALS[key]
+
+
+def describe(function):
+    if function is None:
+        return None
+    function = getattr(function, "__func__", function)
+    return f"{function.__module__}.{function.__qualname__}"
+
+
+def apply_overrides(record_errors=True):
+    """
+    Install every registered override that is not installed yet, in this process
+
+    Args:
+        record_errors: Log failures and don't retry them. Imports pass False,
+            as a replacement module may still be partially imported
+    """
+    if len(INSTALLED) == len(OVERRIDES):
+        return
+
+    for target, attribute, replacement_path in OVERRIDES:
+        key = get_key(target, attribute)
+        if key in INSTALLED:
+            continue
+
+        try:
+            start = time.perf_counter()
+            cls = get_class(target)
+            class_import = time.perf_counter() - start
+
+            start = time.perf_counter()
+            replacement = frappe.get_attr(replacement_path)
+            replacement_import = time.perf_counter() - start
+
+            get_original(target, attribute)
+            setattr(cls, attribute, replacement)
+        except Exception as e:
+            if not record_errors:
+                continue
+            # Recorded so that later requests don't retry and log it again
+            INSTALLED[key] = {"error": str(e), "installed_on": now()}
+            frappe.log_error(f"Could not override {key} with {replacement_path}: {str(e)}", "Override Error")
+            continue
+
+        INSTALLED[key] = {
+            "implementation": describe(replacement),
+            "class_import_seconds": class_import,
+            "replacement_import_seconds": replacement_import,
+            "installed_on": now(),
+        }
+
+
+def get_active_implementations():
+    """
+    Which implementation of each overridden method is active in this process
+
+    Returns:
+        list: One dict per registered override
+    """
+    status = []
+    for target, attribute, replacement_path in OVERRIDES:
+        key = get_key(target, attribute)
+        installed = INSTALLED.get(key, {})
+        try:
+            active = describe(get_class(target).__dict__.get(attribute))
+            original = describe(get_original(target, attribute))
+        except Exception:
+            active = original = None
+
+        status.append({
+            "method": key,
+            "replacement": replacement_path,
+            "original": original,
+            "active": active,
+            "overridden": active is not None and active == installed.get("implementation"),
+            "class_import_seconds": installed.get("class_import_seconds"),
+            "replacement_import_seconds": installed.get("replacement_import_seconds"),
+            "installed_on": installed.get("installed_on"),
+            "error": installed.get("error"),
+        })
+    return status
+
+
+@frappe.whitelist()
+@instrumented
+def get_override_status():
+    """Report which implementation of each overridden method this worker runs"""
+    frappe.only_for(["System Manager"])
+    return get_active_implementations()
+
+
+apply_overrides(record_errors=False)
@@ -2,6 +2,11 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 
+from pw_helpdesk.customizations.agent_provisioning import ensure_hd_agents
+from pw_helpdesk.customizations.deferred import defer_each
+from pw_helpdesk.customizations.team_sync import apply_member_diff, get_dynamic_assignment_users
+from pw_helpdesk.instrumentation import instrumented
+
 
 class RealTimeAutomation:
     """Real-time automation for category conditions and dynamic user sync"""
@@ -71,54 +76,46 @@ class RealTimeAutomation:
         """
         Automatically sync HD Team users from Dynamic User Assignment
         Called on validate and after_save of HD Team
+
+        Rows of unchanged members are kept; only rows of added or removed
+        users change.
+
+        Returns:
+            int: Number of membership rows added or removed
         """
         if doc.doctype != "HD Team":
-            return
+            return 0
             
         try:
             # Check if team has custom_user_assignment linked
             if hasattr(doc, 'custom_user_assignment') and doc.custom_user_assignment:
-                # Get users from Dynamic User Assignment
-                dynamic_assignment = frappe.get_doc("Dynamic User Assignment", doc.custom_user_assignment)
+                dynamic_users = get_dynamic_assignment_users(doc.custom_user_assignment)
                 
-                if dynamic_assignment.assigned_users:
-                    # Get current users in team
-                    current_users = [user.user for user in doc.users] if doc.users else []
-                    
-                    # Get users from dynamic assignment
-                    dynamic_users = [user.user_id for user in dynamic_assignment.assigned_users]
+                if dynamic_users:
+                    result = apply_member_diff(doc, dynamic_users)
+                    rows_touched = len(result["added"]) + len(result["removed"])
                     
-                    # Only update if there's a difference
-                    if set(current_users) != set(dynamic_users):
-                        # Clear existing users
-                        doc.users = []
-                        
-                        # Add users from dynamic assignment
-                        for user_row in dynamic_assignment.assigned_users:
-                            if user_row.user_id:
-                                doc.append("users", {"user": user_row.user_id})
-                        
-                        frappe.msgprint(f"✅ Team users synced from Dynamic User Assignment: {dynamic_users}", indicator="green")
+                    if rows_touched:
+                        frappe.msgprint(
+                            f"✅ Team users synced from Dynamic User Assignment: "
+                            f"{len(result['added'])} added, {len(result['removed'])} removed",
+                            indicator="green"
+                        )
                         
                         # Also ensure these users exist as HD Agents
                         RealTimeAutomation.ensure_hd_agents_exist(dynamic_users)
+                    
+                    return rows_touched
                         
         except Exception as e:
             frappe.log_error(f"Error in sync_team_users_from_dynamic_assignment: {str(e)}")
+        
+        return 0
 
     @staticmethod
     def ensure_hd_agents_exist(users):
-        """Ensure HD Agent records exist for all users"""
-        for user in users:
-            if user and not frappe.db.exists("HD Agent", user):
-                try:
-                    agent = frappe.new_doc("HD Agent")
-                    agent.user = user
-                    agent.is_active = 1
-                    agent.save(ignore_permissions=True)
-                    print(f"Created HD Agent for {user}")
-                except Exception as e:
-                    frappe.log_error(f"Error creating HD Agent for {user}: {str(e)}")
+        """Ensure HD Agent records exist for all users once the current transaction commits"""
+        defer_each("hd_agents", ensure_hd_agents, users)
 
     @staticmethod
     def auto_set_team_assignment_rule(doc, method=None):
@@ -163,8 +160,8 @@ class RealTimeAutomation:
             # Check if team has dynamic user assignment
             if hasattr(team, 'custom_user_assignment') and team.custom_user_assignment:
                 # Sync users from dynamic assignment first
-                RealTimeAutomation.sync_team_users_from_dynamic_assignment(team, None)
-                team.save(ignore_permissions=True)
+                if RealTimeAutomation.sync_team_users_from_dynamic_assignment(team, None):
+                    team.save(ignore_permissions=True)
             
             # Use team's assignment rule if available
             assignment_rule = None
@@ -191,19 +188,23 @@ class RealTimeAutomation:
 
 # Hook functions for registering in hooks.py
 
+@instrumented
 def sla_real_time_validation(doc, method):
     """Real-time SLA validation and auto-updates"""
     RealTimeAutomation.auto_update_sla_condition(doc, method)
     RealTimeAutomation.auto_set_team_assignment_rule(doc, method)
 
+@instrumented
 def assignment_rule_real_time_validation(doc, method):
     """Real-time Assignment Rule validation and auto-updates"""
     RealTimeAutomation.auto_update_assignment_rule_condition(doc, method)
 
+@instrumented
 def team_real_time_sync(doc, method):
     """Real-time HD Team user sync from Dynamic User Assignment"""
     RealTimeAutomation.sync_team_users_from_dynamic_assignment(doc, method)
 
+@instrumented
 def ticket_enhanced_assignment(doc, method):
     """Enhanced ticket assignment with dynamic user sync"""
     RealTimeAutomation.enhanced_agent_assignment(doc, method) 
\ No newline at end of file
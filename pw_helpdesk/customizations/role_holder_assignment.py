@@ -0,0 +1,87 @@
+"""
+Assign tickets to holders of the permission role configured on an HD Category
+
+The enabled System Users holding a role are loaded with one query the first
+time the role is asked for and cached as a field of a Redis hash, so picking
+an assignee at ticket time is a hash lookup plus a Redis increment for
+round-robin. Automatic roles such as All are held by everyone and have no
+holders here. The hash is cleared whenever a User or Role record changes;
+roles are granted and revoked by saving the User.
+"""
+
+import frappe
+from frappe.permissions import AUTOMATIC_ROLES
+
+from pw_helpdesk.instrumentation import instrumented
+from pw_helpdesk.utils import next_sequence
+
+
+ROLE_HOLDERS_CACHE_KEY = "pw_helpdesk:role_holders"
+ROUND_ROBIN_KEY_PREFIX = "pw_helpdesk:role_holder_round_robin:"
+
+
+def load_role_holders(role):
+    """
+    Load the enabled System Users holding a role
+
+    Args:
+        role: Role name
+
+    Returns:
+        list: User names, sorted
+    """
+    return frappe.db.sql_list(
+        """
+        SELECT user.name
+        FROM `tabHas Role` has_role
+        INNER JOIN `tabUser` user ON user.name = has_role.parent
+        WHERE has_role.parenttype = 'User'
+            AND has_role.role = %(role)s
+            AND user.enabled = 1
+            AND user.user_type = 'System User'
+            AND user.name NOT IN ('Administrator', 'Guest')
+        ORDER BY user.name
+        """,
+        {"role": role}
+    )
+
+
+def get_role_holders(role):
+    """
+    Get the active users holding a role, cached per role
+
+    Args:
+        role: Role name
+
+    Returns:
+        list: User names, sorted
+    """
+    role = (role or "").strip()
+    if not role or role in AUTOMATIC_ROLES:
+        return []
+
+    return frappe.cache().hget(ROLE_HOLDERS_CACHE_KEY, role, generator=lambda: load_role_holders(role))
+
+
+def pick_role_holder(role):
+    """
+    Pick the next holder of a role in round-robin order
+
+    Args:
+        role: Role name
+
+    Returns:
+        str: User name, or None if nobody holds the role
+    """
+    holders = get_role_holders(role)
+    if not holders:
+        return None
+
+    position = next_sequence(f"{ROUND_ROBIN_KEY_PREFIX}{role}")
+    return holders[position % len(holders)]
+
+
+@instrumented
+def clear_role_holders_cache(doc=None, method=None):
+    """Drop the cached role holders of every role, used as User and Role doc event"""
+    frappe.cache().delete_value(ROLE_HOLDERS_CACHE_KEY)
@@ -0,0 +1,273 @@
+"""
+Diff-based sync of HD Team members from a Dynamic User Assignment
+
+Only membership rows of users that were added or removed are written: rows
+of removed users are deleted with one statement, rows of new users are
+inserted with one multi-row insert. Nothing is written when the sets match.
+
+Saving a Dynamic User Assignment queues one background job that syncs every
+HD Team and Assignment Rule linking it through custom_user_assignment.
+"""
+
+import frappe
+from frappe.utils import now
+
+from pw_helpdesk.customizations.agent_provisioning import ensure_hd_agents
+from pw_helpdesk.instrumentation import instrumented
+
+
+def get_dynamic_assignment_users(assignment_name):
+    """
+    Users of a Dynamic User Assignment, in order and without duplicates
+
+    Both table layouts in use are supported: `users` rows with a `user` field
+    and `assigned_users` rows with a `user_id` field.
+
+    Args:
+        assignment_name: Name of the Dynamic User Assignment
+
+    Returns:
+        list: User names
+    """
+    assignment = frappe.get_doc("Dynamic User Assignment", assignment_name)
+    rows = assignment.get("users") or assignment.get("assigned_users") or []
+    users = (row.get("user") or row.get("user_id") for row in rows)
+    return list(dict.fromkeys(user for user in users if user))
+
+
+def diff_members(current_users, desired_users):
+    """
+    Returns:
+        tuple: (users to add in desired order, users to remove)
+    """
+    current = set(current_users)
+    desired = set(desired_users)
+    return [user for user in desired_users if user not in current], current - desired
+
+
+def sync_child_users(parent_doctype, parent, parentfield, desired_users):
+    """
+    Make a user child table of a document match a list of users with direct row writes
+
+    Args:
+        parent_doctype: Doctype of the parent document
+        parent: Name of the parent document
+        parentfield: Table field holding one row per user in a `user` field
+        desired_users: Users the table should contain
+
+    Returns:
+        dict: Lists of added and removed users
+    """
+    return sync_child_users_bulk(parent_doctype, parentfield, {parent: desired_users})[parent]
+
+
+def sync_child_users_bulk(parent_doctype, parentfield, desired_users_by_parent):
+    """
+    sync_child_users for many documents of one doctype, with one read, one
+    delete and one insert for all of them
+
+    Args:
+        parent_doctype: Doctype of the parent documents
+        parentfield: Table field holding one row per user in a `user` field
+        desired_users_by_parent: Dict of parent name -> users its table should contain
+
+    Returns:
+        dict: Parent name -> lists of added and removed users
+    """
+    if not desired_users_by_parent:
+        return {}
+
+    child_doctype = frappe.get_meta(parent_doctype).get_field(parentfield).options
+    rows_by_parent = {parent: [] for parent in desired_users_by_parent}
+    for row in frappe.get_all(
+        child_doctype,
+        filters={
+            "parent": ["in", list(desired_users_by_parent)],
+            "parenttype": parent_doctype,
+            "parentfield": parentfield,
+        },
+        fields=["name", "parent", "user", "idx"],
+        order_by="idx asc"
+    ):
+        rows_by_parent[row.parent].append(row)
+
+    results = {}
+    removed_rows = []
+    new_rows = []
+    timestamp = now()
+    owner = frappe.session.user
+
+    for parent, desired_users in desired_users_by_parent.items():
+        rows = rows_by_parent[parent]
+        to_add, to_remove = diff_members([row.user for row in rows], desired_users)
+        results[parent] = {"added": to_add, "removed": sorted(to_remove)}
+
+        removed_rows.extend(row.name for row in rows if row.user in to_remove)
+        next_idx = max((row.idx for row in rows), default=0) + 1
+        new_rows.extend(
+            (frappe.generate_hash(length=10), timestamp, timestamp, owner, owner, 0, next_idx + offset,
+             parent, parent_doctype, parentfield, user)
+            for offset, user in enumerate(to_add)
+        )
+
+    if removed_rows:
+        frappe.db.delete(child_doctype, {"name": ["in", removed_rows]})
+
+    if new_rows:
+        frappe.db.bulk_insert(
+            child_doctype,
+            fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                    "parent", "parenttype", "parentfield", "user"],
+            values=new_rows
+        )
+
+    changed = [parent for parent, result in results.items() if result["added"] or result["removed"]]
+    if changed:
+        frappe.db.set_value(parent_doctype, {"name": ["in", changed]}, "modified", timestamp, update_modified=False)
+        for parent in changed:
+            frappe.clear_document_cache(parent_doctype, parent)
+
+    return results
+
+
+def sync_team_members(team_name, users=None):
+    """
+    Sync the members of an HD Team, and the users of its Assignment Rule, from
+    the team's Dynamic User Assignment
+
+    Args:
+        team_name: Name of the HD Team
+        users: Desired members, read from the team's Dynamic User Assignment if not given
+
+    Returns:
+        dict: Added and removed users and the number of rows touched, None if the
+            team has no Dynamic User Assignment
+    """
+    team = frappe.db.get_value(
+        "HD Team", team_name, ["name", "custom_user_assignment", "assignment_rule"], as_dict=True
+    )
+    if not team or not team.custom_user_assignment:
+        return None
+
+    if users is None:
+        users = get_dynamic_assignment_users(team.custom_user_assignment)
+
+    result = sync_child_users("HD Team", team_name, "users", users)
+    rows_touched = len(result["added"]) + len(result["removed"])
+
+    # The rule is compared with the team's users even when the team is in sync,
+    # since it may have been edited or have missed an earlier sync
+    if team.assignment_rule:
+        rule_result = sync_child_users("Assignment Rule", team.assignment_rule, "users", users)
+        rows_touched += len(rule_result["added"]) + len(rule_result["removed"])
+
+    result["rows_touched"] = rows_touched
+    return result
+
+
+def get_user_assignment_dependents(assignment_names):
+    """
+    HD Teams and Assignment Rules linking Dynamic User Assignments
+
+    Reads the indexed custom_user_assignment link of both doctypes, which is
+    the reverse index from an assignment to the documents built from it.
+
+    Returns:
+        dict: Doctype -> list of rows with name, custom_user_assignment and,
+            for HD Team, assignment_rule
+    """
+    return {
+        "HD Team": frappe.get_all(
+            "HD Team",
+            filters={"custom_user_assignment": ["in", assignment_names]},
+            fields=["name", "custom_user_assignment", "assignment_rule"]
+        ),
+        "Assignment Rule": frappe.get_all(
+            "Assignment Rule",
+            filters={"custom_user_assignment": ["in", assignment_names]},
+            fields=["name", "custom_user_assignment"]
+        ),
+    }
+
+
+@instrumented
+def sync_user_assignment_dependents(assignment_names):
+    """
+    Sync the users of every HD Team and Assignment Rule built from the given
+    Dynamic User Assignments, run in the background after an assignment changes
+
+    The members of all teams are written with one delete and one insert, and
+    so are the users of all rules. A team's own Assignment Rule gets the team's
+    users unless the rule links a Dynamic User Assignment itself.
+
+    Args:
+        assignment_names: Dynamic User Assignment names
+
+    Returns:
+        dict: Number of teams and rules changed and membership rows touched
+    """
+    if isinstance(assignment_names, str):
+        assignment_names = [assignment_names]
+
+    dependents = get_user_assignment_dependents(assignment_names)
+    if not dependents["HD Team"] and not dependents["Assignment Rule"]:
+        return {"teams": 0, "rules": 0, "rows_touched": 0}
+
+    users_by_assignment = {name: get_dynamic_assignment_users(name) for name in assignment_names}
+
+    team_users = {
+        team.name: users_by_assignment[team.custom_user_assignment] for team in dependents["HD Team"]
+    }
+    rule_users = {
+        team.assignment_rule: team_users[team.name] for team in dependents["HD Team"] if team.assignment_rule
+    }
+    rule_users.update({
+        rule.name: users_by_assignment[rule.custom_user_assignment] for rule in dependents["Assignment Rule"]
+    })
+
+    ensure_hd_agents(user for users in team_users.values() for user in users)
+
+    team_results = sync_child_users_bulk("HD Team", "users", team_users)
+    rule_results = sync_child_users_bulk("Assignment Rule", "users", rule_users)
+
+    team_rows = [len(result["added"]) + len(result["removed"]) for result in team_results.values()]
+    rule_rows = [len(result["added"]) + len(result["removed"]) for result in rule_results.values()]
+    return {
+        "teams": sum(1 for rows in team_rows if rows),
+        "rules": sum(1 for rows in rule_rows if rows),
+        "rows_touched": sum(team_rows) + sum(rule_rows),
+    }
+
+
+@instrumented
+def on_user_assignment_update(doc, method=None):
+    """
+    Queue one background sync of the documents built from a Dynamic User
+    Assignment once its change is committed
+
+    Repeated saves of the same assignment before the job runs queue it once.
+    """
+    frappe.enqueue(
+        "pw_helpdesk.customizations.team_sync.sync_user_assignment_dependents",
+        queue="default",
+        job_id=f"pw_helpdesk:user_assignment_sync:{doc.name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        assignment_names=[doc.name]
+    )
+
+
+def apply_member_diff(team_doc, users):
+    """
+    Make the users table of an HD Team document being saved match a list of users,
+    keeping rows of unchanged members
+
+    Returns:
+        dict: Lists of added and removed users
+    """
+    to_add, to_remove = diff_members([row.user for row in team_doc.users], users)
+    if to_remove:
+        team_doc.users = [row for row in team_doc.users if row.user not in to_remove]
+    for user in to_add:
+        team_doc.append("users", {"user": user})
+    return {"added": to_add, "removed": sorted(to_remove)}
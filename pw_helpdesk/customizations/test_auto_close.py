@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from pw_helpdesk.customizations import auto_close
+from pw_helpdesk.customizations.auto_close import auto_close_resolved_tickets, close_tickets
+
+
+def make_resolved_ticket(days_ago, resolution_details="Fixed"):
+    """A ticket Resolved and last modified `days_ago` days ago"""
+    name = frappe.get_doc({
+        "doctype": "HD Ticket",
+        "subject": "Auto close ticket",
+        "raised_by": "Administrator",
+        "description": "Auto close ticket",
+    }).insert(ignore_permissions=True).name
+    frappe.db.set_value(
+        "HD Ticket", name,
+        {
+            "status": "Resolved",
+            "resolution_details": resolution_details,
+            "modified": add_to_date(now_datetime(), days=-days_ago),
+        },
+        update_modified=False
+    )
+    return name
+
+
+class TestAutoClose(FrappeTestCase):
+    def setUp(self):
+        self.configured_days = frappe.conf.get("pw_helpdesk_auto_close_days")
+        days = auto_close.get_auto_close_days() or auto_close.DEFAULT_AUTO_CLOSE_DAYS
+        frappe.conf.pw_helpdesk_auto_close_days = days
+        self.old_tickets = [make_resolved_ticket(days + 3), make_resolved_ticket(days + 2)]
+        self.new_ticket = make_resolved_ticket(days - 1)
+
+    def tearDown(self):
+        frappe.conf.pw_helpdesk_auto_close_days = self.configured_days
+
+    def get_status(self, name):
+        return frappe.db.get_value("HD Ticket", name, "status")
+
+    def test_closes_only_tickets_past_cutoff(self):
+        """Test that only tickets Resolved longer than the idle window are closed, batch by batch"""
+        get_candidates = auto_close.get_auto_close_candidates
+        with patch.object(auto_close, "get_auto_close_candidates", wraps=get_candidates) as candidates:
+            with patch.object(frappe.db, "commit"):
+                closed = auto_close_resolved_tickets(batch_size=1)
+
+        for name in self.old_tickets:
+            self.assertEqual(self.get_status(name), "Closed")
+            self.assertTrue(frappe.db.get_value("HD Ticket", name, "resolution_date"))
+        self.assertEqual(self.get_status(self.new_ticket), "Resolved")
+        self.assertGreaterEqual(closed, len(self.old_tickets))
+
+        # The keyset cursor starts empty and moves forward after every batch
+        cursors = [call.args[1] for call in candidates.call_args_list]
+        self.assertIsNone(cursors[0])
+        self.assertGreater(len(cursors), len(self.old_tickets))
+        self.assertEqual(cursors[1:], sorted(cursors[1:]))
+        self.assertEqual(len(set(cursors[1:])), len(cursors) - 1)
+
+    def test_time_budget_stops_the_run(self):
+        """Test that a run without time budget left closes nothing"""
+        self.assertEqual(auto_close_resolved_tickets(batch_size=1, time_budget=0), 0)
+        self.assertEqual(self.get_status(self.old_tickets[0]), "Resolved")
+
+    def test_ticket_changed_after_scan_is_skipped(self):
+        """Test that a candidate modified after the scan is not closed"""
+        cutoff = add_to_date(now_datetime(), days=-auto_close.get_auto_close_days())
+        frappe.db.set_value("HD Ticket", self.old_tickets[1], "modified", now_datetime(), update_modified=False)
+
+        self.assertEqual(close_tickets(self.old_tickets, cutoff, auto_close.get_auto_close_days()), 1)
+        self.assertEqual(self.get_status(self.old_tickets[0]), "Closed")
+        self.assertEqual(self.get_status(self.old_tickets[1]), "Resolved")
+
+    def test_ticket_without_resolution_details_is_skipped(self):
+        """Test that a ticket without Resolution Details is left Resolved, as closing requires them"""
+        days = auto_close.get_auto_close_days()
+        undocumented = make_resolved_ticket(days + 4, resolution_details=None)
+
+        with patch.object(frappe.db, "commit"):
+            auto_close_resolved_tickets()
+
+        self.assertEqual(self.get_status(undocumented), "Resolved")
+        self.assertEqual(self.get_status(self.old_tickets[0]), "Closed")
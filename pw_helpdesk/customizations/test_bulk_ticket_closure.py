@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from pw_helpdesk.customizations import bulk_ticket_closure
+from pw_helpdesk.customizations.bulk_ticket_closure import bulk_update_ticket_status
+
+
+RAISER = "bulk-closure-raiser@example.com"
+OTHER_RAISER = "bulk-closure-other@example.com"
+
+
+def make_user(email):
+    if not frappe.db.exists("User", email):
+        frappe.get_doc({
+            "doctype": "User",
+            "email": email,
+            "first_name": email.split("@")[0],
+            "send_welcome_email": 0,
+        }).insert(ignore_permissions=True)
+
+
+def make_ticket(raised_by, subject):
+    return frappe.get_doc({
+        "doctype": "HD Ticket",
+        "subject": subject,
+        "raised_by": raised_by,
+        "description": subject,
+    }).insert(ignore_permissions=True).name
+
+
+class TestBulkTicketClosure(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        make_user(RAISER)
+        make_user(OTHER_RAISER)
+
+    def setUp(self):
+        self.subject = f"Bulk closure {frappe.generate_hash(length=8)}"
+        self.own_ticket = make_ticket(RAISER, self.subject)
+        self.other_ticket = make_ticket(OTHER_RAISER, self.subject)
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+
+    def test_ticket_list_restricted_to_raiser(self):
+        """Test that users without delete permission may only resolve tickets they raised"""
+        frappe.set_user(RAISER)
+        result = bulk_update_ticket_status(tickets=[self.own_ticket, self.other_ticket])
+
+        self.assertTrue(result["results"][self.own_ticket]["success"])
+        self.assertFalse(result["results"][self.other_ticket]["success"])
+        self.assertEqual(frappe.db.get_value("HD Ticket", self.other_ticket, "status"), "Open")
+
+    def test_filters_restricted_to_raiser(self):
+        """Test that filters of users without delete permission only match tickets they raised"""
+        frappe.set_user(RAISER)
+        result = bulk_update_ticket_status(filters={"subject": self.subject})
+
+        self.assertEqual(list(result["results"]), [self.own_ticket])
+        self.assertEqual(frappe.db.get_value("HD Ticket", self.other_ticket, "status"), "Open")
+
+    def test_filters_not_restricted_for_managers(self):
+        """Test that System Managers resolve every ticket matching the filters"""
+        result = bulk_update_ticket_status(filters={"subject": self.subject})
+
+        self.assertEqual(result["updated"], 2)
+        self.assertEqual(set(result["results"]), {self.own_ticket, self.other_ticket})
+
+    def test_max_bulk_tickets(self):
+        """Test that batches larger than MAX_BULK_TICKETS are rejected"""
+        with patch.object(bulk_ticket_closure, "MAX_BULK_TICKETS", 1):
+            with self.assertRaises(frappe.ValidationError):
+                bulk_update_ticket_status(tickets=[self.own_ticket, self.other_ticket])
+
+        self.assertEqual(frappe.db.get_value("HD Ticket", self.own_ticket, "status"), "Open")
+
+    def test_concurrently_closed_ticket_skipped(self):
+        """Test that a ticket closed after the batch was loaded is reported and left alone"""
+        get_all = frappe.get_all
+
+        def get_all_then_close(*args, **kwargs):
+            rows = get_all(*args, **kwargs)
+            frappe.db.set_value("HD Ticket", self.other_ticket, "status", "Closed")
+            return rows
+
+        with patch.object(bulk_ticket_closure.frappe, "get_all", side_effect=get_all_then_close):
+            result = bulk_update_ticket_status(
+                tickets=[self.own_ticket, self.other_ticket], resolution_notes="Fixed in bulk"
+            )
+
+        self.assertEqual(result["updated"], 1)
+        self.assertTrue(result["results"][self.own_ticket]["success"])
+        self.assertFalse(result["results"][self.other_ticket]["success"])
+        self.assertEqual(frappe.db.get_value("HD Ticket", self.other_ticket, "status"), "Closed")
+        self.assertFalse(frappe.db.exists("HD Ticket Comment", {"ticket": self.other_ticket}))
+
+    def test_close_requires_resolution_details(self):
+        """Test that only tickets with Resolution Details are closed"""
+        frappe.db.set_value("HD Ticket", self.own_ticket, "resolution_details", "Fixed")
+
+        result = bulk_update_ticket_status(tickets=[self.own_ticket, self.other_ticket], action="close")
+
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(frappe.db.get_value("HD Ticket", self.own_ticket, "status"), "Closed")
+        self.assertEqual(
+            result["results"][self.other_ticket]["error"],
+            "Resolution Details are required before closing a ticket"
+        )
+        self.assertEqual(frappe.db.get_value("HD Ticket", self.other_ticket, "status"), "Open")
@@ -0,0 +1,124 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from pw_helpdesk.customizations.notification_outbox import (
+    MAX_ATTEMPTS,
+    OUTBOX_DOCTYPE,
+    delete_old_notifications,
+    drain_notification_outbox,
+    queue_notifications,
+    send_digest,
+)
+
+
+class TestNotificationOutbox(FrappeTestCase):
+    def setUp(self):
+        self.recipient = f"outbox-{frappe.generate_hash(length=8)}@example.com"
+
+    def queue(self, count=2, days_old=0, minutes_old=60):
+        """Queue notifications for the test recipient, created in the past"""
+        existing = set(frappe.get_all(OUTBOX_DOCTYPE, filters={"recipient": self.recipient}, pluck="name"))
+        queue_notifications([
+            {
+                "notification_type": "Ticket Resolved",
+                "recipient": self.recipient,
+                "ticket": f"TICKET-{number}",
+                "ticket_subject": f"Outbox ticket {number}",
+                "actor": "Administrator",
+                "notes": "Fixed",
+            }
+            for number in range(count)
+        ])
+        names = [
+            name for name in frappe.get_all(OUTBOX_DOCTYPE, filters={"recipient": self.recipient}, pluck="name")
+            if name not in existing
+        ]
+        frappe.db.set_value(
+            OUTBOX_DOCTYPE,
+            {"name": ["in", names]},
+            "creation",
+            add_to_date(now_datetime(), days=-days_old, minutes=-minutes_old),
+            update_modified=False
+        )
+        return names
+
+    def get_rows(self):
+        return frappe.get_all(
+            OUTBOX_DOCTYPE,
+            filters={"recipient": self.recipient},
+            fields=["name", "status", "attempts", "next_attempt_after", "sent_on"]
+        )
+
+    def get_emails(self, sendmail):
+        """Calls of the patched sendmail for the test recipient, other rows may be due too"""
+        return [call for call in sendmail.call_args_list if call.kwargs.get("recipients") == [self.recipient]]
+
+    def test_drain_sends_one_digest(self):
+        """Test that due notifications of a recipient are sent as one email and marked Sent"""
+        self.queue(count=2)
+
+        with patch.object(frappe, "sendmail") as sendmail, patch.object(frappe.db, "commit"):
+            drain_notification_outbox()
+
+        self.assertEqual(len(self.get_emails(sendmail)), 1)
+        for row in self.get_rows():
+            self.assertEqual(row.status, "Sent")
+            self.assertTrue(row.sent_on)
+
+    def test_drain_waits_for_digest_window(self):
+        """Test that notifications younger than the digest window stay queued"""
+        self.queue(count=1, minutes_old=0)
+
+        with patch.object(frappe, "sendmail") as sendmail, patch.object(frappe.db, "commit"):
+            drain_notification_outbox()
+
+        self.assertFalse(self.get_emails(sendmail))
+        self.assertEqual(self.get_rows()[0].status, "Queued")
+
+    def test_failed_send_is_retried(self):
+        """Test that a failed send counts an attempt and backs off until the last attempt fails"""
+        names = self.queue(count=1)
+
+        with patch.object(frappe, "sendmail", side_effect=Exception("SMTP down")):
+            self.assertFalse(send_digest(self.recipient, "Ticket Resolved"))
+
+        row = self.get_rows()[0]
+        self.assertEqual(row.status, "Queued")
+        self.assertEqual(row.attempts, 1)
+        self.assertGreater(row.next_attempt_after, now_datetime())
+
+        with patch.object(frappe, "sendmail") as sendmail:
+            # Not due again until the backoff has passed
+            self.assertFalse(send_digest(self.recipient, "Ticket Resolved"))
+        sendmail.assert_not_called()
+
+        frappe.db.set_value(
+            OUTBOX_DOCTYPE, names[0], {"attempts": MAX_ATTEMPTS - 1, "next_attempt_after": None},
+            update_modified=False
+        )
+        with patch.object(frappe, "sendmail", side_effect=Exception("SMTP down")):
+            send_digest(self.recipient, "Ticket Resolved")
+
+        row = self.get_rows()[0]
+        self.assertEqual(row.status, "Failed")
+        self.assertEqual(row.attempts, MAX_ATTEMPTS)
+
+    def test_delete_old_notifications(self):
+        """Test that only sent and failed notifications past the retention period are deleted"""
+        old_sent, old_failed, old_queued = self.queue(count=3, days_old=60)
+        (recent_sent,) = self.queue(count=1)
+        frappe.db.set_value(
+            OUTBOX_DOCTYPE, {"name": ["in", [old_sent, recent_sent]]}, "status", "Sent", update_modified=False
+        )
+        frappe.db.set_value(OUTBOX_DOCTYPE, old_failed, "status", "Failed", update_modified=False)
+
+        delete_old_notifications()
+
+        remaining = {row.name for row in self.get_rows()}
+        self.assertNotIn(old_sent, remaining)
+        self.assertNotIn(old_failed, remaining)
+        self.assertIn(old_queued, remaining)
+        self.assertIn(recent_sent, remaining)
@@ -0,0 +1,145 @@
+"""
+Query budgets for the HD Ticket save path and the closure and SLA APIs
+
+Each check counts the SQL statements an operation issues and fails when the
+count exceeds the budget stored in query_budgets.json, with a diff between
+the stored and the current queries. An operation without a stored budget
+has its current queries recorded as the budget, so the first run on a bench
+site fills in query_budgets.json, which is then committed. Operations are run
+once before they are measured so that metadata and settings caches are warm.
+
+To record new budgets for every operation after an intended change:
+
+    PW_HELPDESK_UPDATE_QUERY_BUDGETS=1 bench --site <site> run-tests --module pw_helpdesk.customizations.test_query_budget
+"""
+
+import difflib
+import json
+import os
+import re
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from pw_helpdesk.customizations.api.sla_management import check_sla_status, get_applicable_sla
+from pw_helpdesk.customizations.ticket_closure_workflow import mark_as_resolved, request_closure
+from pw_helpdesk.instrumentation import count_queries
+
+
+QUERY_BUDGETS_FILE = os.path.join(os.path.dirname(__file__), "query_budgets.json")
+UPDATE_BUDGETS_ENV = "PW_HELPDESK_UPDATE_QUERY_BUDGETS"
+
+RAISER = "query-budget-raiser@example.com"
+
+LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalize_query(query):
+    """Query text without literals and extra whitespace, so runs can be compared"""
+    query = LITERALS.sub("?", " ".join(str(query).split()))
+    return PLACEHOLDER_LISTS.sub("?", query)
+
+
+def make_ticket(raised_by="Administrator"):
+    return frappe.get_doc({
+        "doctype": "HD Ticket",
+        "subject": "Query budget ticket",
+        "raised_by": raised_by,
+        "description": "Query budget ticket",
+    }).insert(ignore_permissions=True)
+
+
+class TestQueryBudget(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.update_budgets = bool(os.environ.get(UPDATE_BUDGETS_ENV))
+        cls.recorded = {}
+        if os.path.exists(QUERY_BUDGETS_FILE):
+            with open(QUERY_BUDGETS_FILE) as file:
+                cls.budgets = json.load(file)
+        else:
+            cls.budgets = {}
+
+        if not frappe.db.exists("User", RAISER):
+            frappe.get_doc({
+                "doctype": "User",
+                "email": RAISER,
+                "first_name": "Query Budget Raiser",
+                "send_welcome_email": 0,
+            }).insert(ignore_permissions=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.recorded:
+            budgets = {**cls.budgets, **cls.recorded}
+            with open(QUERY_BUDGETS_FILE, "w") as file:
+                json.dump(dict(sorted(budgets.items())), file, indent=1)
+                file.write("\n")
+        super().tearDownClass()
+
+    def setUp(self):
+        frappe.set_user("Administrator")
+
+    def assertWithinBudget(self, name, function):
+        """Run function, counting its queries, and compare them with the stored budget"""
+        with count_queries(record=True) as queries:
+            function()
+
+        current = [normalize_query(query) for query in queries.queries]
+        if self.update_budgets:
+            self.recorded[name] = {"budget": len(current), "queries": current}
+            return
+
+        budget = self.budgets.get(name)
+        if not budget:
+            self.recorded[name] = {"budget": len(current), "queries": current}
+            print(f"No query budget stored for {name}, recorded {len(current)} queries in {QUERY_BUDGETS_FILE}")
+            return
+
+        if len(current) > budget["budget"]:
+            diff = "\n".join(difflib.unified_diff(
+                budget["queries"], current, fromfile="budget", tofile="current", lineterm=""
+            ))
+            self.fail(f"{name} issued {len(current)} queries, budget is {budget['budget']}:\n{diff}")
+
+    def test_ticket_insert(self):
+        make_ticket()
+        self.assertWithinBudget("ticket_insert", make_ticket)
+
+    def test_ticket_save(self):
+        ticket = make_ticket()
+        ticket.subject = "Query budget ticket, warm up"
+        ticket.save(ignore_permissions=True)
+
+        ticket.subject = "Query budget ticket, edited"
+        self.assertWithinBudget("ticket_save", lambda: ticket.save(ignore_permissions=True))
+
+    def test_mark_as_resolved(self):
+        mark_as_resolved(ticket_id=make_ticket().name, resolution_notes="Warm up")
+
+        ticket = make_ticket()
+        self.assertWithinBudget(
+            "mark_as_resolved",
+            lambda: mark_as_resolved(ticket_id=ticket.name, resolution_notes="Fixed")
+        )
+
+    def test_request_closure(self):
+        request_closure(ticket_id=make_ticket(RAISER).name, resolution_notes="Warm up")
+
+        ticket = make_ticket(RAISER)
+        self.assertWithinBudget(
+            "request_closure",
+            lambda: request_closure(ticket_id=ticket.name, resolution_notes="Fixed")
+        )
+
+    def test_get_applicable_sla(self):
+        get_applicable_sla("QUERY_BUDGET_CATEGORY")
+        self.assertWithinBudget("get_applicable_sla", lambda: get_applicable_sla("QUERY_BUDGET_CATEGORY"))
+
+    def test_check_sla_status(self):
+        check_sla_status(make_ticket().name)
+
+        ticket = make_ticket()
+        self.assertWithinBudget("check_sla_status", lambda: check_sla_status(ticket.name))
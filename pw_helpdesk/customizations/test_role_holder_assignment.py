@@ -0,0 +1,68 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from pw_helpdesk.customizations.role_holder_assignment import get_role_holders, pick_role_holder
+
+
+def make_user(email, roles=()):
+    user = frappe.get_doc({
+        "doctype": "User",
+        "email": email,
+        "first_name": email.split("@")[0],
+        "send_welcome_email": 0,
+    }).insert(ignore_permissions=True)
+    if roles:
+        user.add_roles(*roles)
+    return user
+
+
+class TestRoleHolderAssignment(FrappeTestCase):
+    def setUp(self):
+        suffix = frappe.generate_hash(length=8)
+        self.role = f"PW Role Holder {suffix}"
+        frappe.get_doc({"doctype": "Role", "role_name": self.role, "desk_access": 1}).insert(ignore_permissions=True)
+        self.holders = sorted(
+            make_user(f"role-holder-{number}-{suffix}@example.com", roles=[self.role]).name
+            for number in range(3)
+        )
+        self.outsider = make_user(f"role-outsider-{suffix}@example.com")
+
+    def test_round_robin_order(self):
+        """Test that consecutive picks cycle through every holder in the same order"""
+        picks = [pick_role_holder(self.role) for _ in range(2 * len(self.holders))]
+
+        self.assertEqual(sorted(picks[:3]), self.holders)
+        self.assertEqual(picks[3:], picks[:3])
+
+    def test_no_holders(self):
+        """Test that a role nobody holds picks no one"""
+        self.assertIsNone(pick_role_holder(f"PW Unheld Role {frappe.generate_hash(length=8)}"))
+
+    def test_automatic_role_has_no_holders(self):
+        """Test that automatic roles held by every user are never assigned from"""
+        self.assertEqual(get_role_holders("All"), [])
+        self.assertIsNone(pick_role_holder("All"))
+
+    def test_website_users_not_holders(self):
+        """Test that users who are not System Users are not picked"""
+        frappe.db.set_value("User", self.holders[0], "user_type", "Website User")
+        frappe.get_doc("Role", self.role).save(ignore_permissions=True)
+
+        self.assertEqual(get_role_holders(self.role), self.holders[1:])
+
+    def test_cache_cleared_when_role_granted(self):
+        """Test that a user who gains the role is picked up despite the cached map"""
+        self.assertEqual(get_role_holders(self.role), self.holders)
+
+        self.outsider.add_roles(self.role)
+
+        self.assertIn(self.outsider.name, get_role_holders(self.role))
+
+    def test_cache_cleared_when_role_revoked(self):
+        """Test that a user who loses the role is dropped despite the cached map"""
+        self.assertIn(self.holders[0], get_role_holders(self.role))
+
+        frappe.get_doc("User", self.holders[0]).remove_roles(self.role)
+
+        self.assertNotIn(self.holders[0], get_role_holders(self.role))
+        self.assertEqual(len(get_role_holders(self.role)), len(self.holders) - 1)
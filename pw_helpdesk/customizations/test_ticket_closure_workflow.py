@@ -0,0 +1,89 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from pw_helpdesk.customizations.ticket_closure_workflow import (
+    get_bulk_closure_permissions,
+    get_closure_permissions,
+)
+
+
+RAISER = "closure-permissions-raiser@example.com"
+AGENT = "closure-permissions-agent@example.com"
+
+PERMISSION_KEYS = ("can_mark_resolved", "can_request_closure", "error")
+
+
+def make_user(email, roles=()):
+    if not frappe.db.exists("User", email):
+        user = frappe.get_doc({
+            "doctype": "User",
+            "email": email,
+            "first_name": email.split("@")[0],
+            "send_welcome_email": 0,
+        }).insert(ignore_permissions=True)
+        if roles:
+            user.add_roles(*roles)
+
+
+def make_ticket(raised_by, **values):
+    ticket = frappe.get_doc({
+        "doctype": "HD Ticket",
+        "subject": "Closure permissions ticket",
+        "raised_by": raised_by,
+        "description": "Closure permissions ticket",
+    }).insert(ignore_permissions=True)
+    if values:
+        frappe.db.set_value("HD Ticket", ticket.name, values)
+    return ticket.name
+
+
+class TestClosurePermissions(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        make_user(RAISER)
+        make_user(AGENT, roles=["Agent"])
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+
+    def get_tickets(self, user):
+        """Tickets the user raised, tickets someone else raised, closed, closure requested and missing ones"""
+        return {
+            "raiser": make_ticket(user),
+            "agent": make_ticket(RAISER),
+            "closed": make_ticket(RAISER, status="Closed"),
+            "resolved": make_ticket(user, status="Resolved"),
+            "closure_requested": make_ticket(RAISER, custom_closure_requested=1),
+            "missing": f"missing-{frappe.generate_hash(length=8)}",
+        }
+
+    def test_bulk_matches_single_ticket_permissions(self):
+        """Test that the bulk endpoint reports the same actions as the single-ticket one"""
+        for user in ("Administrator", AGENT):
+            frappe.set_user("Administrator")
+            tickets = self.get_tickets(user)
+
+            frappe.set_user(user)
+            bulk = get_bulk_closure_permissions(list(tickets.values()))
+            for case, ticket_id in tickets.items():
+                single = get_closure_permissions(ticket_id=ticket_id)
+                with self.subTest(user=user, case=case):
+                    self.assertEqual(
+                        {key: bulk[ticket_id].get(key) for key in PERMISSION_KEYS},
+                        {key: single.get(key) for key in PERMISSION_KEYS}
+                    )
+
+    def test_bulk_permissions_by_case(self):
+        """Test the actions reported for each kind of ticket"""
+        tickets = self.get_tickets("Administrator")
+        permissions = get_bulk_closure_permissions(frappe.as_json(list(tickets.values())))
+
+        self.assertTrue(permissions[tickets["raiser"]]["can_mark_resolved"])
+        self.assertFalse(permissions[tickets["raiser"]]["can_request_closure"])
+        self.assertTrue(permissions[tickets["agent"]]["can_request_closure"])
+        self.assertFalse(permissions[tickets["closure_requested"]]["can_request_closure"])
+        for case in ("closed", "resolved", "missing"):
+            self.assertFalse(permissions[tickets[case]]["can_mark_resolved"])
+            self.assertFalse(permissions[tickets[case]]["can_request_closure"])
+        self.assertEqual(permissions[tickets["missing"]]["error"], "Ticket not found")
@@ -1,9 +1,14 @@
+import json
+
 import frappe
 from frappe import _
-from frappe.utils import now, get_fullname
+
+from pw_helpdesk.customizations import closure_state_machine
+from pw_helpdesk.instrumentation import instrumented
 
 
 @frappe.whitelist()
+@instrumented
 def mark_as_resolved(**kwargs):
     """
     Mark ticket as resolved by the ticket raiser or system manager
@@ -15,67 +20,7 @@ def mark_as_resolved(**kwargs):
     if not ticket_id:
         frappe.throw(_("Ticket ID is required"))
     
-    if not frappe.db.exists("HD Ticket", ticket_id):
-        frappe.throw(_("Ticket not found"))
-    
-    ticket = frappe.get_doc("HD Ticket", ticket_id)
-    current_user = frappe.session.user
-    
-    # Check permissions: only ticket raiser or System Manager can mark as resolved
-    if current_user != ticket.raised_by and not frappe.has_permission("HD Ticket", "delete"):
-        frappe.throw(_("Only the ticket raiser or System Manager can mark tickets as resolved"))
-    
-    # Check if ticket is already closed or resolved
-    if ticket.status in ["Closed", "Resolved"]:
-        frappe.throw(_("Ticket is already {0}").format(ticket.status))
-    
-    # Mark as resolved
-    ticket.status = "Resolved"
-    ticket.resolution_date = now()
-    
-    # Add resolution comment
-    if resolution_notes:
-        comment = frappe.get_doc({
-            "doctype": "HD Ticket Comment",
-            "ticket": ticket_id,
-            "commented_by": current_user,
-            "content": f"""
-            <div style="background-color: #d4edda; border: 1px solid #c3e6cb; padding: 10px; border-radius: 5px; margin: 10px 0;">
-                <strong>✅ Ticket Marked as Resolved</strong><br/>
-                <strong>Resolution Notes:</strong><br/>
-                {resolution_notes}
-                <br/><br/>
-                <em>Resolved by: {get_fullname(current_user)}</em>
-            </div>
-            """,
-            "is_system": 1
-        }).insert(ignore_permissions=True)
-    
-    ticket.save(ignore_permissions=True)
-    
-    # Send notification to assigned agents if any
-    if hasattr(ticket, '_assign') and ticket._assign:
-        try:
-            import json
-            assigned_users = json.loads(ticket._assign) if isinstance(ticket._assign, str) else ticket._assign
-            
-            for user in assigned_users:
-                if user != current_user:
-                    frappe.sendmail(
-                        recipients=[user],
-                        subject=f"Ticket #{ticket.name} Resolved",
-                        message=f"""
-                        <p>Hello,</p>
-                        <p>Ticket <strong>#{ticket.name}</strong> has been marked as resolved by the customer.</p>
-                        <p><strong>Subject:</strong> {ticket.subject}</p>
-                        <p><strong>Resolution Notes:</strong></p>
-                        <p>{resolution_notes}</p>
-                        <p>Thank you for your assistance with this ticket.</p>
-                        <p>Best regards,<br/>Support System</p>
-                        """
-                    )
-        except Exception as e:
-            frappe.log_error(f"Failed to send resolution notification: {str(e)}")
+    ticket = closure_state_machine.resolve(ticket_id, resolution_notes)
     
     return {
         "message": "Ticket marked as resolved successfully",
@@ -85,6 +30,7 @@ def mark_as_resolved(**kwargs):
 
 
 @frappe.whitelist()
+@instrumented
 def request_closure(**kwargs):
     """
     Request ticket closure by agents - sends notification to ticket raiser
@@ -95,74 +41,7 @@ def request_closure(**kwargs):
     if not ticket_id:
         frappe.throw(_("Ticket ID is required"))
     
-    if not resolution_notes:
-        frappe.throw(_("Resolution notes are required"))
-    
-    if not frappe.db.exists("HD Ticket", ticket_id):
-        frappe.throw(_("Ticket not found"))
-    
-    ticket = frappe.get_doc("HD Ticket", ticket_id)
-    current_user = frappe.session.user
-    
-    # Check if user has permission to request closure (agents only)
-    if not frappe.has_permission("HD Ticket", "write", doc=ticket):
-        frappe.throw(_("You don't have permission to request closure for this ticket"))
-    
-    # Check if current user is the ticket raiser (they should use mark as resolved instead)
-    if current_user == ticket.raised_by:
-        frappe.throw(_("As the ticket raiser, please use 'Mark as Resolved' instead"))
-    
-    # Check if ticket is already closed or resolved
-    if ticket.status in ["Closed", "Resolved"]:
-        frappe.throw(_("Ticket is already {0}").format(ticket.status))
-    
-    # Create a comment indicating closure request
-    comment = frappe.get_doc({
-        "doctype": "HD Ticket Comment",
-        "ticket": ticket_id,
-        "commented_by": current_user,
-        "content": f"""
-        <div style="background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 10px 0;">
-            <strong>🔔 Closure Requested by Agent</strong><br/>
-            <strong>Agent:</strong> {get_fullname(current_user)}<br/>
-            <strong>Resolution Notes:</strong><br/>
-            {resolution_notes}
-            <br/><br/>
-            <em>This ticket has been marked for closure by the resolving agent. 
-            The ticket can be resolved by the person who raised it.</em>
-        </div>
-        """,
-        "is_system": 1
-    }).insert(ignore_permissions=True)
-    
-    # Set custom flag to track closure request
-    ticket.add_comment("Info", f"Closure requested by {get_fullname(current_user)}: {resolution_notes}")
-    ticket.save(ignore_permissions=True)
-    
-    # Send notification to ticket raiser
-    if ticket.raised_by and ticket.raised_by != current_user:
-        try:
-            frappe.sendmail(
-                recipients=[ticket.raised_by],
-                subject=f"Closure Requested for Ticket #{ticket.name}",
-                message=f"""
-                <p>Hello,</p>
-                <p>The agent working on your ticket <strong>#{ticket.name}</strong> has requested to close it.</p>
-                <p><strong>Subject:</strong> {ticket.subject}</p>
-                <p><strong>Agent:</strong> {get_fullname(current_user)}</p>
-                <p><strong>Resolution Notes:</strong></p>
-                <p>{resolution_notes}</p>
-                <p>If you are satisfied with the resolution, you can mark the ticket as resolved. 
-                Otherwise, please reply with additional questions or concerns.</p>
-                <p><a href="{frappe.utils.get_url()}/app/hd-ticket/{ticket.name}" 
-                   style="background-color: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">
-                   View Ticket
-                </a></p>
-                <p>Best regards,<br/>Support Team</p>
-                """
-            )
-        except Exception as e:
-            frappe.log_error(f"Failed to send closure notification: {str(e)}")
+    ticket = closure_state_machine.request_closure(ticket_id, resolution_notes)
     
     return {
         "message": "Closure request submitted successfully. The ticket raiser has been notified.",
@@ -172,6 +51,7 @@ def request_closure(**kwargs):
 
 
 @frappe.whitelist()
+@instrumented
 def get_closure_permissions(**kwargs):
     """
     Get what closure actions are available for the current user on a ticket
@@ -201,16 +81,74 @@ def get_closure_permissions(**kwargs):
         return {"can_mark_resolved": False, "can_request_closure": False}
     
     # Ticket raiser can always mark as resolved
-    can_mark_resolved = (current_user == ticket.raised_by or 
-                        frappe.has_permission("HD Ticket", "delete"))
+    can_mark_resolved = (closure_state_machine.is_transition_allowed(ticket, "resolve") and
+                        (current_user == ticket.raised_by or frappe.has_permission("HD Ticket", "delete")))
     
-    # Agents can request closure (but not the ticket raiser)
+    # Agents can request closure (but not the ticket raiser), once
     can_request_closure = (current_user != ticket.raised_by and 
-                          frappe.has_permission("HD Ticket", "write", doc=ticket))
+                          frappe.has_permission("HD Ticket", "write", doc=ticket) and
+                          closure_state_machine.is_transition_allowed(ticket, "request_closure"))
     
     return {
         "can_mark_resolved": can_mark_resolved,
         "can_request_closure": can_request_closure,
         "ticket_raiser": ticket.raised_by,
         "current_user": current_user
-    } 
\ No newline at end of file
+    }
+
+
+@frappe.whitelist()
+@instrumented
+def get_bulk_closure_permissions(ticket_ids):
+    """
+    Get closure actions available to the current user for many tickets, e.g. for list views
+
+    Tickets are fetched with one permission-filtered query of name, raised_by,
+    status and the closure request flag. The delete role check is evaluated
+    once for the user; write permission is checked per ticket, and only for
+    tickets where a closure request is otherwise possible.
+
+    Args:
+        ticket_ids: List (or JSON list) of HD Ticket names
+
+    Returns:
+        dict: Ticket name -> {"can_mark_resolved", "can_request_closure"}
+    """
+    if isinstance(ticket_ids, str):
+        ticket_ids = json.loads(ticket_ids)
+
+    ticket_ids = list(dict.fromkeys(ticket_ids or []))
+    if not ticket_ids:
+        return {}
+
+    current_user = frappe.session.user
+    can_delete = frappe.has_permission("HD Ticket", "delete")
+
+    # get_list applies user permissions, so tickets the user cannot see are left out
+    tickets = frappe.get_list(
+        "HD Ticket",
+        filters={"name": ["in", ticket_ids]},
+        fields=["name", "raised_by", "status", "custom_closure_requested"],
+        limit_page_length=0,
+        order_by=None
+    )
+
+    permissions = {
+        ticket_id: {"can_mark_resolved": False, "can_request_closure": False, "error": "Ticket not found"}
+        for ticket_id in ticket_ids
+    }
+    for ticket in tickets:
+        if ticket.status in ["Closed", "Resolved"]:
+            permissions[ticket.name] = {"can_mark_resolved": False, "can_request_closure": False}
+            continue
+
+        is_raiser = current_user == ticket.raised_by
+        permissions[ticket.name] = {
+            "can_mark_resolved": (closure_state_machine.is_transition_allowed(ticket, "resolve") and
+                                  (is_raiser or can_delete)),
+            "can_request_closure": (not is_raiser and
+                                    closure_state_machine.is_transition_allowed(ticket, "request_closure") and
+                                    frappe.has_permission("HD Ticket", "write", doc=ticket.name)),
+        }
+
+    return permissions
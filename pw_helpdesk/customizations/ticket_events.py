@@ -1,51 +1,107 @@
 import frappe
 from frappe.model.document import Document
 from frappe import _
+from frappe.model import default_fields
 import json
-from helpdesk.helpdesk.doctype.hd_ticket.hd_ticket import HDTicket
+
+from pw_helpdesk.customizations.agent_provisioning import ensure_hd_agents
+from pw_helpdesk.customizations.communication_coalescing import coalesce_communication
+from pw_helpdesk.customizations.deferred import defer
+from pw_helpdesk.customizations.overrides import ASSIGNMENT_RULE, apply_overrides, get_original
+from pw_helpdesk.customizations.team_sync import get_dynamic_assignment_users, sync_team_members
+from pw_helpdesk.instrumentation import instrumented
+
+# Fields on_communication_update may change
+COMMUNICATION_FIELDS = ("status", "first_responded_on", "description")
+
 
 # MONKEY PATCH: Fix core permission issue in on_communication_update
+# Installed on HDTicket by pw_helpdesk.customizations.overrides
+@instrumented
 def patched_on_communication_update(self, c):
     """
-    Fixed version of on_communication_update that uses ignore_permissions=True
+    Fixed version of on_communication_update that writes without permission checks
     to prevent permission errors during ticket updates from communication creation.
+
+    Only the fields the communication changed are written. The SLA is
+    recalculated when status or first response changed, without running
+    assignment or the rest of the ticket's validation. Communications that
+    arrive while the ticket's coalescing window is open are applied together
+    by one scheduled flush.
     """
+    communications = coalesce_communication(self.name, c)
+    if not communications:
+        return
+
+    before = {field: self.get(field) for field in COMMUNICATION_FIELDS}
+    for communication in communications:
+        apply_communication(self, communication)
+    save_communication_changes(self, before)
+
+
+def apply_communication(ticket, c):
+    """Apply a communication to the ticket's status, first response and description"""
     # If communication is incoming, then it is a reply from customer, and ticket must
     # be reopened.
     if c.sent_or_received == "Received":
-        self.status = "Open"
+        ticket.status = "Open"
     # If communication is outgoing, it must be a reply from agent
     if c.sent_or_received == "Sent":
         # Set first response date if not set already
-        self.first_responded_on = (
-            self.first_responded_on or frappe.utils.now_datetime()
+        ticket.first_responded_on = (
+            ticket.first_responded_on or frappe.utils.now_datetime()
         )
 
         if frappe.db.get_single_value("HD Settings", "auto_update_status"):
-            self.status = "Replied"
+            ticket.status = "Replied"
 
     # Fetch description from communication if not set already. This might not be needed
     # anymore as a communication is created when a ticket is created.
-    self.description = self.description or c.content
-    
-    # CRITICAL FIX: Set flag to prevent assignment rule from running during this save
-    # This prevents permission errors during the communication update process
-    self.flags.ignore_assignment_rule = True
-    
-    # Save the ticket, allowing for hooks to run - FIXED: Added ignore_permissions=True
-    self.save(ignore_permissions=True)
-    
-    # Clear the flag after save
-    self.flags.ignore_assignment_rule = False
-
-# Apply the monkey patch
-HDTicket.on_communication_update = patched_on_communication_update
+    ticket.description = ticket.description or c.content
 
-# MONKEY PATCH: Fix Assignment Rule permission issues
-from frappe.automation.doctype.assignment_rule.assignment_rule import AssignmentRule
 
-original_apply = AssignmentRule.apply_assign
+def save_communication_changes(ticket, before):
+    """
+    Write the fields communications changed, and the SLA fields that follow from them
+
+    Args:
+        ticket: HD Ticket document
+        before: Dict of COMMUNICATION_FIELDS values before the communications were applied
+
+    Returns:
+        list: Fields written
+    """
+    changed = [field for field in COMMUNICATION_FIELDS if ticket.get(field) != before[field]]
+    if not changed:
+        return changed
+
+    if ticket.sla and ("status" in changed or "first_responded_on" in changed):
+        # Status and first response drive SLA pauses, response and resolution
+        # tracking; any SLA field that moves is written along with them
+        columns = [column for column in ticket.meta.get_valid_columns() if column not in default_fields]
+        sla_before = {column: ticket.get(column) for column in columns}
+
+        # CRITICAL FIX: Set flag to prevent assignment rule from running during this update
+        # This prevents permission errors during the communication update process
+        ticket.flags.ignore_assignment_rule = True
+        try:
+            ticket.apply_sla()
+        finally:
+            # Clear the flag after the update
+            ticket.flags.ignore_assignment_rule = False
+
+        changed.extend(
+            column for column in columns
+            if column not in changed and ticket.get(column) != sla_before[column]
+        )
 
+    ticket.db_set({field: ticket.get(field) for field in changed}, notify=True)
+    return changed
+
+
+# MONKEY PATCH: Fix Assignment Rule permission issues
+# Installed on AssignmentRule by pw_helpdesk.customizations.overrides
+@instrumented
 def patched_apply_assign(self, doc):
     """Fixed version of apply_assign that handles permissions correctly"""
     try:
@@ -53,7 +109,7 @@ def patched_apply_assign(self, doc):
         if hasattr(doc, 'flags') and getattr(doc.flags, 'ignore_assignment_rule', False):
             return False
             
-        return original_apply(self, doc)
+        return get_original(ASSIGNMENT_RULE, "apply_assign")(self, doc)
     except frappe.PermissionError as e:
         # Log the permission error but don't break the flow
         frappe.log_error(f"Assignment Rule permission error for {doc.doctype} {doc.name}: {str(e)}")
@@ -63,10 +119,8 @@ def patched_apply_assign(self, doc):
         frappe.log_error(f"Assignment Rule error for {doc.doctype} {doc.name}: {str(e)}")
         return False
 
-# Apply the assignment rule monkey patch
-AssignmentRule.apply_assign = patched_apply_assign
-
 
+@instrumented
 def validate_ticket_closure(doc, method):
     """Validate that all required fields are filled before closing a ticket"""
     if doc.status == "Closed":
@@ -130,6 +184,7 @@ def auto_assign_based_on_category(doc, method):
             frappe.log_error(f"Error in category assignment: {str(e)}")
 
 
+@instrumented
 def auto_assign_agents_after_save(doc, method):
     """Auto-assign agents based on team assignment rules after ticket is saved"""
     try:
@@ -201,38 +256,35 @@ def assign_from_team_users(doc, team):
 
 
 def sync_team_users_from_dynamic_assignment(team_name):
-    """Sync users from Dynamic User Assignment to HD Team users field"""
+    """
+    Sync users from Dynamic User Assignment to HD Team users field
+
+    Only membership rows of added or removed users are written and the team is
+    not saved when its users already match.
+
+    Returns:
+        dict: Added and removed users and the number of rows touched
+    """
     try:
-        team_doc = frappe.get_doc("HD Team", team_name)
-        
-        # Check if team has dynamic user assignment configured
-        if not hasattr(team_doc, 'custom_user_assignment') or not team_doc.custom_user_assignment:
+        assignment = frappe.db.get_value("HD Team", team_name, "custom_user_assignment")
+        if not assignment:
             return
-            
-        # Get users from Dynamic User Assignment
-        dynamic_assignment = frappe.get_doc("Dynamic User Assignment", team_doc.custom_user_assignment)
-        
-        # Clear existing users
-        team_doc.users = []
-        
-        # Add users from Dynamic User Assignment
-        for user_row in dynamic_assignment.users:
-            if user_row.user:
-                # Create HD Agent if doesn't exist
-                if not frappe.db.exists("HD Agent", user_row.user):
-                    create_hd_agent(user_row.user)
-                
-                # Add to team users
-                team_doc.append("users", {
-                    "user": user_row.user
-                })
-        
-        # Save team with updated users
-        team_doc.save(ignore_permissions=True)
-        frappe.db.commit()
-        
-        frappe.msgprint(f"Team '{team_name}' users synced from Dynamic User Assignment")
-        
+
+        users = get_dynamic_assignment_users(assignment)
+
+        # Create HD Agents for users that don't have one
+        ensure_hd_agents(users)
+
+        result = sync_team_members(team_name, users)
+        if not result["rows_touched"]:
+            return result
+
+        frappe.msgprint(
+            f"Team '{team_name}' users synced from Dynamic User Assignment: "
+            f"{len(result['added'])} added, {len(result['removed'])} removed, {result['rows_touched']} rows touched"
+        )
+        return result
+
     except Exception as e:
         frappe.log_error(f"Error syncing team users from Dynamic User Assignment: {str(e)}", "Team User Sync Error")
 
@@ -240,37 +292,35 @@ def sync_team_users_from_dynamic_assignment(team_name):
 def create_hd_agent(user_email):
     """Create HD Agent record for user if it doesn't exist"""
     try:
-        if frappe.db.exists("HD Agent", user_email):
+        if not ensure_hd_agents([user_email]):
             return
-            
-        user_doc = frappe.get_doc("User", user_email)
-        
-        agent_doc = frappe.new_doc("HD Agent")
-        agent_doc.user = user_email
-        agent_doc.agent_name = user_doc.full_name or user_email
-        agent_doc.is_active = 1
-        agent_doc.save(ignore_permissions=True)
         
-        frappe.db.commit()
         frappe.msgprint(f"HD Agent created for user: {user_email}")
         
     except Exception as e:
         frappe.log_error(f"Error creating HD Agent for {user_email}: {str(e)}", "HD Agent Creation Error")
 
 
+@instrumented
 def on_team_save(doc, method):
-    """Sync users when HD Team is saved"""
+    """Sync users once the HD Team save is committed"""
     try:
         if hasattr(doc, 'custom_user_assignment') and doc.custom_user_assignment:
-            sync_team_users_from_dynamic_assignment(doc.name)
+            defer(("team_sync", doc.name), sync_team_users_from_dynamic_assignment, doc.name)
     except Exception as e:
         frappe.log_error(f"Error in team save event: {str(e)}", "Team Save Error")
 
 
+@instrumented
 def on_ticket_comment_insert(doc, method):
     """Handle ticket comment insertion events"""
     try:
         # Add any custom logic for comment handling here
         pass
     except Exception as e:
-        frappe.log_error(f"Error in ticket comment event: {str(e)}", "Comment Event Error") 
\ No newline at end of file
+        frappe.log_error(f"Error in ticket comment event: {str(e)}", "Comment Event Error") 
+
+
+# Install the replacements defined above, in case this module was imported
+# before pw_helpdesk.customizations.overrides finished loading
+apply_overrides(record_errors=False)
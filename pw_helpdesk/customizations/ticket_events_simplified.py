@@ -1,9 +1,12 @@
 import frappe
 from frappe.model.document import Document
 from frappe import _
-from helpdesk.helpdesk.doctype.hd_ticket.hd_ticket import HDTicket
+
+from pw_helpdesk.customizations.overrides import ASSIGNMENT_RULE, get_original
 
 # MONKEY PATCH: Fix core permission issue in on_communication_update
+# Not installed: the ticket_events implementations are registered in
+# pw_helpdesk.customizations.overrides
 def patched_on_communication_update(self, c):
     """
     Fixed version of on_communication_update that uses ignore_permissions=True
@@ -37,14 +40,7 @@ def patched_on_communication_update(self, c):
     # Clear the flag after save
     self.flags.ignore_assignment_rule = False
 
-# Apply the monkey patch
-HDTicket.on_communication_update = patched_on_communication_update
-
 # MONKEY PATCH: Fix Assignment Rule permission issues
-from frappe.automation.doctype.assignment_rule.assignment_rule import AssignmentRule
-
-original_apply = AssignmentRule.apply_assign
-
 def patched_apply_assign(self, doc):
     """Fixed version of apply_assign that handles permissions correctly"""
     try:
@@ -52,7 +48,7 @@ def patched_apply_assign(self, doc):
         if hasattr(doc, 'flags') and getattr(doc.flags, 'ignore_assignment_rule', False):
             return False
             
-        return original_apply(self, doc)
+        return get_original(ASSIGNMENT_RULE, "apply_assign")(self, doc)
     except frappe.PermissionError as e:
         # Log the permission error but don't break the flow
         frappe.log_error(f"Assignment Rule permission error for {doc.doctype} {doc.name}: {str(e)}")
@@ -62,9 +58,6 @@ def patched_apply_assign(self, doc):
         frappe.log_error(f"Assignment Rule error for {doc.doctype} {doc.name}: {str(e)}")
         return False
 
-# Apply the assignment rule monkey patch
-AssignmentRule.apply_assign = patched_apply_assign
-
 
 def validate_ticket_closure(doc, method):
     """Validate that all required fields are filled before closing a ticket"""
@@ -169,11 +169,31 @@ doc_events = {
 	},
 	"Assignment Rule": {
 		"validate": "pw_helpdesk.customizations.real_time_automation.assignment_rule_real_time_validation"
+	},
+	"Dynamic User Assignment": {
+		"on_update": "pw_helpdesk.customizations.team_sync.on_user_assignment_update"
+	},
+	"HD Escalation Rule": {
+		"on_update": "pw_helpdesk.pw_helpdesk.doctype.hd_category.hd_category.clear_escalation_fingerprint",
+		"on_trash": "pw_helpdesk.pw_helpdesk.doctype.hd_category.hd_category.clear_escalation_fingerprint"
+	},
+	"User": {
+		"after_insert": "pw_helpdesk.customizations.role_holder_assignment.clear_role_holders_cache",
+		"on_update": "pw_helpdesk.customizations.role_holder_assignment.clear_role_holders_cache",
+		"on_trash": "pw_helpdesk.customizations.role_holder_assignment.clear_role_holders_cache"
+	},
+	"Role": {
+		"on_update": "pw_helpdesk.customizations.role_holder_assignment.clear_role_holders_cache",
+		"on_trash": "pw_helpdesk.customizations.role_holder_assignment.clear_role_holders_cache"
 	}
 }
 
 # Installation hooks
+before_migrate = [
+	"pw_helpdesk.customizations.overrides.apply_overrides"
+]
 after_migrate = [
+	"pw_helpdesk.customizations.overrides.apply_overrides",
 	"pw_helpdesk.customizations.custom_actions_fix.apply_custom_actions_fix"
 ]
 
@@ -203,10 +223,25 @@ def after_install():
 # 	],
 # }
 
+scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"pw_helpdesk.customizations.notification_outbox.drain_notification_outbox",
+			"pw_helpdesk.customizations.communication_coalescing.flush_due_communications"
+		]
+	},
+	"daily": [
+		"pw_helpdesk.customizations.notification_outbox.delete_old_notifications"
+	],
+	"hourly_long": [
+		"pw_helpdesk.customizations.auto_close.auto_close_resolved_tickets"
+	]
+}
+
 # Testing
 # -------
 
-# before_tests = "pw_helpdesk.install.before_tests"
+before_tests = ["pw_helpdesk.customizations.overrides.apply_overrides"]
 
 # Overriding Methods
 # ------------------------------
@@ -233,12 +268,12 @@ def after_install():
 
 # Request Events
 # ----------------
-# before_request = ["pw_helpdesk.utils.before_request"]
+before_request = ["pw_helpdesk.customizations.overrides.apply_overrides"]
 # after_request = ["pw_helpdesk.utils.after_request"]
 
 # Job Events
 # ----------
-# before_job = ["pw_helpdesk.utils.before_job"]
+before_job = ["pw_helpdesk.customizations.overrides.apply_overrides"]
 # after_job = ["pw_helpdesk.utils.after_job"]
 
 # User Data Protection
@@ -0,0 +1,220 @@
+"""
+Timing, query count and error instrumentation for pw_helpdesk hooks and APIs
+
+Functions decorated with @instrumented record, per function, the number of
+calls and errors, a latency histogram and the number of SQL statements they
+issued. The numbers of each call are added to a site-scoped Redis hash with
+one pipelined round trip and are read back by get_hook_metrics (JSON) and
+metrics (Prometheus text format).
+
+Whitelisted functions keep @frappe.whitelist() as the outermost decorator:
+
+    @frappe.whitelist()
+    @instrumented
+    def get_applicable_sla(category):
+        ...
+"""
+
+import functools
+import inspect
+import time
+from bisect import bisect_left
+
+import frappe
+from werkzeug.wrappers import Response
+
+from pw_helpdesk.utils import get_counters, increment_counters, reset_counters
+
+
+METRICS_KEY = "pw_helpdesk_hook_metrics"
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FIELD_SEPARATOR = "|"
+
+
+class count_queries:
+    """
+    Count, and optionally record, the SQL statements run through frappe.db.sql
+
+    Usage:
+        with count_queries(record=True) as queries:
+            doc.save()
+        print(queries.count, queries.queries)
+    """
+
+    def __init__(self, record=False):
+        self.record = record
+        self.count = 0
+        self.queries = []
+        self._db = None
+        self._sql = None
+        self._patched_instance = False
+
+    def __enter__(self):
+        self._db = getattr(frappe.local, "db", None)
+        if self._db is None:
+            return self
+
+        # Set when an enclosing count_queries is active
+        self._patched_instance = "sql" in vars(self._db)
+        self._sql = self._db.sql
+        sql = self._sql
+
+        def counting_sql(query, *args, **kwargs):
+            self.count += 1
+            if self.record:
+                self.queries.append(str(query))
+            return sql(query, *args, **kwargs)
+
+        self._db.sql = counting_sql
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._db is None:
+            return False
+
+        if self._patched_instance:
+            self._db.sql = self._sql
+        else:
+            del self._db.sql
+        return False
+
+
+def get_bucket(seconds):
+    """Upper bound of the histogram bucket of a duration, "+Inf" above the last one"""
+    index = bisect_left(LATENCY_BUCKETS, seconds)
+    return str(LATENCY_BUCKETS[index]) if index < len(LATENCY_BUCKETS) else "+Inf"
+
+
+def record_call(name, seconds, queries, failed=False):
+    """Add one call of an instrumented function to the metrics in Redis"""
+    prefix = name + FIELD_SEPARATOR
+    increment_counters(METRICS_KEY, {
+        prefix + "calls": 1,
+        prefix + "errors": 1 if failed else 0,
+        prefix + "queries": queries,
+        prefix + "duration_us": int(seconds * 1e6),
+        prefix + "bucket:" + get_bucket(seconds): 1,
+    })
+
+
+def instrumented(function=None, name=None):
+    """
+    Record calls, errors, latency and query count of a hook or API function
+
+    Usable as @instrumented or @instrumented(name="...").
+
+    Args:
+        function: Function to instrument
+        name: Metric name, the dotted path of the function by default
+    """
+    if function is None:
+        return functools.partial(instrumented, name=name)
+
+    metric_name = name or f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        failed = False
+        start = time.perf_counter()
+        with count_queries() as queries:
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                try:
+                    record_call(metric_name, time.perf_counter() - start, queries.count, failed)
+                except Exception:
+                    # Metrics must never break the instrumented function
+                    pass
+
+    parameters = inspect.signature(function).parameters.values()
+    if not any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+        # frappe.call passes only these request arguments, as it would to the function itself
+        wrapper.fnargs = [parameter.name for parameter in parameters]
+
+    return wrapper
+
+
+def get_metrics():
+    """
+    Metrics of every instrumented function called on this site
+
+    Returns:
+        dict: Function name -> calls, errors, queries, total and average duration
+            and histogram bucket counts
+    """
+    metrics = {}
+    for field, value in get_counters(METRICS_KEY).items():
+        name, _separator, metric = field.rpartition(FIELD_SEPARATOR)
+        entry = metrics.setdefault(name, {"calls": 0, "errors": 0, "queries": 0, "duration_us": 0, "buckets": {}})
+        if metric.startswith("bucket:"):
+            entry["buckets"][metric[len("bucket:"):]] = value
+        else:
+            entry[metric] = value
+
+    for entry in metrics.values():
+        calls = entry["calls"] or 1
+        entry["avg_ms"] = round(entry["duration_us"] / calls / 1000, 3)
+        entry["avg_queries"] = round(entry["queries"] / calls, 2)
+    return metrics
+
+
+def format_prometheus(metrics):
+    """Render metrics in the Prometheus text exposition format"""
+    lines = []
+
+    def add_family(metric, metric_type, help_text, samples):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        lines.extend(samples)
+
+    def label(name, **extra):
+        labels = {"hook": name, **extra}
+        return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+    names = sorted(metrics)
+    add_family("pw_helpdesk_hook_calls_total", "counter", "Calls of a pw_helpdesk hook or API",
+               [f"pw_helpdesk_hook_calls_total{{{label(name)}}} {metrics[name]['calls']}" for name in names])
+    add_family("pw_helpdesk_hook_errors_total", "counter", "Calls that raised an exception",
+               [f"pw_helpdesk_hook_errors_total{{{label(name)}}} {metrics[name]['errors']}" for name in names])
+    add_family("pw_helpdesk_hook_db_queries_total", "counter", "SQL statements issued",
+               [f"pw_helpdesk_hook_db_queries_total{{{label(name)}}} {metrics[name]['queries']}" for name in names])
+
+    histogram = []
+    for name in names:
+        entry = metrics[name]
+        cumulative = 0
+        for bound in [*map(str, LATENCY_BUCKETS), "+Inf"]:
+            cumulative += entry["buckets"].get(bound, 0)
+            histogram.append(f"pw_helpdesk_hook_duration_seconds_bucket{{{label(name, le=bound)}}} {cumulative}")
+        histogram.append(f"pw_helpdesk_hook_duration_seconds_sum{{{label(name)}}} {entry['duration_us'] / 1e6}")
+        histogram.append(f"pw_helpdesk_hook_duration_seconds_count{{{label(name)}}} {entry['calls']}")
+    add_family("pw_helpdesk_hook_duration_seconds", "histogram", "Duration of a pw_helpdesk hook or API", histogram)
+
+    return "\n".join(lines) + "\n"
+
+
+@frappe.whitelist()
+def get_hook_metrics():
+    """Calls, errors, latency and query counts of pw_helpdesk hooks and APIs"""
+    frappe.only_for(["System Manager"])
+    return get_metrics()
+
+
+@frappe.whitelist()
+def metrics():
+    """The same metrics in the Prometheus text format, for scraping with an API key"""
+    frappe.only_for(["System Manager"])
+    return Response(format_prometheus(get_metrics()), mimetype="text/plain; version=0.0.4")
+
+
+@frappe.whitelist(methods=["POST"])
+def reset_hook_metrics():
+    """Start the metrics from zero"""
+    frappe.only_for(["System Manager"])
+    reset_counters(METRICS_KEY)
@@ -0,0 +1,8 @@
+import frappe
+
+
+def execute():
+    """
+    Index HD Ticket on (status, modified) for the auto-close keyset scan
+    """
+    frappe.db.add_index("HD Ticket", ["status", "modified"], index_name="status_modified_index")
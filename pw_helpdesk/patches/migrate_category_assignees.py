@@ -0,0 +1,45 @@
+import frappe
+
+from pw_helpdesk.pw_helpdesk.doctype.hd_category.hd_category import (
+    parse_assignees,
+    replace_category_assignees,
+)
+
+
+def execute():
+    """
+    Move the comma or semicolon separated HD Category assignee field into the
+    HD Category Assignee table
+    """
+    categories = frappe.get_all(
+        "HD Category",
+        filters={"assignee": ["is", "set"]},
+        fields=["name", "assignee"],
+        order_by=None
+    )
+    migrated = set(
+        frappe.get_all(
+            "HD Category Assignee",
+            filters={"parenttype": "HD Category"},
+            pluck="parent",
+            distinct=True
+        )
+    )
+
+    assignees_by_category = {}
+    for category in categories:
+        if category.name in migrated:
+            continue
+
+        users = parse_assignees(category.assignee)
+        assignees_by_category[category.name] = users
+
+        # Normalise the text field to the form HDCategory.sync_assignees derives
+        normalised = ", ".join(users) or None
+        if normalised != category.assignee:
+            frappe.db.set_value(
+                "HD Category", category.name, "assignee", normalised, update_modified=False
+            )
+
+    replace_category_assignees(assignees_by_category, delete_existing=False)
+    print(f"Migrated assignees of {len(assignees_by_category)} HD Categories")
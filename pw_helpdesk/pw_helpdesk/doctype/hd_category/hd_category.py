@@ -1,12 +1,45 @@
+import hashlib
+import json
+import re
+
 import frappe
 from frappe.model.document import Document
 from frappe import _
 
+from pw_helpdesk.customizations.deferred import defer
+from pw_helpdesk.instrumentation import instrumented
+from pw_helpdesk.utils import get_counters, increment_counters
+
+
+# Fields that decide how the HD Escalation Rule of a category looks
+ESCALATION_FIELDS = (
+    "category_name",
+    "enable_escalation",
+    "escalation_type",
+    "escalation_1_point",
+    "escalation_1_unit",
+    "escalation_1_assignee",
+    "escalation_2_point",
+    "escalation_2_unit",
+    "escalation_2_assignee",
+    "escalation_3_point",
+    "escalation_3_unit",
+    "escalation_3_assignee",
+)
+
+# Redis hash of rule name -> fingerprint of the category settings it was last written from
+ESCALATION_FINGERPRINT_CACHE_KEY = "pw_helpdesk:escalation_rule_fingerprints"
+ESCALATION_SYNC_STATS_KEY = "pw_helpdesk:escalation_rule_sync_stats"
+
+ASSIGNEE_DOCTYPE = "HD Category Assignee"
+ASSIGNEE_SEPARATORS = re.compile(r"[,;]")
+
 
 class HDCategory(Document):
     def validate(self):
         """Validate the HD Category document"""
         self.validate_category_code()
+        self.sync_assignees()
         self.validate_assignee_emails()
         self.validate_escalation_settings()
         self.validate_sub_category_settings()
@@ -23,13 +56,30 @@ class HDCategory(Document):
             if existing:
                 frappe.throw(_("Category Code '{0}' already exists").format(self.category_code))
 
+    def sync_assignees(self):
+        """
+        Keep the assignees table and the assignee text field in sync
+
+        The table is the source of truth. When the text field was edited (e.g. through
+        the API or an import) the table is rebuilt from it, otherwise the text field is
+        derived from the table.
+        """
+        before = self.get_doc_before_save()
+        if before:
+            text_changed = (self.assignee or None) != (before.assignee or None)
+        else:
+            text_changed = not self.assignees
+
+        if text_changed:
+            self.set("assignees", [{"user": user} for user in parse_assignees(self.assignee)])
+
+        self.assignee = ", ".join(row.user for row in self.assignees if row.user) or None
+
     def validate_assignee_emails(self):
         """Validate assignee email addresses"""
-        if self.assignee:
-            emails = [email.strip() for email in self.assignee.split(",")]
-            for email in emails:
-                if email and not frappe.utils.validate_email_address(email):
-                    frappe.throw(_("Invalid email address: {0}").format(email))
+        for row in self.assignees:
+            if row.user and not frappe.utils.validate_email_address(row.user):
+                frappe.throw(_("Invalid email address: {0}").format(row.user))
 
     def validate_escalation_settings(self):
         """Validate escalation settings"""
@@ -74,13 +124,31 @@ class HDCategory(Document):
 
     def update_escalation_rules(self):
         """Update or create escalation rules based on category settings"""
-        if self.enable_escalation:
-            self.create_or_update_escalation_rule()
+        if not self.enable_escalation:
+            return
+
+        if self.flags.defer_escalation_sync:
+            # Bulk callers (e.g. imports) flush all rules at once via flush_escalation_rule_sync
+            frappe.local.pw_pending_escalation_sync = getattr(frappe.local, "pw_pending_escalation_sync", {})
+            frappe.local.pw_pending_escalation_sync[self.name] = get_escalation_settings(self)
+            return
+
+        self.create_or_update_escalation_rule()
 
     def create_or_update_escalation_rule(self):
-        """Create or update escalation rule for this category"""
-        rule_name = f"Escalation Rule - {self.category_name}"
-        
+        """
+        Create or update escalation rule for this category
+
+        Returns:
+            bool: True if the rule was written, False if it was already up to date
+        """
+        rule_name = get_escalation_rule_name(self.category_name)
+        fingerprint = get_escalation_fingerprint(self)
+
+        if frappe.cache().hget(ESCALATION_FINGERPRINT_CACHE_KEY, rule_name) == fingerprint:
+            increment_counters(ESCALATION_SYNC_STATS_KEY, {"skipped": 1})
+            return False
+
         # Check if escalation rule exists
         existing_rule = frappe.get_all(
             "HD Escalation Rule",
@@ -103,7 +171,12 @@ class HDCategory(Document):
         # This is a simplified implementation
         rule.save()
 
+        defer(("escalation_fingerprint", rule_name), set_escalation_fingerprint, rule_name, fingerprint)
+        increment_counters(ESCALATION_SYNC_STATS_KEY, {"written": 1})
+        return True
+
     @frappe.whitelist()
+    @instrumented
     def get_sub_categories(self):
         """Get all sub categories for this category"""
         sub_categories = frappe.get_all(
@@ -114,11 +187,13 @@ class HDCategory(Document):
         return sub_categories
 
     @frappe.whitelist()
+    @instrumented
     def get_assignment_info(self):
         """Get assignment information for this category"""
         info = {
             "category": {
                 "assignee": self.assignee,
+                "assignees": [row.user for row in self.assignees],
                 "assign_issue_to_user": self.assign_issue_to_user,
                 "assign_issue_to_external_vendor": self.assign_issue_to_external_vendor,
                 "assign_issue_to_permission_role_holder": self.assign_issue_to_permission_role_holder,
@@ -139,6 +214,7 @@ class HDCategory(Document):
         return info
 
     @frappe.whitelist()
+    @instrumented
     def get_escalation_info(self):
         """Get escalation information for this category"""
         info = {
@@ -217,4 +293,231 @@ class HDCategory(Document):
             
             info["sub_categories"].append(sub_info)
         
-        return info 
\ No newline at end of file
+        return info
+
+
+def parse_assignees(value):
+    """
+    Split a comma or semicolon separated assignee string
+
+    Returns:
+        list: Stripped email addresses without duplicates, in their original order
+    """
+    users = (user.strip() for user in ASSIGNEE_SEPARATORS.split(value or ""))
+    return list(dict.fromkeys(user for user in users if user))
+
+
+def get_category_assignees(category):
+    """
+    Get the assignees of a category from the indexed child table
+
+    Returns:
+        list: User emails in table order
+    """
+    return frappe.get_all(
+        ASSIGNEE_DOCTYPE,
+        filters={"parent": category, "parenttype": "HD Category", "parentfield": "assignees"},
+        pluck="user",
+        order_by="idx asc"
+    )
+
+
+def get_assignee_categories(user):
+    """
+    Get the categories a user is an assignee of
+
+    Returns:
+        list: HD Category names
+    """
+    return frappe.get_all(
+        ASSIGNEE_DOCTYPE,
+        filters={"user": user, "parenttype": "HD Category", "parentfield": "assignees"},
+        pluck="parent",
+        distinct=True
+    )
+
+
+def replace_category_assignees(assignees_by_category, delete_existing=True):
+    """
+    Rewrite the assignee rows of many categories with one delete and one bulk insert
+
+    Used by writers that bypass Document.save, such as the CSV importer.
+
+    Args:
+        assignees_by_category: Dict of category name -> list of user emails
+        delete_existing: Delete current rows first, not needed for new categories
+    """
+    if not assignees_by_category:
+        return
+
+    if delete_existing:
+        frappe.db.delete(
+            ASSIGNEE_DOCTYPE,
+            {"parent": ["in", list(assignees_by_category)], "parenttype": "HD Category"}
+        )
+
+    timestamp = frappe.utils.now()
+    owner = frappe.session.user
+    values = [
+        (frappe.generate_hash(length=10), timestamp, timestamp, owner, owner, 0, idx,
+         category, "HD Category", "assignees", user)
+        for category, users in assignees_by_category.items()
+        for idx, user in enumerate(users, start=1)
+    ]
+    if values:
+        frappe.db.bulk_insert(
+            ASSIGNEE_DOCTYPE,
+            fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                    "parent", "parenttype", "parentfield", "user"],
+            values=values
+        )
+
+
+@frappe.whitelist()
+@instrumented
+def get_categories_for_assignee(user=None):
+    """Get the categories assigned to a user, the current user by default"""
+    if user and user != frappe.session.user:
+        frappe.only_for(["System Manager", "Agent Manager"])
+    return get_assignee_categories(user or frappe.session.user)
+
+
+def get_escalation_rule_name(category_name):
+    """Name of the HD Escalation Rule maintained for a category"""
+    return f"Escalation Rule - {category_name}"
+
+
+def get_escalation_settings(category):
+    """
+    Extract the escalation fields of a category
+
+    Args:
+        category: HD Category document or dict with the same fields
+
+    Returns:
+        dict: Escalation field values
+    """
+    return {fieldname: category.get(fieldname) for fieldname in ESCALATION_FIELDS}
+
+
+def get_escalation_fingerprint(category):
+    """
+    Stable hash of the escalation fields of a category, used to skip rule writes
+    when nothing relevant changed since the last sync
+
+    Args:
+        category: HD Category document or dict with the same fields
+
+    Returns:
+        str: Hex digest of the escalation settings
+    """
+    settings = get_escalation_settings(category)
+    # Normalise empty values so that None, "" and 0 loaded from different sources match
+    normalised = {key: (value or None) for key, value in settings.items()}
+    payload = json.dumps(normalised, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def sync_escalation_rules(categories):
+    """
+    Upsert the escalation rules of many categories in one pass
+
+    Categories whose escalation settings match the last synced fingerprint are
+    skipped. Existence of the remaining rules is checked with a single query.
+    The new fingerprints are stored once the rule writes are committed.
+
+    Args:
+        categories: Iterable of HD Category documents or dicts with the escalation fields
+
+    Returns:
+        dict: Number of rule writes done and skipped
+    """
+    stats = {"written": 0, "skipped": 0}
+    # RedisWrapper.hgetall returns the field names as bytes
+    cached_fingerprints = {
+        (rule_name.decode() if isinstance(rule_name, bytes) else rule_name): fingerprint
+        for rule_name, fingerprint in (frappe.cache().hgetall(ESCALATION_FINGERPRINT_CACHE_KEY) or {}).items()
+    }
+
+    pending = {}
+    for category in categories:
+        if not category.get("enable_escalation") or not category.get("category_name"):
+            continue
+
+        rule_name = get_escalation_rule_name(category.get("category_name"))
+        fingerprint = get_escalation_fingerprint(category)
+
+        if cached_fingerprints.get(rule_name) == fingerprint or pending.get(rule_name) == fingerprint:
+            stats["skipped"] += 1
+            continue
+
+        pending[rule_name] = fingerprint
+
+    if pending:
+        existing_rules = set(
+            frappe.get_all(
+                "HD Escalation Rule",
+                filters={"name": ["in", list(pending)]},
+                pluck="name"
+            )
+        )
+
+        for rule_name in pending:
+            if rule_name not in existing_rules:
+                frappe.get_doc({
+                    "doctype": "HD Escalation Rule",
+                    "name": rule_name,
+                    "is_enabled": 1
+                }).insert(ignore_permissions=True)
+
+        rules_to_update = [rule_name for rule_name in pending if rule_name in existing_rules]
+        if rules_to_update:
+            frappe.db.set_value(
+                "HD Escalation Rule",
+                {"name": ["in", rules_to_update]},
+                "is_enabled",
+                1
+            )
+
+        for rule_name, fingerprint in pending.items():
+            defer(("escalation_fingerprint", rule_name), set_escalation_fingerprint, rule_name, fingerprint)
+
+        stats["written"] = len(pending)
+
+    increment_counters(ESCALATION_SYNC_STATS_KEY, stats)
+    return stats
+
+
+def set_escalation_fingerprint(rule_name, fingerprint):
+    """Remember the settings a rule was written from, deferred until the write is committed"""
+    frappe.cache().hset(ESCALATION_FINGERPRINT_CACHE_KEY, rule_name, fingerprint)
+
+
+def flush_escalation_rule_sync():
+    """
+    Sync escalation rules for all categories saved with flags.defer_escalation_sync
+
+    Returns:
+        dict: Number of rule writes done and skipped
+    """
+    pending = getattr(frappe.local, "pw_pending_escalation_sync", None) or {}
+    frappe.local.pw_pending_escalation_sync = {}
+    return sync_escalation_rules(pending.values())
+
+
+@instrumented
+def clear_escalation_fingerprint(doc, method=None):
+    """
+    Forget the fingerprint of an HD Escalation Rule edited or deleted outside the sync,
+    so the next sync rewrites it from its category
+    """
+    frappe.cache().hdel(ESCALATION_FINGERPRINT_CACHE_KEY, doc.name)
+
+
+@frappe.whitelist()
+@instrumented
+def get_escalation_rule_sync_stats():
+    """Get the number of escalation rule writes done and skipped since the last reset"""
+    frappe.only_for("System Manager")
+    stats = get_counters(ESCALATION_SYNC_STATS_KEY)
+    return {"written": stats.get("written", 0), "skipped": stats.get("skipped", 0)}
@@ -1,7 +1,16 @@
 import frappe
 import unittest
+from unittest.mock import patch
 from frappe.tests.utils import FrappeTestCase
 
+from pw_helpdesk.pw_helpdesk.doctype.hd_category.hd_category import get_escalation_rule_name, sync_escalation_rules
+
+
+def run_after_commit():
+    """Run the after-commit callbacks, fingerprints are only stored once rule writes are committed"""
+    with patch.object(frappe.db, "commit"):
+        frappe.db.after_commit.run()
+
 
 class TestHDCategory(FrappeTestCase):
     def setUp(self):
@@ -65,6 +74,28 @@ class TestHDCategory(FrappeTestCase):
         self.test_category.save()
         self.assertEqual(self.test_category.assignee, "test1@example.com, test2@example.com")
 
+    def test_assignees_table_synced_with_assignee(self):
+        """Test assignee text and assignees table are kept in sync"""
+        from pw_helpdesk.pw_helpdesk.doctype.hd_category.hd_category import (
+            get_assignee_categories,
+            get_category_assignees,
+        )
+
+        self.test_category.assign_issue_to_user = 1
+        self.test_category.assignee = "test1@example.com; test2@example.com"
+        self.test_category.save()
+
+        self.assertEqual([row.user for row in self.test_category.assignees], ["test1@example.com", "test2@example.com"])
+        self.assertEqual(self.test_category.assignee, "test1@example.com, test2@example.com")
+        self.assertEqual(get_category_assignees(self.test_category.name), ["test1@example.com", "test2@example.com"])
+        self.assertIn(self.test_category.name, get_assignee_categories("test2@example.com"))
+
+        # Editing the table updates the text field
+        self.test_category.reload()
+        self.test_category.remove(self.test_category.assignees[0])
+        self.test_category.save()
+        self.assertEqual(self.test_category.assignee, "test2@example.com")
+
     def test_escalation_validation(self):
         """Test escalation validation"""
         self.test_category.enable_escalation = 1
@@ -202,6 +233,75 @@ class TestHDCategory(FrappeTestCase):
         escalation_info = self.test_category.get_escalation_info()
         self.assertEqual(escalation_info, {})
 
+    def test_escalation_rule_write_skipped_when_unchanged(self):
+        """Test that saving without escalation changes does not rewrite the rule"""
+        self.test_category.enable_escalation = 1
+        self.test_category.escalation_type = "Time-based"
+        self.test_category.escalation_1_point = 24
+        self.test_category.escalation_1_unit = "Hours"
+        self.test_category.save()
+        run_after_commit()
+
+        self.assertFalse(self.test_category.create_or_update_escalation_rule())
+
+        self.test_category.escalation_1_point = 48
+        self.assertTrue(self.test_category.create_or_update_escalation_rule())
+
+    def test_sync_escalation_rules_batch(self):
+        """Test batch escalation rule sync skips unchanged categories"""
+        categories = [
+            {
+                "category_name": f"Escalation Batch {frappe.generate_hash(length=8)}",
+                "enable_escalation": 1,
+                "escalation_type": "Time-based",
+                "escalation_1_point": 4,
+                "escalation_1_unit": "Hours"
+            },
+            {
+                "category_name": f"No Escalation {frappe.generate_hash(length=8)}",
+                "enable_escalation": 0
+            }
+        ]
+
+        self.assertEqual(sync_escalation_rules(categories), {"written": 1, "skipped": 0})
+        run_after_commit()
+        self.assertEqual(sync_escalation_rules(categories), {"written": 0, "skipped": 1})
+
+        categories[0]["escalation_1_point"] = 8
+        self.assertEqual(sync_escalation_rules(categories), {"written": 1, "skipped": 0})
+
+    def test_fingerprint_not_stored_before_commit(self):
+        """Test that a rule write which is never committed is not skipped by the next sync"""
+        category = {
+            "category_name": f"Escalation Uncommitted {frappe.generate_hash(length=8)}",
+            "enable_escalation": 1,
+            "escalation_type": "Time-based",
+            "escalation_1_point": 4,
+            "escalation_1_unit": "Hours"
+        }
+
+        self.assertEqual(sync_escalation_rules([category]), {"written": 1, "skipped": 0})
+        self.assertEqual(sync_escalation_rules([category]), {"written": 1, "skipped": 0})
+
+    def test_sync_escalation_rules_after_manual_edit(self):
+        """Test that editing an escalation rule by hand makes the next sync rewrite it"""
+        category = {
+            "category_name": f"Escalation Edited {frappe.generate_hash(length=8)}",
+            "enable_escalation": 1,
+            "escalation_type": "Time-based",
+            "escalation_1_point": 4,
+            "escalation_1_unit": "Hours"
+        }
+
+        self.assertEqual(sync_escalation_rules([category]), {"written": 1, "skipped": 0})
+        run_after_commit()
+
+        rule = frappe.get_doc("HD Escalation Rule", get_escalation_rule_name(category["category_name"]))
+        rule.is_enabled = 0
+        rule.save(ignore_permissions=True)
+
+        self.assertEqual(sync_escalation_rules([category]), {"written": 1, "skipped": 0})
+
 
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1 @@
+# __init__.py file for HD Category Assignee DocType 
\ No newline at end of file
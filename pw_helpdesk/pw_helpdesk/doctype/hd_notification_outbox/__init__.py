@@ -0,0 +1 @@
+# __init__.py file for HD Notification Outbox DocType 
\ No newline at end of file
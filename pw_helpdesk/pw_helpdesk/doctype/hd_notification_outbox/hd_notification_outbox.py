@@ -0,0 +1,29 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class HDNotificationOutbox(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		actor: DF.Link | None
+		attempts: DF.Int
+		error: DF.SmallText | None
+		next_attempt_after: DF.Datetime | None
+		notes: DF.Text | None
+		notification_type: DF.Literal["Ticket Resolved", "Closure Requested"]
+		recipient: DF.Data
+		sent_on: DF.Datetime | None
+		status: DF.Literal["Queued", "Sent", "Failed"]
+		ticket: DF.Link | None
+		ticket_subject: DF.Data | None
+	# end: auto-generated types
+
+	pass
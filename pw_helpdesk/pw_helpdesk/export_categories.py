@@ -0,0 +1,120 @@
+"""
+Export the HD Category tree to CSV or JSON Lines in the importer's column layout
+
+Categories are read through an unbuffered (server-side) cursor and written row
+by row, so memory use does not grow with the number of categories. Main
+categories are written before sub-categories, which lets the file be imported
+again on another site in one pass.
+
+Usage:
+    bench --site <site> export-hd-categories /path/to/categories.csv
+    bench --site <site> export-hd-categories /path/to/categories.jsonl --format jsonl
+"""
+
+import csv
+import json
+
+import frappe
+from frappe import _
+
+from pw_helpdesk.pw_helpdesk.import_categories import CHECK_FIELDS, SETTING_COLUMNS
+
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+EXPORT_COLUMNS = [
+    "Category Name",
+    "Category Code",
+    "Sub-Category Name",
+    "Sub-Category Code",
+    "Parent Category Code",
+    "Description",
+    "Is Active",
+    *SETTING_COLUMNS,
+]
+
+
+def iter_category_export_rows():
+    """
+    Stream all categories as importer rows
+
+    Yields:
+        dict: Importer column name -> value
+    """
+    setting_fields = ", ".join(f"category.`{fieldname}`" for fieldname in SETTING_COLUMNS.values())
+
+    with frappe.db.unbuffered_cursor():
+        rows = frappe.db.sql(
+            f"""
+            SELECT
+                category.category_name,
+                category.category_code,
+                category.is_sub_category,
+                category.description,
+                category.is_active,
+                parent.category_code AS parent_category_code,
+                {setting_fields}
+            FROM `tabHD Category` category
+            LEFT JOIN `tabHD Category` parent ON parent.name = category.parent_category
+            ORDER BY category.is_sub_category, category.parent_category, category.name
+            """,
+            as_dict=True,
+            as_iterator=True
+        )
+
+        for row in rows:
+            yield category_to_export_row(row)
+
+
+def category_to_export_row(category):
+    """Convert an HD Category row to importer columns"""
+    is_sub_category = bool(category.is_sub_category)
+    export_row = {
+        "Category Name": "" if is_sub_category else category.category_name,
+        "Category Code": "" if is_sub_category else category.category_code,
+        "Sub-Category Name": category.category_name if is_sub_category else "",
+        "Sub-Category Code": category.category_code if is_sub_category else "",
+        "Parent Category Code": (category.parent_category_code or "") if is_sub_category else "",
+        "Description": category.description or "",
+        "Is Active": 1 if category.is_active else 0,
+    }
+
+    for column, fieldname in SETTING_COLUMNS.items():
+        value = category.get(fieldname)
+        if fieldname in CHECK_FIELDS:
+            export_row[column] = 1 if value else 0
+        else:
+            export_row[column] = value or ""
+
+    return export_row
+
+
+def export_categories(file_path, export_format="csv"):
+    """
+    Write all categories to a file
+
+    Args:
+        file_path: Path of the file to write
+        export_format: "csv" or "jsonl"
+
+    Returns:
+        int: Number of categories written
+    """
+    if export_format not in EXPORT_FORMATS:
+        frappe.throw(_("Export format must be one of {0}").format(", ".join(EXPORT_FORMATS)))
+
+    count = 0
+    with open(file_path, "w", newline="", encoding="utf-8") as file:
+        if export_format == "csv":
+            writer = csv.DictWriter(file, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            for row in iter_category_export_rows():
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in iter_category_export_rows():
+                file.write(json.dumps(row, default=str))
+                file.write("\n")
+                count += 1
+
+    return count
@@ -1,209 +1,753 @@
-#!/usr/bin/env python3
 """
-Script to import HD Categories and Sub Categories from CSV file
+Import HD Categories and Sub Categories from a CSV file
+
+Rows are streamed from the file, existing categories are loaded into memory
+with a single query and new categories are written with bulk inserts that are
+committed per chunk, so files with hundreds of thousands of rows can be
+imported without holding them in memory or in one transaction.
+
+Usage:
+    bench --site <site> import-hd-categories /path/to/categories.csv
 """
 
-import frappe
 import csv
+import hashlib
+import json
 import os
+
+import frappe
 from frappe import _
+from frappe.utils import cint, now
+
+from pw_helpdesk.pw_helpdesk.doctype.hd_category.hd_category import (
+    parse_assignees,
+    replace_category_assignees,
+    sync_escalation_rules,
+)
+from pw_helpdesk.instrumentation import instrumented
+
+
+DEFAULT_CHUNK_SIZE = 1000
+DIFF_SAMPLE_LIMIT = 1000
+# Rows per UPDATE ... CASE statement when updating existing categories
+BULK_UPDATE_CHUNK_SIZE = 200
+
+# Global default holding the last committed row of an import, per file hash
+CHECKPOINT_KEY_PREFIX = "pw_helpdesk_category_import:"
+
+# CSV columns (matched case-insensitively) -> HD Category fields, shared by
+# category and sub-category rows
+SETTING_COLUMNS = {
+    "Same Assignee as Category": "same_assignee_as_category",
+    "Assign Issue To User": "assign_issue_to_user",
+    "Assignee": "assignee",
+    "Assign Issue to External Vendor": "assign_issue_to_external_vendor",
+    "Assign Issue to Permission Role Holder": "assign_issue_to_permission_role_holder",
+    "Permission Role Holder": "permission_role_holder",
+    "Attach Form for Issue Creation": "attach_form_for_issue_creation",
+    "Attach Same Form as Category": "attach_same_form_as_category",
+    "Make Attachment Mandatory": "make_attachment_mandatory",
+    "Same Attachment Setting as Category": "same_attachment_setting_as_category",
+    "Hide Attachment Field": "hide_attachment_field",
+    "Display Sub-Category only in Mobile App": "display_sub_category_only_in_mobile_app",
+    "Make Location Mandatory": "make_location_mandatory",
+    "Same Escalation Settings as Category": "same_escalation_settings_as_category",
+    "Enable Escalation": "enable_escalation",
+    "Escalation Type": "escalation_type",
+    "Escalation 1 Point": "escalation_1_point",
+    "Escalation 1 Unit": "escalation_1_unit",
+    "Escalation 1 Assignee": "escalation_1_assignee",
+    "Escalation 2 Point": "escalation_2_point",
+    "Escalation 2 Unit": "escalation_2_unit",
+    "Escalation 2 Assignee": "escalation_2_assignee",
+    "Escalation 3 Point": "escalation_3_point",
+    "Escalation 3 Unit": "escalation_3_unit",
+    "Escalation 3 Assignee": "escalation_3_assignee",
+}
+
+CHECK_FIELDS = {
+    "same_assignee_as_category",
+    "assign_issue_to_user",
+    "assign_issue_to_external_vendor",
+    "assign_issue_to_permission_role_holder",
+    "attach_form_for_issue_creation",
+    "attach_same_form_as_category",
+    "make_attachment_mandatory",
+    "same_attachment_setting_as_category",
+    "hide_attachment_field",
+    "display_sub_category_only_in_mobile_app",
+    "make_location_mandatory",
+    "same_escalation_settings_as_category",
+    "enable_escalation",
+}
+
+INT_FIELDS = {"escalation_1_point", "escalation_2_point", "escalation_3_point"}
+
+# Fields written for every imported row, in bulk insert column order
+CATEGORY_FIELDS = [
+    "category_name",
+    "category_code",
+    "description",
+    "is_active",
+    "is_sub_category",
+    "parent_category",
+    *SETTING_COLUMNS.values(),
+]
+
+# Separators tried, longest prefix first, when a sub-category code embeds its parent code
+CODE_SEPARATORS = ("_", "-", ".", "/")
+SUB_CATEGORY_CODE_PREFIX = "SUB_"
+
+
+def parse_check(value):
+    """Parse a Yes/No, 1/0 or True/False CSV cell"""
+    return 1 if (value or "").strip().lower() in ("yes", "y", "1", "true") else 0
+
+
+def iter_csv_rows(file_path):
+    """
+    Stream rows of a category CSV file
+
+    Args:
+        file_path: Path of the CSV file
+
+    Yields:
+        tuple: (row number, dict of lower-cased column name -> stripped value)
+    """
+    with open(file_path, encoding="utf-8-sig", newline="") as file:
+        reader = csv.reader(file)
+        header = [column.strip().lower() for column in next(reader, [])]
+
+        for row_number, values in enumerate(reader, start=1):
+            yield row_number, dict(zip(header, (value.strip() for value in values)))
+
+
+def parse_category_row(row):
+    """
+    Convert a CSV row to HD Category field values
+
+    Args:
+        row: Dict of lower-cased column name -> value
+
+    Returns:
+        dict: HD Category fields, or None for rows without a category or sub-category
+    """
+    category_name = row.get("category name", "")
+    category_code = row.get("category code", "")
+    sub_category_name = row.get("sub-category name", "")
+    sub_category_code = row.get("sub-category code", "")
+    parent_category_code = row.get("parent category code", "")
+
+    if category_name and category_code:
+        fields = {"category_name": category_name, "category_code": category_code, "is_sub_category": 0}
+    elif sub_category_name and sub_category_code:
+        fields = {"category_name": sub_category_name, "category_code": sub_category_code, "is_sub_category": 1}
+    else:
+        return None
+
+    fields["description"] = row.get("description", "")
+    fields["is_active"] = parse_check(row["is active"]) if row.get("is active") else 1
+    fields["parent_category"] = None
+    fields["parent_category_code"] = parent_category_code if fields["is_sub_category"] else None
+
+    for column, fieldname in SETTING_COLUMNS.items():
+        value = row.get(column.lower(), "")
+        if fieldname in CHECK_FIELDS:
+            fields[fieldname] = parse_check(value)
+        elif fieldname == "assignee":
+            # Stored the way HDCategory.sync_assignees derives it from the assignees table
+            fields[fieldname] = ", ".join(parse_assignees(value)) or None
+        elif fieldname in INT_FIELDS:
+            fields[fieldname] = cint(value) or None
+        else:
+            # Exported spreadsheets fill unused text and select columns with 0
+            fields[fieldname] = value if value not in ("", "0") else None
+
+    return fields
+
+
+def validate_category_row(fields):
+    """
+    Lightweight version of HDCategory.validate for rows written with bulk insert
+
+    Args:
+        fields: HD Category field values
+
+    Returns:
+        str: Error message, or None if the row is valid
+    """
+    for email in parse_assignees(fields.get("assignee")):
+        if not frappe.utils.validate_email_address(email):
+            return _("Invalid email address: {0}").format(email)
+
+    if fields.get("enable_escalation"):
+        if not fields.get("escalation_type"):
+            return _("Escalation Type is required when escalation is enabled")
+
+        for level in (1, 2, 3):
+            point = fields.get(f"escalation_{level}_point")
+            if point is not None and point <= 0:
+                return _("Escalation {0} Point must be greater than 0").format(level)
+
+    return None
+
+
+class CategoryCodeIndex:
+    """Code -> name index of main categories used to resolve sub-category parents in O(1)"""
+
+    def __init__(self):
+        self.names_by_code = {}
+
+    def add(self, category_code, category_name):
+        """Register a main category, the first category seen for a code wins"""
+        if category_code:
+            self.names_by_code.setdefault(category_code, category_name)
+
+    def discard(self, category_code):
+        self.names_by_code.pop(category_code, None)
+
+    def resolve(self, sub_category_code, parent_category_code=None):
+        """
+        Find the parent category of a sub-category
+
+        The explicit parent code is used when given. Otherwise the sub-category
+        code, without its SUB_ prefix, is cut at separators from the right and the
+        longest prefix that is a known category code wins, e.g. SUB_BV-1_01 ->
+        BV-1_01, BV-1, BV. This is deterministic and independent of file order.
+
+        Args:
+            sub_category_code: Code of the sub-category
+            parent_category_code: Explicit parent code from the CSV, if any
+
+        Returns:
+            str: Name of the parent category, or None if it cannot be resolved
+        """
+        if parent_category_code:
+            return self.names_by_code.get(parent_category_code)
+
+        code = sub_category_code or ""
+        if code.upper().startswith(SUB_CATEGORY_CODE_PREFIX):
+            code = code[len(SUB_CATEGORY_CODE_PREFIX):]
+
+        while code:
+            if code in self.names_by_code:
+                return self.names_by_code[code]
+
+            cut = max(code.rfind(separator) for separator in CODE_SEPARATORS)
+            if cut <= 0:
+                break
+            code = code[:cut]
+
+        return None
+
+
+def load_existing_categories(fields=None):
+    """
+    Load all existing categories with one query
+
+    Args:
+        fields: Additional HD Category fields to load for each category
+
+    Returns:
+        tuple: (set of names and category names, dict of category code -> row,
+            CategoryCodeIndex of main categories)
+    """
+    names = set()
+    rows_by_code = {}
+    code_index = CategoryCodeIndex()
+
+    query_fields = ["name", "category_name", "category_code", "is_sub_category"]
+    query_fields += [field for field in (fields or []) if field not in query_fields]
+
+    for category in frappe.get_all("HD Category", fields=query_fields, order_by=None):
+        names.add(category.name)
+        if category.category_name:
+            names.add(category.category_name)
+        if category.category_code:
+            rows_by_code[category.category_code] = category
+            if not category.is_sub_category:
+                code_index.add(category.category_code, category.name)
+
+    return names, rows_by_code, code_index
+
+
+def iter_resolved_rows(file_path, code_index, unresolved, start_after=0):
+    """
+    Stream parsed category rows with the parents of sub-categories resolved
+
+    Main categories are added to the code index as they are read. Sub-categories
+    whose parent is not known yet are kept in `unresolved` and yielded after the
+    last row, with parent_category still None if their parent never appeared.
+
+    Args:
+        file_path: Path of the CSV file
+        code_index: CategoryCodeIndex of known main categories
+        unresolved: Dict of row number -> fields, filled with deferred sub-categories
+        start_after: Skip rows up to and including this row number
+
+    Yields:
+        tuple: (row number, HD Category fields)
+    """
+    for row_number, row in iter_csv_rows(file_path):
+        if row_number <= start_after:
+            continue
+
+        fields = parse_category_row(row)
+        if not fields:
+            continue
+
+        if not fields["is_sub_category"]:
+            code_index.add(fields["category_code"], fields["category_name"])
+        else:
+            fields["parent_category"] = code_index.resolve(fields["category_code"], fields["parent_category_code"])
+            if not fields["parent_category"]:
+                unresolved[row_number] = fields
+                continue
+
+        yield row_number, fields
+
+    # Parents that appear later in the file than their sub-categories
+    for row_number in sorted(unresolved):
+        fields = unresolved.pop(row_number)
+        fields["parent_category"] = code_index.resolve(fields["category_code"], fields["parent_category_code"])
+        yield row_number, fields
+
+
+def get_file_hash(file_path):
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_checkpoint_key(file_hash, upsert=False):
+    # Insert and upsert runs of the same file must not resume from each other
+    return f"{CHECKPOINT_KEY_PREFIX}{'upsert:' if upsert else ''}{file_hash}"
+
+
+def get_import_checkpoint(file_hash, upsert=False):
+    """
+    Get the last committed row of an interrupted import of the same file
+
+    Returns:
+        int: Row number to resume after, 0 if there is no checkpoint
+    """
+    checkpoint = frappe.db.get_global(get_checkpoint_key(file_hash, upsert))
+    return cint(json.loads(checkpoint).get("row")) if checkpoint else 0
+
+
+def set_import_checkpoint(file_hash, row_number, upsert=False):
+    """Record the last committed row, written in the same transaction as the chunk it covers"""
+    frappe.db.set_global(
+        get_checkpoint_key(file_hash, upsert),
+        json.dumps({"row": row_number, "file_hash": file_hash, "updated": now()})
+    )
+
+
+def clear_import_checkpoint(file_hash, upsert=False):
+    frappe.db.set_global(get_checkpoint_key(file_hash, upsert), None)
+
+
+def bulk_insert_categories(rows):
+    """
+    Write new categories and their assignee rows with multi-row inserts
+
+    Args:
+        rows: List of HD Category field dicts, the category name is used as document name
+    """
+    if not rows:
+        return
+
+    timestamp = now()
+    user = frappe.session.user
+
+    frappe.db.bulk_insert(
+        "HD Category",
+        fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx", *CATEGORY_FIELDS],
+        values=[
+            (row["category_name"], timestamp, timestamp, user, user, 0, 0, *(row.get(field) for field in CATEGORY_FIELDS))
+            for row in rows
+        ]
+    )
+
+    replace_category_assignees(
+        {row["category_name"]: parse_assignees(row["assignee"]) for row in rows if row.get("assignee")},
+        delete_existing=False
+    )
+
+
+def bulk_update_categories(updates):
+    """
+    Write changed fields of existing categories with batched CASE updates
+
+    Args:
+        updates: Dict of category name -> {fieldname: value} with only the changed fields
+    """
+    if not updates:
+        return
+
+    frappe.db.bulk_update(
+        "HD Category",
+        updates,
+        chunk_size=BULK_UPDATE_CHUNK_SIZE,
+        modified=now(),
+        modified_by=frappe.session.user
+    )
+
+    replace_category_assignees({
+        name: parse_assignees(changes["assignee"])
+        for name, changes in updates.items()
+        if "assignee" in changes
+    })
+
+
+def invalidate_category_cache(names):
+    """Clear cached HD Category documents once after rows were written without Document.save"""
+    for name in names:
+        frappe.clear_document_cache("HD Category", name)
+
+
+def import_categories_from_csv(
+    file_path, chunk_size=DEFAULT_CHUNK_SIZE, verbose=True, resume=True, dry_run=False, upsert=False
+):
+    """
+    Import categories and sub-categories from a CSV file
+
+    A checkpoint with the last committed row is stored per file hash, so running
+    the import again on the same file after a failure resumes after that row.
+
+    Args:
+        file_path: Path of the CSV file
+        chunk_size: Number of new rows written and committed together
+        verbose: Print progress to stdout
+        resume: Continue after the checkpoint of an interrupted import of the same file
+        dry_run: Only return the differences with existing categories, see diff_categories_from_csv
+        upsert: Update existing categories (matched by code) whose values differ instead of skipping them
+
+    Returns:
+        dict: Import statistics and row errors
+    """
+    if not file_path or not os.path.exists(file_path):
+        frappe.throw(_("CSV file not found at: {0}").format(file_path))
+
+    if dry_run:
+        diff = diff_categories_from_csv(file_path)
+        if verbose:
+            print_category_diff(diff)
+        return diff
+
+    chunk_size = cint(chunk_size) or DEFAULT_CHUNK_SIZE
+    file_hash = get_file_hash(file_path)
+    start_after = get_import_checkpoint(file_hash, upsert) if resume else 0
+    existing_names, existing_codes, code_index = load_existing_categories(
+        fields=CATEGORY_FIELDS if upsert else None
+    )
+
+    # Sub-categories whose parent was not read yet
+    unresolved = {}
+    last_row = start_after
+
+    stats = {
+        "rows": 0,
+        "resumed_after_row": start_after,
+        "created_categories": 0,
+        "created_sub_categories": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "skipped": 0,
+        "escalation_rules_written": 0,
+        "escalation_rules_skipped": 0,
+        "errors": [],
+        "orphans": [],
+    }
+    chunk = []
+    # Category name -> changed fields, and the merged rows used for escalation rule sync
+    updates = {}
+    updated_rows = []
+    updated_names = set()
+
+    if verbose and start_after:
+        print(f"Resuming import after row {start_after}")
+
+    def flush():
+        if not chunk and not updates:
+            return
+
+        bulk_insert_categories(chunk)
+        bulk_update_categories(updates)
+        escalation_stats = sync_escalation_rules(chunk + updated_rows)
+        # Rows after the first deferred sub-category are re-read on resume and skipped as existing
+        set_import_checkpoint(file_hash, min(unresolved) - 1 if unresolved else last_row, upsert)
+        frappe.db.commit()
+
+        stats["escalation_rules_written"] += escalation_stats["written"]
+        stats["escalation_rules_skipped"] += escalation_stats["skipped"]
+        stats["updated"] += len(updates)
+        for row in chunk:
+            stats["created_sub_categories" if row["is_sub_category"] else "created_categories"] += 1
+
+        if verbose:
+            print(f"Committed {len(chunk)} new and {len(updates)} updated categories ({stats['rows']} rows read)")
+        updated_names.update(updates)
+        chunk.clear()
+        updates.clear()
+        updated_rows.clear()
 
-def import_categories_from_csv():
-    """Import categories and sub-categories from CSV file"""
-    
-    # Path to the CSV file
-    csv_file_path = '/Users/pavankumarmarwaha/Desktop/bench9/Entities - PhysicsWallah - Helpdesk Categories.csv'
-    
-    if not os.path.exists(csv_file_path):
-        frappe.throw(f"CSV file not found at: {csv_file_path}")
-    
-    # Dictionary to store categories and their sub-categories
-    categories = {}
-    
     try:
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            # Debug: Print column names
-            print(f"CSV columns: {reader.fieldnames}")
-            
-            row_count = 0
-            for row in reader:
-                row_count += 1
-                
-                category_name = row.get('Category Name', '').strip()
-                category_code = row.get('Category Code', '').strip()
-                sub_category_name = row.get('Sub-Category Name', '').strip()
-                sub_category_code = row.get('Sub-Category Code', '').strip()
-                description = row.get('Description', '').strip()
-                
-                # Skip completely empty rows
-                if not category_name and not sub_category_name:
+        for row_number, fields in iter_resolved_rows(file_path, code_index, unresolved, start_after):
+            stats["rows"] += 1
+            last_row = max(last_row, row_number)
+
+            if fields["is_sub_category"] and not fields["parent_category"]:
+                stats["orphans"].append({
+                    "row": row_number,
+                    "category": fields["category_name"],
+                    "category_code": fields["category_code"],
+                    "parent_category_code": fields["parent_category_code"],
+                })
+                continue
+
+            existing = existing_codes.get(fields["category_code"])
+            if upsert and existing is not None:
+                changes = get_changed_fields(fields, existing)
+                if not changes:
+                    stats["unchanged"] += 1
                     continue
-                
-                # If this is a main category row (has category name and code)
-                if category_name and category_code:
-                    if category_name not in categories:
-                        categories[category_name] = {
-                            'category_code': category_code,
-                            'description': description,
-                            'sub_categories': []
-                        }
-                        print(f"Added main category: {category_name}")
-                
-                # If this is a sub-category row (has sub-category name and code)
-                elif sub_category_name and sub_category_code:
-                    # Find the parent category by looking at the sub-category code pattern
-                    # Most sub-category codes start with "SUB_" followed by a prefix that matches the parent category
-                    parent_category = None
-                    
-                    # Try to find parent category by matching sub-category code patterns
-                    for cat_name, cat_data in categories.items():
-                        if cat_data['category_code'] in sub_category_code or sub_category_code.startswith('SUB_'):
-                            parent_category = cat_name
-                            break
-                    
-                    # If no parent found, create a default parent category
-                    if not parent_category:
-                        parent_category = "General"
-                        if parent_category not in categories:
-                            categories[parent_category] = {
-                                'category_code': 'GEN',
-                                'description': 'General category for orphaned sub-categories',
-                                'sub_categories': []
-                            }
-                    
-                    # Add sub-category to the parent
-                    categories[parent_category]['sub_categories'].append({
-                        'sub_category_name': sub_category_name,
-                        'sub_category_code': sub_category_code,
-                        'description': description,
-                        'same_assignee_as_category': row.get('Same Assignee as Category', '').strip() == 'Yes',
-                        'assign_issue_to_user': row.get('Assign Issue To User', '').strip() == 'Yes',
-                        'assignee': row.get('Assignee', '').strip(),
-                        'assign_issue_to_external_vendor': row.get('Assign Issue to External Vendor', '').strip() == 'Yes',
-                        'assign_issue_to_permission_role_holder': row.get('Assign Issue to Permission Role Holder', '').strip() == 'Yes',
-                        'permission_role_holder': row.get('Permission Role Holder', '').strip(),
-                        'attach_form_for_issue_creation': row.get('Attach Form for Issue Creation', '').strip() == 'Yes',
-                        'attach_same_form_as_category': row.get('Attach same form as Category', '').strip() == 'Yes',
-                        'make_attachment_mandatory': row.get('Make Attachment Mandatory', '').strip() == 'Yes',
-                        'same_attachment_setting_as_category': row.get('Same Attachment Setting as Category', '').strip() == 'Yes',
-                        'hide_attachment_field': row.get('Hide Attachment Field', '').strip() == 'Yes',
-                        'display_sub_category_only_in_mobile_app': row.get('Display Sub-Category only in Mobile App', '').strip() == 'Yes',
-                        'make_location_mandatory': row.get('Make Location Mandatory', '').strip() == 'Yes',
-                        'same_escalation_settings_as_category': row.get('Same Escalation Settings as Category', '').strip() == 'Yes',
-                        'enable_escalation': row.get('Enable Escalation', '').strip() == 'Yes',
-                        'escalation_type': row.get('Escalation Type', '').strip(),
-                        'escalation_1_point': int(row.get('Escalation 1 Point', 0)) if row.get('Escalation 1 Point', '').strip() else None,
-                        'escalation_1_unit': row.get('Escalation 1 Unit', '').strip(),
-                        'escalation_1_assignee': row.get('Escalation 1 Assignee', '').strip(),
-                        'escalation_2_point': int(row.get('Escalation 2 Point', 0)) if row.get('Escalation 2 Point', '').strip() else None,
-                        'escalation_2_unit': row.get('Escalation 2 Unit', '').strip(),
-                        'escalation_2_assignee': row.get('Escalation 2 Assignee', '').strip(),
-                        'escalation_3_point': int(row.get('Escalation 3 Point', 0)) if row.get('Escalation 3 Point', '').strip() else None,
-                        'escalation_3_unit': row.get('Escalation 3 Unit', '').strip(),
-                        'escalation_3_assignee': row.get('Escalation 3 Assignee', '').strip()
-                    })
-                    print(f"Added sub-category: {sub_category_name} to parent: {parent_category}")
-        
-        print(f"Parsed {len(categories)} categories from CSV")
-        
-        # Create categories and sub-categories
-        created_categories = 0
-        created_sub_categories = 0
-        
-        for category_name, category_data in categories.items():
-            try:
-                # Check if category already exists
-                existing_category = frappe.get_all(
-                    "HD Category",
-                    filters={"category_name": category_name},
-                    limit=1
-                )
-                
-                if existing_category:
-                    print(f"Category '{category_name}' already exists, skipping...")
+
+                error = validate_category_row(fields)
+                if error:
+                    stats["errors"].append({"row": row_number, "category": fields["category_name"], "error": error})
                     continue
-                
-                # Create category
-                category_doc = frappe.get_doc({
-                    "doctype": "HD Category",
-                    "category_name": category_name,
-                    "category_code": category_data['category_code'],
-                    "description": category_data['description'],
-                    "is_active": 1
-                })
-                category_doc.insert()
-                created_categories += 1
-                print(f"Created category: {category_name}")
-                
-                # Create sub-categories
-                for sub_cat_data in category_data['sub_categories']:
-                    try:
-                        # Check if sub-category already exists
-                        existing_sub_category = frappe.get_all(
-                            "HD Category",
-                            filters={"category_code": sub_cat_data['sub_category_code']},
-                            limit=1
-                        )
-                        
-                        if existing_sub_category:
-                            print(f"Sub-category '{sub_cat_data['sub_category_name']}' already exists, skipping...")
-                            continue
-                        
-                        # Create sub-category
-                        sub_category_doc = frappe.get_doc({
-                            "doctype": "HD Category",
-                            "is_sub_category": 1,
-                            "parent_category": category_doc.name,
-                            "category_name": sub_cat_data['sub_category_name'],
-                            "category_code": sub_cat_data['sub_category_code'],
-                            "description": sub_cat_data['description'],
-                            "is_active": 1,
-                            "same_assignee_as_category": sub_cat_data['same_assignee_as_category'],
-                            "assign_issue_to_user": sub_cat_data['assign_issue_to_user'],
-                            "assignee": sub_cat_data['assignee'],
-                            "assign_issue_to_external_vendor": sub_cat_data['assign_issue_to_external_vendor'],
-                            "assign_issue_to_permission_role_holder": sub_cat_data['assign_issue_to_permission_role_holder'],
-                            "permission_role_holder": sub_cat_data['permission_role_holder'],
-                            "attach_form_for_issue_creation": sub_cat_data['attach_form_for_issue_creation'],
-                            "attach_same_form_as_category": sub_cat_data['attach_same_form_as_category'],
-                            "make_attachment_mandatory": sub_cat_data['make_attachment_mandatory'],
-                            "same_attachment_setting_as_category": sub_cat_data['same_attachment_setting_as_category'],
-                            "hide_attachment_field": sub_cat_data['hide_attachment_field'],
-                            "display_sub_category_only_in_mobile_app": sub_cat_data['display_sub_category_only_in_mobile_app'],
-                            "make_location_mandatory": sub_cat_data['make_location_mandatory'],
-                            "same_escalation_settings_as_category": sub_cat_data['same_escalation_settings_as_category'],
-                            "enable_escalation": sub_cat_data['enable_escalation'],
-                            "escalation_type": sub_cat_data['escalation_type'],
-                            "escalation_1_point": sub_cat_data['escalation_1_point'],
-                            "escalation_1_unit": sub_cat_data['escalation_1_unit'],
-                            "escalation_1_assignee": sub_cat_data['escalation_1_assignee'],
-                            "escalation_2_point": sub_cat_data['escalation_2_point'],
-                            "escalation_2_unit": sub_cat_data['escalation_2_unit'],
-                            "escalation_2_assignee": sub_cat_data['escalation_2_assignee'],
-                            "escalation_3_point": sub_cat_data['escalation_3_point'],
-                            "escalation_3_unit": sub_cat_data['escalation_3_unit'],
-                            "escalation_3_assignee": sub_cat_data['escalation_3_assignee']
-                        })
-                        sub_category_doc.insert()
-                        created_sub_categories += 1
-                        print(f"  Created sub-category: {sub_cat_data['sub_category_name']}")
-                        
-                    except Exception as e:
-                        print(f"Error creating sub-category '{sub_cat_data['sub_category_name']}': {str(e)}")
-                        continue
-                        
-            except Exception as e:
-                print(f"Error creating category '{category_name}': {str(e)}")
+
+                name = existing.get("name") or existing["category_name"]
+                updates.setdefault(name, {}).update({field: fields.get(field) for field in changes})
+                # Later rows with the same code compare against the values written here
+                existing.update({field: fields.get(field) for field in changes})
+                updated_rows.append(existing)
+
+                if len(chunk) + len(updates) >= chunk_size:
+                    flush()
+                continue
+
+            if fields["category_name"] in existing_names or existing is not None:
+                stats["skipped"] += 1
+                continue
+
+            error = validate_category_row(fields)
+            if error:
+                stats["errors"].append({"row": row_number, "category": fields["category_name"], "error": error})
+                if not fields["is_sub_category"]:
+                    # Sub-categories of an invalid category become orphans
+                    code_index.discard(fields["category_code"])
                 continue
-        
-        print(f"\nImport completed!")
-        print(f"Created {created_categories} categories")
-        print(f"Created {created_sub_categories} sub-categories")
-        
-    except Exception as e:
-        frappe.throw(f"Error reading CSV file: {str(e)}")
-
-if __name__ == "__main__":
-    import_categories_from_csv() 
\ No newline at end of file
+
+            existing_names.add(fields["category_name"])
+            existing_codes[fields["category_code"]] = fields
+            chunk.append(fields)
+
+            if len(chunk) >= chunk_size:
+                flush()
+
+        flush()
+
+    except (OSError, csv.Error, UnicodeDecodeError) as e:
+        frappe.db.rollback()
+        frappe.throw(_("Error reading CSV file: {0}").format(str(e)))
+
+    clear_import_checkpoint(file_hash, upsert)
+    frappe.db.commit()
+    invalidate_category_cache(updated_names)
+
+    if verbose:
+        print("\nImport completed!")
+        print(f"Created {stats['created_categories']} categories")
+        print(f"Created {stats['created_sub_categories']} sub-categories")
+        if upsert:
+            print(f"Updated {stats['updated']} categories, {stats['unchanged']} unchanged")
+        print(f"Skipped {stats['skipped']} existing categories")
+        for error in stats["errors"]:
+            print(f"Row {error['row']} ({error['category']}): {error['error']}")
+        if stats["orphans"]:
+            print(f"{len(stats['orphans'])} sub-categories without a known parent were not imported:")
+            for orphan in stats["orphans"]:
+                print(f"Row {orphan['row']} ({orphan['category_code']}): parent "
+                      f"'{orphan['parent_category_code'] or 'not given'}' not found")
+
+    return stats
+
+
+def normalise_value(value):
+    """Treat None, empty strings and 0 alike when comparing imported and stored values"""
+    if isinstance(value, str):
+        value = value.strip()
+    return value or None
+
+
+def get_changed_fields(fields, existing):
+    """
+    Compare imported field values with an existing category
+
+    Returns:
+        dict: Field name -> [existing value, imported value] for every differing field
+    """
+    changes = {}
+    for fieldname in CATEGORY_FIELDS:
+        if fieldname == "category_code":
+            continue
+
+        old_value = normalise_value(existing.get(fieldname))
+        new_value = normalise_value(fields.get(fieldname))
+        if old_value != new_value:
+            changes[fieldname] = [old_value, new_value]
+
+    return changes
+
+
+def diff_categories_from_csv(file_path, limit=DIFF_SAMPLE_LIMIT):
+    """
+    Compare a category CSV with existing HD Categories without writing anything
+
+    Rows are classified as new, changed, unchanged or orphaned (sub-categories
+    whose parent cannot be resolved). Invalid rows are listed separately.
+
+    Args:
+        file_path: Path of the CSV file
+        limit: Maximum number of rows listed per class, counts are always complete
+
+    Returns:
+        dict: Counts per class and up to `limit` example rows per class
+    """
+    if not file_path or not os.path.exists(file_path):
+        frappe.throw(_("CSV file not found at: {0}").format(file_path))
+
+    limit = cint(limit)
+    existing_names, existing_rows, code_index = load_existing_categories(fields=CATEGORY_FIELDS)
+    diff = {
+        "file_hash": get_file_hash(file_path),
+        "rows": 0,
+        "counts": {"new": 0, "changed": 0, "unchanged": 0, "orphaned": 0, "invalid": 0},
+        "new": [],
+        "changed": [],
+        "orphaned": [],
+        "invalid": [],
+    }
+
+    def record(kind, entry):
+        diff["counts"][kind] += 1
+        if kind in diff and len(diff[kind]) < limit:
+            diff[kind].append(entry)
+
+    seen_codes = set()
+    for row_number, fields in iter_resolved_rows(file_path, code_index, {}):
+        diff["rows"] += 1
+        code = fields["category_code"]
+        entry = {"row": row_number, "category": fields["category_name"], "category_code": code}
+
+        if fields["is_sub_category"] and not fields["parent_category"]:
+            entry["parent_category_code"] = fields["parent_category_code"]
+            record("orphaned", entry)
+            continue
+
+        error = validate_category_row(fields)
+        if not error and code in seen_codes:
+            error = _("Category Code '{0}' appears more than once in the file").format(code)
+        seen_codes.add(code)
+
+        existing = existing_rows.get(code)
+        if not error and not existing and fields["category_name"] in existing_names:
+            error = _("Category '{0}' already exists with a different code").format(fields["category_name"])
+
+        if error:
+            entry["error"] = error
+            record("invalid", entry)
+        elif not existing:
+            record("new", entry)
+        elif changes := get_changed_fields(fields, existing):
+            entry["changes"] = changes
+            record("changed", entry)
+        else:
+            record("unchanged", entry)
+
+    return diff
+
+
+def print_category_diff(diff):
+    """Print a category import diff to stdout"""
+    counts = diff["counts"]
+    print(f"Dry run of {diff['rows']} rows: {counts['new']} new, {counts['changed']} changed, "
+          f"{counts['unchanged']} unchanged, {counts['orphaned']} orphaned, {counts['invalid']} invalid")
+
+    for entry in diff["changed"]:
+        changes = ", ".join(f"{field}: {old!r} -> {new!r}" for field, (old, new) in entry["changes"].items())
+        print(f"  ~ Row {entry['row']} {entry['category_code']}: {changes}")
+    for entry in diff["orphaned"]:
+        print(f"  ? Row {entry['row']} {entry['category_code']}: parent "
+              f"'{entry['parent_category_code'] or 'not given'}' not found")
+    for entry in diff["invalid"]:
+        print(f"  ! Row {entry['row']} {entry['category_code']}: {entry['error']}")
+
+
+@instrumented
+def run_category_import_job(file_path, chunk_size=DEFAULT_CHUNK_SIZE, user=None, upsert=False):
+    """Background job wrapper that reports the import result to the requesting user"""
+    stats = import_categories_from_csv(file_path, chunk_size=chunk_size, verbose=False, upsert=upsert)
+
+    if stats["errors"]:
+        frappe.log_error(
+            title="HD Category Import Errors",
+            message=frappe.as_json(stats["errors"])
+        )
+
+    if stats["orphans"]:
+        frappe.log_error(
+            title="HD Category Import Orphans",
+            message=frappe.as_json(stats["orphans"])
+        )
+
+    frappe.publish_realtime("hd_category_import_complete", stats, user=user or frappe.session.user)
+    return stats
+
+
+@frappe.whitelist()
+@instrumented
+def enqueue_category_import(file_url, chunk_size=DEFAULT_CHUNK_SIZE, upsert=False):
+    """
+    Queue an HD Category import of an uploaded CSV file
+
+    Args:
+        file_url: URL of the uploaded File
+        chunk_size: Number of new rows written and committed together
+        upsert: Update existing categories whose values differ instead of skipping them
+    """
+    frappe.only_for(["System Manager", "Agent Manager"])
+
+    file_doc = frappe.get_doc("File", {"file_url": file_url})
+    job = frappe.enqueue(
+        "pw_helpdesk.pw_helpdesk.import_categories.run_category_import_job",
+        queue="long",
+        timeout=3600,
+        file_path=file_doc.get_full_path(),
+        chunk_size=cint(chunk_size) or DEFAULT_CHUNK_SIZE,
+        user=frappe.session.user,
+        upsert=cint(upsert)
+    )
+
+    return {"message": _("Category import queued"), "job_id": job.id if job else None}
+
+
+@frappe.whitelist()
+@instrumented
+def preview_category_import(file_url, limit=DIFF_SAMPLE_LIMIT):
+    """
+    Dry run of an HD Category import: new, changed, unchanged and orphaned rows of an uploaded CSV
+
+    Args:
+        file_url: URL of the uploaded File
+        limit: Maximum number of rows listed per class
+    """
+    frappe.only_for(["System Manager", "Agent Manager"])
+
+    file_doc = frappe.get_doc("File", {"file_url": file_url})
+    return diff_categories_from_csv(file_doc.get_full_path(), limit=limit)
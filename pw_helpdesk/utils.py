@@ -0,0 +1,73 @@
+import frappe
+import redis
+
+
+def increment_counters(name, counts):
+    """
+    Atomically add to named integer counters stored in a site-scoped Redis hash
+
+    Args:
+        name: Name of the counter hash
+        counts: Dict of counter field -> amount to add
+    """
+    counts = {field: int(amount) for field, amount in counts.items() if amount}
+    if not counts:
+        return
+
+    try:
+        cache = frappe.cache()
+        key = cache.make_key(name)
+        pipeline = cache.pipeline()
+        for field, amount in counts.items():
+            pipeline.hincrby(key, field, amount)
+        pipeline.execute()
+    except redis.exceptions.RedisError as e:
+        # Counters are informational only, never break the caller
+        frappe.log_error(f"Error updating counters '{name}': {str(e)}")
+
+
+def get_counters(name):
+    """
+    Read all counters from a site-scoped Redis hash
+
+    Args:
+        name: Name of the counter hash
+
+    Returns:
+        dict: Counter field -> integer value
+    """
+    try:
+        cache = frappe.cache()
+        # RedisWrapper.hgetall unpickles values, counters are stored as plain integers
+        raw = redis.Redis.hgetall(cache, cache.make_key(name))
+    except redis.exceptions.RedisError as e:
+        frappe.log_error(f"Error reading counters '{name}': {str(e)}")
+        return {}
+
+    return {
+        (field.decode() if isinstance(field, bytes) else field): int(value)
+        for field, value in raw.items()
+    }
+
+
+def reset_counters(name):
+    """Delete a counter hash"""
+    frappe.cache().delete_value(name)
+
+
+def next_sequence(name):
+    """
+    Atomically increment a site-scoped Redis integer and return the new value
+
+    Args:
+        name: Name of the sequence
+
+    Returns:
+        int: Next value of the sequence, 0 if Redis is unavailable
+    """
+    try:
+        cache = frappe.cache()
+        return redis.Redis.incr(cache, cache.make_key(name))
+    except redis.exceptions.RedisError as e:
+        frappe.log_error(f"Error incrementing sequence '{name}': {str(e)}")
+        return 0